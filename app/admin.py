@@ -1,4 +1,3 @@
-from pathlib import Path
 from telebot.types import (
     Message,
     CallbackQuery,
@@ -8,9 +7,10 @@ from telebot.types import (
 from telebot.apihelper import ApiTelegramException
 from telebot import util
 
-from app.statistics import load_stats
+from app.statistics import count_stats
 from src.config import bot, settings
 from src.game import Game
+from src.sharding import is_own_game
 from src.utils import is_admin_message
 
 
@@ -25,50 +25,42 @@ sorted_chat_files = []  # Список чатов, сортированный п
 CHATS_IN_PAGE = settings.CHAT_PAGE_SIZE
 
 
-def get_sorted_chat_files():
+async def get_sorted_chat_files():
     """Готовим отсортированный список чатов"""
-
-    def check_file(f: Path) -> bool:
-        return f.is_file() and f.suffix == ".pkl" and f.stem.startswith("-")
-
     global sorted_chat_files
-    folder = Path(settings.STATE_SAVE_DIR)
-    sorted_files = sorted(
-        folder.iterdir(),
-        key=lambda f: f.stat().st_mtime if check_file(f) else 0,
-        reverse=True,
-    )
-    sorted_chat_files = [f.stem for f in sorted_files]
+    # Хранилище общее для всех шардов: админ видит чаты всех воркеров
+    sorted_chat_files = await Game.state_store.sorted_ids()
 
 
 async def make_active_chats_markup(offset=0, refresh_list=False):
     if not sorted_chat_files or refresh_list:
-        get_sorted_chat_files()
+        await get_sorted_chat_files()
     chats_markup = InlineKeyboardMarkup()
     print(get_chats_for_admins.__doc__)
     if offset < 0:
         offset = 0
     for chat_id in sorted_chat_files[offset : offset + CHATS_IN_PAGE]:
-        game = Game.games.get(chat_id)
-        if game is None:
+        # Без get_game: листание списка не должно загружать все игры в кэш
+        state = await Game.peek_state(chat_id)
+        if state is None:
             continue
-        if game.active:
+        if state["active"]:
             prefix = "🟢"
-        elif game.used_words:
+        elif state["used_words"]:
             prefix = ""
         else:
             prefix = "⚫️"
-        if game.chat_username:
+        if state["chat_username"]:
             prefix = "🔗 " + prefix
         chat_title = (
-            f"{game.chat_title} / {game.topic_name}"
-            if game.topic_id
-            else game.chat_title
+            f"{state['chat_title']} / {state['topic_name']}"
+            if state["topic_id"]
+            else state["chat_title"]
         )
-        if "post" in game.game_chat_id:
-            chat_title += " post" + game.game_chat_id.split("post")[1]
+        if "post" in chat_id:
+            chat_title += " post" + chat_id.split("post")[1]
         chat_btn = InlineKeyboardButton(
-            f"{prefix} {chat_title}", callback_data=f"chat_info{game.game_chat_id}"
+            f"{prefix} {chat_title}", callback_data=f"chat_info{chat_id}"
         )
         chats_markup.add(chat_btn)
 
@@ -93,11 +85,11 @@ async def make_active_chats_markup(offset=0, refresh_list=False):
     chats_markup.add(*page_buttons, row_width=5)
     all_pages = (len(sorted_chat_files) - 1 + CHATS_IN_PAGE) // CHATS_IN_PAGE
     page = offset // CHATS_IN_PAGE + 1
-    global_stats = await load_stats(settings.GLOBAL_STATS_FILE)
+    players_count = await count_stats(settings.GLOBAL_STATS_FILE)
     text = (
         f"<b>{get_chats_for_admins.__doc__}</b>\n\n"
         f"Всего чатов: <code>{len(sorted_chat_files)}</code>\n"
-        f"Всего игроков: <code>{len(global_stats)}</code>\n"
+        f"Всего игроков: <code>{players_count}</code>\n"
         f"Страница: <code>{page} / {all_pages}</code>"
     )
     return dict(text=text, parse_mode="html", reply_markup=chats_markup)
@@ -118,8 +110,19 @@ async def admins_messages(message: Message):
             start_index + len(find_word_idx) : end_index
         ]
         await bot.delete_message(message.chat.id, message.message_id)
-        game = Game.games.get(chat_id)
+        if not is_own_game(chat_id):
+            # Игрой владеет другой воркер, запись в хранилище он затрет
+            await bot.send_message(
+                message.chat.id,
+                f"Игра {chat_id} в другом шарде, подкинуть слово отсюда нельзя",
+            )
+            return
+        game = await Game.get_game(chat_id)
+        if game is None:
+            await bot.send_message(message.chat.id, f"Игра {chat_id} не найдена")
+            return
         game.next_words.append(message.text)
+        game.mark_dirty()
         game_stats = await make_tester_game_stats(chat_id)
         await bot.edit_message_text(
             chat_id=message.chat.id,
@@ -131,17 +134,22 @@ async def admins_messages(message: Message):
 async def make_tester_game_stats(chat_id: str):
     """
     Информация об игре чата.
+    Состояние читается без загрузки игры в кэш, в шардированном режиме
+    и для игр других воркеров (из общего хранилища).
     """
-    chat_game = await Game.get_game(chat_id)
+    state = await Game.peek_state(chat_id)
+    if state is None:
+        return dict(text=f"Игра {chat_id} не найдена")
     markup = InlineKeyboardMarkup()
     refresh_btn = InlineKeyboardButton("🔄 Обновить", callback_data=f"refresh{chat_id}")
     tg_chat_btn = InlineKeyboardButton("…", callback_data=f"tg_chat_info{chat_id}")
     close_btn = InlineKeyboardButton("✖️", callback_data="close")
     markup.add(refresh_btn, tg_chat_btn, close_btn)
-    active = "🟢" if chat_game.active else ""
-    chat_info = util.escape(str(chat_game))
-    chat_title = util.escape(chat_game.chat_title)
-    text = f"{active} <b>{chat_title}</b>\n{chat_info}"
+    active = "🟢" if state["active"] else ""
+    chat_info = util.escape(Game.format_state(state))
+    chat_title = util.escape(state["chat_title"] or "")
+    shard = "" if is_own_game(chat_id) else "\n<i>Другой шард, данные из хранилища</i>"
+    text = f"{active} <b>{chat_title}</b>{shard}\n{chat_info}"
     return dict(text=text, reply_markup=markup, parse_mode="html")
 
 
@@ -205,7 +213,7 @@ async def tg_chat_info_callback_handler(call: CallbackQuery):
 
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith("chats:"))
-async def chat_info_callback_handler(call: CallbackQuery):
+async def chats_page_callback_handler(call: CallbackQuery):
     offset = int(call.data.split(":")[1])
     kwargs = await make_active_chats_markup(offset=offset)
     await bot.edit_message_text(
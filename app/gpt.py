@@ -1,7 +1,14 @@
-from openai import OpenAI, OpenAIError
+from openai import AsyncOpenAI, OpenAI, OpenAIError
 from src.settings import settings
 
-client = OpenAI(api_key=settings.OPEN_API_KEY)
+client = OpenAI(api_key=settings.OPEN_API_KEY, base_url=settings.GPT_BASE_URL)
+# Для работы из цикла событий: без своих повторов, повторяет пул
+async_client = AsyncOpenAI(
+    api_key=settings.OPEN_API_KEY,
+    base_url=settings.GPT_BASE_URL,
+    timeout=settings.GPT_TIMEOUT,
+    max_retries=0,
+)
 
 
 def print_models():
@@ -23,6 +30,14 @@ def generate_answer(prompt: str):
         return response.choices[0].message.content
 
 
+async def generate_answer_async(prompt: str) -> str:
+    messages = [{"role": "user", "content": prompt}]
+    response = await async_client.chat.completions.create(
+        model=settings.GPT_MODEL, messages=messages
+    )
+    return response.choices[0].message.content
+
+
 if __name__ == "__main__":
     print_models()
 
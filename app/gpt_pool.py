@@ -0,0 +1,151 @@
+"""
+Заранее сгенерированные ответы ChatGPT.
+
+Сообщения игры не ждут модель: на каждый именованный промпт в фоне
+держится небольшой запас готовых ответов, а gpt_injection только забирает
+ответ из запаса или, если он пуст, обходится без него.
+Запрос к модели ограничен по времени. После нескольких ошибок подряд
+пул перестает обращаться к API на время (размыкатель цепи). Пустой ответ
+тоже считается ошибкой, иначе модель, которая всегда отвечает пусто,
+вызывалась бы без пауз.
+"""
+
+import asyncio
+import time
+from collections import deque
+from app.gpt import generate_answer_async
+from src.log import get_logger
+from src.metrics import gpt_seconds
+from src.settings import settings
+
+log = get_logger("gpt")
+
+
+class GptPool:
+    def __init__(
+        self,
+        generate,
+        pool_size: int = 5,
+        timeout: float = 20,
+        breaker_failures: int = 3,
+        breaker_cooldown: float = 300,
+    ):
+        """
+        :param generate: корутина generate(prompt) -> str
+        :param pool_size: сколько готовых ответов держим на промпт
+        :param timeout: секунд на один ответ
+        :param breaker_failures: ошибок подряд до паузы
+        :param breaker_cooldown: длительность паузы, секунд
+        """
+        self.generate = generate
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+        self._pools: dict[str, deque[str]] = {}  # Имя промпта -> готовые ответы
+        self._prompts: dict[str, str] = {}  # Имя промпта -> текст
+        self._failures = 0  # Ошибок подряд
+        self._open_until = 0.0  # До какого времени не обращаемся к API
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.generated = 0
+        self.errors = 0
+        self.misses = 0  # Сколько раз запас оказался пуст
+
+    @property
+    def is_open(self) -> bool:
+        """Разомкнут ли размыкатель: API сейчас не вызываем"""
+        return time.monotonic() < self._open_until
+
+    def take(self, name: str, prompt: str) -> str | None:
+        """Готовый ответ на промпт или None, если запас пуст"""
+        self.add_prompt(name, prompt)
+        self._wakeup.set()
+        if pool := self._pools[name]:
+            return pool.popleft()
+        self.misses += 1
+
+    def add_prompt(self, name: str, prompt: str):
+        """
+        Заводит запас под промпт.
+        Если текст промпта изменился, старый запас сбрасывается
+        """
+        if self._prompts.get(name) != prompt:
+            self._prompts[name] = prompt
+            self._pools[name] = deque(maxlen=self.pool_size)
+            self._wakeup.set()
+
+    def _failed(self, error: str):
+        """Ошибка подряд; после breaker_failures - пауза"""
+        self.errors += 1
+        self._failures += 1
+        if self._failures >= self.breaker_failures:
+            self._open_until = time.monotonic() + self.breaker_cooldown
+            self._failures = 0
+            log.warning(
+                "breaker open",
+                extra={"cooldown": self.breaker_cooldown, "error": error},
+            )
+
+    async def _generate(self, name: str):
+        prompt = self._prompts[name]
+        start = time.perf_counter()
+        try:
+            answer = await asyncio.wait_for(self.generate(prompt), self.timeout)
+        except Exception as e:
+            result = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+            gpt_seconds.observe(time.perf_counter() - start, name, result)
+            self._failed(repr(e))
+            return
+        if not (answer := (answer or "").strip()):
+            gpt_seconds.observe(time.perf_counter() - start, name, "empty")
+            self._failed("empty answer")
+            return
+        gpt_seconds.observe(time.perf_counter() - start, name, "ok")
+        self._failures = 0
+        if self._prompts[name] == prompt:
+            self._pools[name].append(answer)
+            self.generated += 1
+
+    async def _run(self):
+        while True:
+            if self.is_open:
+                await asyncio.sleep(self._open_until - time.monotonic())
+                continue
+            # Пополняем самый пустой запас
+            pools = [(len(pool), name) for name, pool in self._pools.items()]
+            size, name = min(pools, default=(self.pool_size, None))
+            if size >= self.pool_size:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            await self._generate(name)
+
+    def stats(self) -> dict:
+        return {
+            "generated": self.generated,
+            "errors": self.errors,
+            "misses": self.misses,
+            "ready": sum(len(pool) for pool in self._pools.values()),
+            "breaker_open": int(self.is_open),
+        }
+
+    def start(self):
+        """Запуск фонового пополнения, вызывается из работающего цикла событий"""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+gpt_pool = GptPool(
+    generate_answer_async,
+    pool_size=settings.GPT_POOL_SIZE,
+    timeout=settings.GPT_TIMEOUT,
+    breaker_failures=settings.GPT_BREAKER_FAILURES,
+    breaker_cooldown=settings.GPT_BREAKER_COOLDOWN,
+)
@@ -0,0 +1,81 @@
+"""
+Реестр промптов для ChatGPT.
+
+Промпт регистрируется под именем: текстом и/или файлом. Файл важнее
+текста, если он есть. Содержимое файла кэшируется и перечитывается,
+только если поменялось время его изменения, а проверяется это не чаще
+раза в check_interval секунд. Так промпты можно править без перезапуска
+бота, а сообщения игры не читают файл каждый раз.
+"""
+
+import os
+import time
+from src.settings import settings
+
+
+class _Prompt:
+    __slots__ = ("text", "file", "mtime", "content", "checked_at")
+
+    def __init__(self, text: str, file: str | None):
+        self.text = text  # Текст по умолчанию
+        self.file = file
+        self.mtime = None  # Время изменения прочитанного файла
+        self.content = text
+        self.checked_at = float("-inf")
+
+
+class PromptRegistry:
+    def __init__(self, check_interval: float = 10):
+        self.check_interval = check_interval
+        self._prompts: dict[str, _Prompt] = {}
+
+    def register(self, name: str, text: str = "", file: str | None = None):
+        """
+        :param name: имя промпта
+        :param text: текст, если файла нет
+        :param file: файл с промптом
+        """
+        self._prompts[name] = _Prompt(text, file)
+
+    def names(self) -> list[str]:
+        return list(self._prompts)
+
+    def get(self, name: str) -> str:
+        """Текущий текст промпта, пустая строка для неизвестного имени"""
+        prompt = self._prompts.get(name)
+        if prompt is None:
+            return ""
+        if prompt.file is not None:
+            now = time.monotonic()
+            if now - prompt.checked_at >= self.check_interval:
+                prompt.checked_at = now
+                self._reload(prompt)
+        return prompt.content
+
+    @staticmethod
+    def _reload(prompt: _Prompt):
+        try:
+            mtime = os.stat(prompt.file).st_mtime_ns
+        except OSError:
+            prompt.mtime = None
+            prompt.content = prompt.text  # Файла нет
+            return
+        if mtime == prompt.mtime:
+            return
+        try:
+            with open(prompt.file, encoding="utf-8") as f:
+                prompt.content = f.read().strip()
+        except OSError:
+            return
+        prompt.mtime = mtime
+
+
+def prompt_file(name: str) -> str | None:
+    """Файл промпта в PROMPTS_DIR, если папка задана"""
+    if settings.PROMPTS_DIR:
+        return os.path.join(settings.PROMPTS_DIR, name + ".txt")
+
+
+prompts = PromptRegistry(settings.PROMPT_CHECK_INTERVAL)
+# Промпт начала раунда (get_lead_game_message), как и раньше, из PROMPT_FILE
+prompts.register("default", file=settings.PROMPT_FILE)
@@ -1,40 +1,42 @@
 import os.path
 from datetime import datetime
-import aiofiles
-import json
 from telebot.types import User
+from app.stats_aggregator import StatsAggregator
+from app.stats_store import make_stats_store
 from src.game import Game
+from src.metrics import storage_seconds, timed
+from src.tracing import traced
 from src.settings import settings
 
 
+stats_store = make_stats_store()
+
+# Все изменения статистики идут только через агрегатор
+stats_aggregator = StatsAggregator(
+    stats_store,
+    flush_interval=settings.STATS_FLUSH_INTERVAL,
+    flush_batch=settings.STATS_FLUSH_BATCH,
+    cache_size=settings.STATS_CACHE_SIZE,
+    # Глобальную статистику при шардировании пишут все воркеры
+    shared_keys=(settings.GLOBAL_STATS_FILE,) if settings.SHARDS > 1 else (),
+)
+
+
+@timed(storage_seconds, "load_stats")
 async def load_stats(file_path) -> dict:
-    """Загружает статистику из JSON файла, заодно делаем проверки на существования пути к файлу"""
-
-    # Проверяем, если не существует нужная папка и создаем ее
-    dir_name, file_name = os.path.split(file_path)
-    if dir_name and not os.path.exists(dir_name):
-        # Проверяем вдруг папка под старым именем, где "-" вначале
-        left_part, chat_part = os.path.split(dir_name)
-        if os.path.exists(old_path := os.path.join(left_part, "-" + chat_part)):
-            # Переименовываем папку чата, где начинается с "-"
-            os.rename(old_path, os.path.join(left_part, chat_part))
-        else:
-            # Иначе создаем новую папку
-            os.makedirs(dir_name)
-
-    # Если не существует файла статистики, то возвращаем пустой словарь
-    if not os.path.exists(file_path):
-        return {}
-
-    async with aiofiles.open(file_path, encoding="utf-8") as f:
-        content = await f.read()
-    stats = json.loads(content)
-    return stats
+    """Загружает статистику по пути к файлу статистики (вид из памяти)"""
+    return await stats_aggregator.get_table(file_path)
 
 
+@timed(storage_seconds, "save_stats")
 async def save_stats(file_name, stats: dict) -> None:
-    async with aiofiles.open(file_name, "w", encoding="utf-8") as f:
-        await f.write(json.dumps(stats, indent=4, ensure_ascii=False))
+    """Прямая запись в хранилище, минуя агрегатор"""
+    await stats_store.save(file_name, stats)
+
+
+async def count_stats(file_path) -> int:
+    """Количество игроков в статистике"""
+    return await stats_aggregator.count(file_path)
 
 
 def get_chat_stats_filename(chat_id) -> str:
@@ -47,22 +49,10 @@ def get_chat_stats_filename(chat_id) -> str:
 
 async def inc_user_stat_in_file(file_name, user: User):
     """Увеличивает очки пользователя в конкретном файле статистики"""
-
-    stats = await load_stats(file_name)  # Загружаем статистику
-
-    # Увеличиваем очки пользователя
-    user_id = str(user.id)
-    user_stat = stats.get(user_id, {})
-    if not user_stat:
-        user_stat["score"] = 1
-    else:
-        user_stat["score"] += 1
-    user_stat["name"] = user.full_name
-    stats.update({user_id: user_stat})
-
-    await save_stats(file_name, stats)  # Сохраняем статистику
+    await stats_aggregator.inc_score(file_name, str(user.id), user.full_name)
 
 
+@traced
 async def inc_user_stat(game: Game, user: User):
     """Увеличиваем очки пользователю и записываем в глобальную статистику и в статистику чата"""
 
@@ -81,22 +71,9 @@ async def inc_user_fine(game: Game):
         return  # Все нормально, не штрафуем
 
     chat_filename = get_chat_stats_filename(game.chat_id)
-    stats = await load_stats(chat_filename)  # Загружаем статистику чата
-    user_id = str(game.exclusive_user)
-    user_stat = stats.get(user_id, {})
-
-    # Смотрим сколько раз нарушил
-    is_fined = False
-    user_stat["faults"] = user_stat.get("faults", 0) + 1
-    if user_stat["faults"] >= settings.FAULT_SIZE:
-        # Штрафуем
-        del user_stat["faults"]
-        user_stat["fines"] = user_stat.get("fines", 0) + 1
-        is_fined = True
-
-    stats.update({user_id: user_stat})
-    await save_stats(chat_filename, stats)  # Сохраняем статистику
-    return is_fined
+    return await stats_aggregator.inc_fault(
+        chat_filename, str(game.exclusive_user), settings.FAULT_SIZE
+    )
 
 
 def get_correct_word_form(count):
@@ -111,11 +88,9 @@ def get_correct_word_form(count):
 async def get_global_stats():
     """Возвращает глобальную статистику игроков"""
 
-    global_stats = await load_stats(settings.GLOBAL_STATS_FILE)
-    sorted_stats = sorted(
-        global_stats.items(), key=lambda x: x[1]["score"], reverse=True
+    top_players = await stats_aggregator.top(
+        settings.GLOBAL_STATS_FILE, settings.GLOBAL_STATS_SIZE
     )
-    top_players = sorted_stats[: settings.GLOBAL_STATS_SIZE]
     if not top_players:
         return dict(text="Пока нет глобальной статистики.")
     result_message = "🌐 🏆 <b>Глобальный ТОП игроков в крокодила 🐊</b>\n\n"
@@ -134,16 +109,14 @@ async def get_chat_stats(chat_id):
     """Возвращает статистику игроков в текущем чате"""
 
     chat_filename = get_chat_stats_filename(chat_id)
-    chat_stats = await load_stats(chat_filename)
-    if not chat_stats:
+    top_players = await stats_aggregator.top(chat_filename, settings.CHAT_STATS_SIZE)
+    if not top_players:
         return dict(text="Пока нет статистики для этого чата.")
-    sorted_stats = sorted(chat_stats.items(), key=lambda x: x[1]["score"], reverse=True)
-    top_players = sorted_stats[: settings.CHAT_STATS_SIZE]
     result_message = "🏆 <b>Топ игроков в крокодила 🐊 в этом чате</b>\n\n"
     for idx, (user_id_str, data) in enumerate(top_players, start=1):
         user_name = data["name"]
         fines = data.get("fines", 0)  # Штрафы
-        score = data["score"] - fines
+        score = data.get("score", 0) - fines
         word = get_correct_word_form(score)
         result_message += f"{idx}. {user_name} — {score} {word}\n"
     result_message += (
@@ -156,4 +129,4 @@ async def clear_chat_stats(chat_id):
     """Очистка статистики"""
     today_str = datetime.today().strftime(".%Y-%m-%d_%H%M")
     chat_filename = get_chat_stats_filename(chat_id)
-    os.rename(chat_filename, chat_filename + today_str)
+    await stats_aggregator.archive(chat_filename, today_str)
@@ -0,0 +1,166 @@
+"""
+Агрегатор статистики: единственный владелец всех изменений очков и штрафов.
+
+Изменения сразу применяются к таблицам в памяти (из них же читаются топы),
+а в хранилище уходят пачкой: по таймеру STATS_FLUSH_INTERVAL
+или когда накопилось STATS_FLUSH_BATCH изменений. При остановке бота
+все несохраненное записывается методом close().
+
+Ключи shared_keys пишут и другие процессы (глобальная статистика
+при шардировании): их таблицы не кэшируются, приращения только копятся
+для записи, а топ и количество читаются из хранилища.
+"""
+
+import asyncio
+import heapq
+import time
+from collections import OrderedDict
+from app.stats_store import StatsStore, merge_changes
+from src.log import get_logger
+from src.metrics import storage_seconds
+
+log = get_logger("stats")
+
+
+class StatsAggregator:
+    def __init__(
+        self,
+        store: StatsStore,
+        flush_interval: float,
+        flush_batch: int,
+        cache_size: int,
+        shared_keys: tuple = (),
+    ):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.cache_size = cache_size  # Сколько таблиц чатов держим в памяти
+        self.shared_keys = frozenset(shared_keys)
+
+        self._tables: OrderedDict[str, dict] = OrderedDict()  # Вид в памяти
+        self._loading: dict[str, asyncio.Future] = {}  # Таблицы в процессе загрузки
+        self._pending: dict[str, dict] = {}  # Несохраненные приращения по ключам
+        self._pending_count = 0
+        self._flush_lock = asyncio.Lock()
+        self._flush_event = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def get_table(self, key: str) -> dict:
+        """Таблица статистики из памяти, при необходимости загружается из хранилища"""
+        if (table := self._tables.get(key)) is not None:
+            self._tables.move_to_end(key)
+            return table
+        if (future := self._loading.get(key)) is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            table = await self.store.load(key)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Чтобы не было предупреждения, если никто не ждал
+            raise
+        finally:
+            del self._loading[key]
+        self._tables[key] = table
+        self._evict()
+        future.set_result(table)
+        return table
+
+    def _evict(self):
+        """Выгружает давно не используемые таблицы без несохраненных изменений"""
+        if self._flush_lock.locked():
+            return  # Пока идет запись, хранилище может быть не актуальным
+        for key in list(self._tables):
+            if len(self._tables) <= self.cache_size:
+                break
+            if key not in self._pending:
+                del self._tables[key]
+
+    def _change(self, key: str, table: dict | None, user_id: str, change: dict):
+        """Применяет изменение к таблице в памяти и запоминает его для записи"""
+        if table is not None:
+            merge_changes(table, {user_id: change})
+        pending = self._pending.setdefault(key, {})
+        merge_changes(pending, {user_id: change})
+        self._pending_count += 1
+        if self._pending_count >= self.flush_batch:
+            self._flush_event.set()
+
+    async def inc_score(self, key: str, user_id: str, name: str):
+        table = None if key in self.shared_keys else await self.get_table(key)
+        self._change(key, table, user_id, {"score": 1, "name": name})
+
+    async def inc_fault(self, key: str, user_id: str, fault_size: int) -> bool:
+        table = await self.get_table(key)
+        faults = table.get(user_id, {}).get("faults", 0) + 1
+        if faults < fault_size:
+            self._change(key, table, user_id, {"faults": 1})
+            return False
+        # Штрафуем, счетчик пропусков обнуляется
+        self._change(key, table, user_id, {"faults": 1 - faults, "fines": 1})
+        return True
+
+    async def count(self, key: str) -> int:
+        if key in self.shared_keys:
+            return await self.store.count(key)
+        return len(await self.get_table(key))
+
+    async def top(self, key: str, limit: int) -> list[tuple[str, dict]]:
+        if key in self.shared_keys:
+            return await self.store.top(key, limit)
+        table = await self.get_table(key)
+        return heapq.nlargest(
+            limit, table.items(), key=lambda x: x[1].get("score", 0)
+        )
+
+    async def archive(self, key: str, suffix: str):
+        """Сохраняет и убирает в архив статистику по ключу"""
+        await self.flush()
+        async with self._flush_lock:
+            await self.store.archive(key, suffix)
+            self._tables.pop(key, None)
+
+    async def flush(self):
+        """Записывает все накопленные изменения в хранилище"""
+        async with self._flush_lock:
+            pending, self._pending = self._pending, {}
+            self._pending_count = 0
+            self._flush_event.clear()
+            for key, changes in pending.items():
+                start = time.perf_counter()
+                try:
+                    await self.store.apply(key, changes)
+                    storage_seconds.observe(time.perf_counter() - start, "stats_apply")
+                except Exception as e:
+                    log.error(
+                        "stats flush failed", extra={"key": key, "error": repr(e)}
+                    )
+                    # Возвращаем изменения обратно, запишем в следующий раз
+                    merge_changes(self._pending.setdefault(key, {}), changes)
+                    self._pending_count += len(changes)
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._flush_event.wait(), timeout=self.flush_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+            if self._pending:
+                await self.flush()
+
+    def start(self):
+        """Запуск фоновой записи, вызывается из работающего цикла событий"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        """Остановка: записываем все, что не записано, и закрываем хранилище"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+        await self.store.close()
@@ -0,0 +1,516 @@
+"""
+Хранилища статистики игроков.
+
+Статистика адресуется ключом - путем к файлу статистики
+(глобальный файл или stats.json чата), как и раньше.
+JsonStatsStore хранит все в JSON файлах,
+SqliteStatsStore - в одной базе SQLite, где каждое начисление очков
+это один upsert по индексу.
+
+Перенос старой статистики в SQLite:
+    python -m app.stats_store migrate [stats.db]
+Переносятся stats.json чатов, их архивы stats.json.<дата> (после /clear)
+и GLOBAL_STATS_FILE. Файлы разбираются потоково, по одному игроку,
+так что и большой глобальный файл не читается в память целиком.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+import aiofiles
+from src.metrics import storage_bytes
+from src.settings import settings
+
+READ_CHUNK = 1024 * 1024  # Символов за одно чтение при потоковом разборе JSON
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",}]"
+
+
+class StatsStore:
+    """Интерфейс хранилища статистики"""
+
+    async def load(self, key: str) -> dict:
+        """Вся статистика по ключу: {user_id: {"score":.., "name":.., ...}}"""
+        raise NotImplementedError
+
+    async def save(self, key: str, stats: dict) -> None:
+        """Полностью перезаписывает статистику по ключу"""
+        raise NotImplementedError
+
+    async def inc_score(self, key: str, user_id: str, name: str) -> None:
+        """Увеличивает очки пользователя на 1 и обновляет его имя"""
+        raise NotImplementedError
+
+    async def inc_fault(self, key: str, user_id: str, fault_size: int) -> bool:
+        """Увеличивает счетчик пропусков, при достижении fault_size дает штраф.
+        Возвращает True, если пользователь оштрафован"""
+        raise NotImplementedError
+
+    async def apply(self, key: str, changes: dict) -> None:
+        """
+        Применяет накопленные изменения по ключу.
+        changes: {user_id: {"score": +n, "faults": +n, "fines": +n, "name": имя}},
+        числа - приращения, имя (если не None) заменяет старое
+        """
+        stats = await self.load(key)
+        merge_changes(stats, changes)
+        await self.save(key, stats)
+
+    async def archive(self, key: str, suffix: str) -> None:
+        """
+        Убирает статистику в архив под ключом key + suffix.
+        Если такой архив уже есть (вторая очистка за минуту), к суффиксу
+        добавляется номер: key + suffix + "-2" и т.д.
+        """
+        raise NotImplementedError
+
+    async def count(self, key: str) -> int:
+        """Количество игроков в статистике"""
+        return len(await self.load(key))
+
+    async def top(self, key: str, limit: int) -> list[tuple[str, dict]]:
+        """Лучшие игроки по очкам"""
+        stats = await self.load(key)
+        sorted_stats = sorted(
+            stats.items(), key=lambda x: x[1].get("score", 0), reverse=True
+        )
+        return sorted_stats[:limit]
+
+    async def close(self) -> None:
+        pass
+
+
+def iter_json_object(f, chunk_size: int = READ_CHUNK):
+    """
+    Пары (ключ, значение) JSON объекта верхнего уровня из файла f по одной:
+    в памяти только текущий кусок файла и одно значение.
+    """
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def more() -> bool:
+        """Дочитывает файл в буфер; False, если файл кончился"""
+        nonlocal buffer, pos, eof
+        if eof or not (chunk := f.read(chunk_size)):
+            eof = True
+            return False
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer):
+                return
+            if not more():
+                raise ValueError("unexpected end of JSON")
+
+    def skip(chars: str) -> str:
+        """Пропускает пробелы и возвращает следующий символ из chars"""
+        nonlocal pos
+        skip_whitespace()
+        char = buffer[pos]
+        if char not in chars:
+            raise ValueError(f"expected {chars!r} at {pos}, got {char!r}")
+        pos += 1
+        return char
+
+    def value():
+        """Очередное значение; если оно уперлось в конец буфера - дочитываем"""
+        nonlocal pos
+        skip_whitespace()
+        while True:
+            try:
+                result, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if more():
+                    continue
+                raise
+            # Число на границе куска могло прочитаться не до конца ("1.5" от
+            # "1.5e3"): принимаем его, только если за ним есть разделитель
+            number = isinstance(result, (int, float)) and not isinstance(result, bool)
+            if not number or (end < len(buffer) and buffer[end] in _DELIMITERS):
+                pos = end
+                return result
+            if not more():
+                pos = end
+                return result
+
+    skip("{")
+    if skip('}"') == "}":
+        return
+    pos -= 1  # Кавычка - начало ключа
+    while True:
+        key = value()
+        skip(":")
+        yield key, value()
+        if skip(",}") == "}":
+            return
+        skip('"')
+        pos -= 1
+
+
+def merge_changes(stats: dict, changes: dict) -> None:
+    """Применяет приращения changes к словарю статистики stats"""
+    for user_id, change in changes.items():
+        user_stat = stats.setdefault(user_id, {})
+        for field in ("score", "faults", "fines"):
+            if value := user_stat.get(field, 0) + change.get(field, 0):
+                user_stat[field] = value
+            else:
+                user_stat.pop(field, None)
+        if change.get("name") is not None:
+            user_stat["name"] = change["name"]
+
+
+class JsonStatsStore(StatsStore):
+    """Статистика в JSON файлах, ключ - путь к файлу"""
+
+    async def load(self, key: str) -> dict:
+        """Загружает статистику из JSON файла, заодно делаем проверки на существования пути к файлу"""
+
+        # Проверяем, если не существует нужная папка и создаем ее
+        dir_name, file_name = os.path.split(key)
+        if dir_name and not os.path.exists(dir_name):
+            # Проверяем вдруг папка под старым именем, где "-" вначале
+            left_part, chat_part = os.path.split(dir_name)
+            if os.path.exists(old_path := os.path.join(left_part, "-" + chat_part)):
+                # Переименовываем папку чата, где начинается с "-"
+                os.rename(old_path, os.path.join(left_part, chat_part))
+            else:
+                # Иначе создаем новую папку
+                os.makedirs(dir_name)
+
+        # Если не существует файла статистики, то возвращаем пустой словарь
+        if not os.path.exists(key):
+            return {}
+
+        async with aiofiles.open(key, encoding="utf-8") as f:
+            content = await f.read()
+        stats = json.loads(content)
+        return stats
+
+    async def save(self, key: str, stats: dict) -> None:
+        content = json.dumps(stats, indent=4, ensure_ascii=False)
+        async with aiofiles.open(key, "w", encoding="utf-8") as f:
+            await f.write(content)
+        storage_bytes.observe(len(content.encode()), "stats_json")
+
+    async def inc_score(self, key: str, user_id: str, name: str) -> None:
+        stats = await self.load(key)
+        user_stat = stats.get(user_id, {})
+        user_stat["score"] = user_stat.get("score", 0) + 1
+        user_stat["name"] = name
+        stats[user_id] = user_stat
+        await self.save(key, stats)
+
+    async def inc_fault(self, key: str, user_id: str, fault_size: int) -> bool:
+        stats = await self.load(key)
+        user_stat = stats.get(user_id, {})
+
+        # Смотрим сколько раз нарушил
+        is_fined = False
+        user_stat["faults"] = user_stat.get("faults", 0) + 1
+        if user_stat["faults"] >= fault_size:
+            # Штрафуем
+            del user_stat["faults"]
+            user_stat["fines"] = user_stat.get("fines", 0) + 1
+            is_fined = True
+
+        stats[user_id] = user_stat
+        await self.save(key, stats)
+        return is_fined
+
+    async def archive(self, key: str, suffix: str) -> None:
+        target = key + suffix
+        number = 1
+        while os.path.exists(target):
+            number += 1
+            target = f"{key}{suffix}-{number}"
+        os.rename(key, target)
+
+
+class SqliteStatsStore(StatsStore):
+    """
+    Статистика в SQLite (режим WAL).
+    Все запросы выполняются в одном отдельном потоке,
+    чтобы не блокировать цикл событий.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS stats (
+            scope TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            name TEXT,
+            score INTEGER NOT NULL DEFAULT 0,
+            faults INTEGER NOT NULL DEFAULT 0,
+            fines INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (scope, user_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS stats_top ON stats (scope, score DESC);
+    """
+
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+        self._conn: sqlite3.Connection | None = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stats")
+
+    @staticmethod
+    def scope(key: str) -> str:
+        return os.path.normpath(key)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_file)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    @staticmethod
+    def _row_to_stat(name, score, faults, fines) -> dict:
+        user_stat = {"score": score, "name": name}
+        if faults:
+            user_stat["faults"] = faults
+        if fines:
+            user_stat["fines"] = fines
+        return user_stat
+
+    def _load(self, key: str) -> dict:
+        rows = self._connect().execute(
+            "SELECT user_id, name, score, faults, fines FROM stats WHERE scope = ?",
+            (self.scope(key),),
+        )
+        return {user_id: self._row_to_stat(*row) for user_id, *row in rows}
+
+    def _save(self, key: str, stats: dict) -> None:
+        conn = self._connect()
+        scope = self.scope(key)
+        with conn:
+            conn.execute("DELETE FROM stats WHERE scope = ?", (scope,))
+            self._insert_many(conn, scope, stats.items())
+
+    @staticmethod
+    def _insert_many(conn: sqlite3.Connection, scope: str, items) -> None:
+        conn.executemany(
+            "INSERT OR REPLACE INTO stats (scope, user_id, name, score, faults, fines) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    scope,
+                    user_id,
+                    data.get("name"),
+                    data.get("score", 0),
+                    data.get("faults", 0),
+                    data.get("fines", 0),
+                )
+                for user_id, data in items
+            ),
+        )
+
+    def _inc_score(self, key: str, user_id: str, name: str) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO stats (scope, user_id, name, score) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT (scope, user_id) "
+                "DO UPDATE SET score = score + 1, name = excluded.name",
+                (self.scope(key), user_id, name),
+            )
+
+    def _inc_fault(self, key: str, user_id: str, fault_size: int) -> bool:
+        conn = self._connect()
+        with conn:
+            (faults,) = conn.execute(
+                "INSERT INTO stats (scope, user_id, faults) VALUES (?, ?, 1) "
+                "ON CONFLICT (scope, user_id) DO UPDATE SET faults = faults + 1 "
+                "RETURNING faults",
+                (self.scope(key), user_id),
+            ).fetchone()
+            if faults < fault_size:
+                return False
+            # Штрафуем
+            conn.execute(
+                "UPDATE stats SET faults = 0, fines = fines + 1 "
+                "WHERE scope = ? AND user_id = ?",
+                (self.scope(key), user_id),
+            )
+            return True
+
+    def _apply(self, key: str, changes: dict) -> None:
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO stats (scope, user_id, name, score, faults, fines) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (scope, user_id) DO UPDATE SET "
+                "name = coalesce(excluded.name, name), "
+                "score = score + excluded.score, "
+                "faults = faults + excluded.faults, "
+                "fines = fines + excluded.fines",
+                (
+                    (
+                        self.scope(key),
+                        user_id,
+                        change.get("name"),
+                        change.get("score", 0),
+                        change.get("faults", 0),
+                        change.get("fines", 0),
+                    )
+                    for user_id, change in changes.items()
+                ),
+            )
+
+    def _archive(self, key: str, suffix: str) -> None:
+        conn = self._connect()
+        scope = self.scope(key)
+        with conn:
+            target = scope + suffix
+            number = 1
+            while conn.execute(
+                "SELECT 1 FROM stats WHERE scope = ? LIMIT 1", (target,)
+            ).fetchone():
+                number += 1
+                target = f"{scope}{suffix}-{number}"
+            conn.execute("UPDATE stats SET scope = ? WHERE scope = ?", (target, scope))
+
+    def _count(self, key: str) -> int:
+        return self._connect().execute(
+            "SELECT count(*) FROM stats WHERE scope = ?", (self.scope(key),)
+        ).fetchone()[0]
+
+    def _top(self, key: str, limit: int) -> list[tuple[str, dict]]:
+        rows = self._connect().execute(
+            "SELECT user_id, name, score, faults, fines FROM stats "
+            "WHERE scope = ? ORDER BY score DESC LIMIT ?",
+            (self.scope(key), limit),
+        )
+        return [(user_id, self._row_to_stat(*row)) for user_id, *row in rows]
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def load(self, key: str) -> dict:
+        return await self._run(self._load, key)
+
+    async def save(self, key: str, stats: dict) -> None:
+        await self._run(self._save, key, stats)
+
+    async def inc_score(self, key: str, user_id: str, name: str) -> None:
+        await self._run(self._inc_score, key, user_id, name)
+
+    async def inc_fault(self, key: str, user_id: str, fault_size: int) -> bool:
+        return await self._run(self._inc_fault, key, user_id, fault_size)
+
+    async def apply(self, key: str, changes: dict) -> None:
+        await self._run(self._apply, key, changes)
+
+    async def archive(self, key: str, suffix: str) -> None:
+        await self._run(self._archive, key, suffix)
+
+    async def count(self, key: str) -> int:
+        return await self._run(self._count, key)
+
+    async def top(self, key: str, limit: int) -> list[tuple[str, dict]]:
+        return await self._run(self._top, key, limit)
+
+    async def close(self) -> None:
+        await self._run(self._close)
+        self._executor.shutdown()
+
+    def import_json_file(self, key: str, file_path: str) -> int:
+        """
+        Синхронный импорт одного JSON файла статистики под ключом key.
+        Файл разбирается потоково (iter_json_object), в базу пишется
+        одной транзакцией. Возвращает число игроков.
+        """
+        count = 0
+
+        def counted(items):
+            nonlocal count
+            for item in items:
+                count += 1
+                yield item
+
+        conn = self._connect()
+        with open(file_path, encoding="utf-8") as f, conn:
+            self._insert_many(conn, self.scope(key), counted(iter_json_object(f)))
+        return count
+
+
+def make_stats_store() -> StatsStore:
+    """Создает хранилище статистики согласно настройкам"""
+    match settings.STATS_BACKEND:
+        case "json":
+            return JsonStatsStore()
+        case "sqlite":
+            return SqliteStatsStore(settings.STATS_DB_FILE)
+        case backend:
+            raise ValueError(f"Unknown STATS_BACKEND: {backend!r}")
+
+
+def migrate_json_to_sqlite(db_file: str = None):
+    """
+    Переносит статистику из CHATS_STATS_DIR (с архивами stats.json.<дата>)
+    и GLOBAL_STATS_FILE в SQLite. Каждый файл - отдельная транзакция и
+    разбирается потоково, так что в памяти не держится даже один файл.
+    Пропущенные файлы (не читаются или не JSON) выводятся.
+    """
+    store = SqliteStatsStore(db_file or settings.STATS_DB_FILE)
+    files_count = players_count = 0
+
+    def import_file(key, file_path):
+        nonlocal files_count, players_count
+        try:
+            players_count += store.import_json_file(key, file_path)
+        except (OSError, ValueError) as e:
+            print(f"Пропущен {file_path}: {e}")
+            return
+        files_count += 1
+        if files_count % 1000 == 0:
+            print(f"{files_count=}, {players_count=}")
+
+    with os.scandir(settings.CHATS_STATS_DIR) as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            # Ключ - тот же путь, что дает get_chat_stats_filename
+            key = os.path.join(
+                settings.CHATS_STATS_DIR, entry.name.lstrip("-"), "stats.json"
+            )
+            for name in sorted(os.listdir(entry.path)):
+                if name == "stats.json":
+                    import_file(key, os.path.join(entry.path, name))
+                elif name.startswith("stats.json."):
+                    # Архив после /clear: ключ с тем же суффиксом, что дает archive
+                    suffix = name[len("stats.json") :]
+                    import_file(key + suffix, os.path.join(entry.path, name))
+                else:
+                    print(f"Пропущен {os.path.join(entry.path, name)}: не статистика")
+
+    if os.path.exists(settings.GLOBAL_STATS_FILE):
+        import_file(settings.GLOBAL_STATS_FILE, settings.GLOBAL_STATS_FILE)
+    store._close()
+    print(f"Готово: {files_count=}, {players_count=}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["migrate"]:
+        migrate_json_to_sqlite(*sys.argv[2:3])
+    else:
+        print(__doc__)
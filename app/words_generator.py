@@ -1,10 +1,82 @@
 import random
+import zlib
 from src.settings import settings
 
-set_of_words: set  # Список всех слов
+list_of_words: list[str]  # Все слова словаря, индекс слова - его номер в списке
+word_index: dict[str, int]  # Обратный индекс: слово -> номер
 
 with open(settings.WORDS_FILE, encoding="utf-8") as f:
-    set_of_words = set(line.strip() for line in f if line.strip())
+    word_index = {}
+    for line in f:
+        if (word := line.strip()) and word not in word_index:
+            word_index[word] = len(word_index)
+    list_of_words = list(word_index)
+
+# Отпечаток словаря. Если словарь поменялся, то номера слов уже не те,
+# и сохраненные битсеты использованных слов надо сбросить
+words_fingerprint = zlib.crc32("\n".join(list_of_words).encode("utf-8"))
+
+
+class UsedWords:
+    """
+    Множество использованных слов в виде битсета по номерам слов словаря.
+    Слова не из словаря (подкинутые админом) не учитываются.
+    """
+
+    def __init__(self, words=()):
+        self.fingerprint = words_fingerprint
+        self.bits = bytearray()  # Создается при первом добавлении
+        self.count = 0
+        for word in words:
+            self.add(word)
+
+    def _check_fingerprint(self):
+        if self.fingerprint != words_fingerprint:
+            # Словарь изменился, старые номера не актуальны
+            self.clear()
+
+    def add_index(self, idx: int):
+        self._check_fingerprint()
+        if not self.bits:
+            self.bits = bytearray((len(list_of_words) + 7) // 8)
+        byte, bit = divmod(idx, 8)
+        if not self.bits[byte] & (1 << bit):
+            self.bits[byte] |= 1 << bit
+            self.count += 1
+
+    def add(self, word: str):
+        if (idx := word_index.get(word)) is not None:
+            self.add_index(idx)
+
+    def has_index(self, idx: int) -> bool:
+        if not self.bits:
+            return False
+        return bool(self.bits[idx >> 3] & (1 << (idx & 7)))
+
+    def clear(self):
+        self.fingerprint = words_fingerprint
+        self.bits = bytearray()
+        self.count = 0
+
+    def __contains__(self, word: str):
+        idx = word_index.get(word)
+        return idx is not None and self.has_index(idx)
+
+    def __len__(self):
+        self._check_fingerprint()
+        return self.count
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        self._check_fingerprint()
+        for idx in range(len(self.bits) * 8) if self.count else ():
+            if self.has_index(idx):
+                yield list_of_words[idx]
+
+    def __repr__(self):
+        return f"UsedWords<{len(self)} of {len(list_of_words)}>"
 
 
 def get_random_word(game):
@@ -13,13 +85,16 @@ def get_random_word(game):
         word = game.next_words.pop(0)
         return word
 
-    remaining_words = list(set_of_words - game.used_words)
+    used_words = game.used_words
     # Считаем сколько процентов слов не использовано.
     # Если менее 30%, то обнуляем множество использованных слов
-    remain_per_cent = len(remaining_words) / len(set_of_words) < 0.3
-    if not remain_per_cent:
-        return random.choice(remaining_words)
-    else:
-        # Если использованные слова перекрывают все, то обнуляем это множество
-        game.used_words.clear()
-        return random.choice(list(set_of_words))
+    words_count = len(list_of_words)
+    if (words_count - len(used_words)) / words_count < 0.3:
+        used_words.clear()
+
+    # Неиспользованных слов не меньше 30%, поэтому случайный выбор
+    # с повтором в среднем укладывается в пару-тройку попыток
+    while True:
+        idx = random.randrange(words_count)
+        if not used_words.has_index(idx):
+            return list_of_words[idx]
@@ -0,0 +1,78 @@
+"""
+Сравнение кодека состояния игры (src.game_codec) с прежним pickle.
+
+    python -m bench.bench_codec
+"""
+
+import pickle
+import random
+import time
+from bench.common import setup_env, measure, print_results, random_word
+
+setup_env()
+
+from app.words_generator import UsedWords, list_of_words  # noqa: E402
+from src.game_codec import encode_state, decode_state  # noqa: E402
+
+
+def make_state(rnd: random.Random, legacy: bool) -> dict:
+    """Состояние типичной игры: пара сотен угаданных слов, идет раунд"""
+    used = rnd.sample(list_of_words, 200)
+    now = time.time()
+    players = {rnd.randint(10**8, 10**9): f"Игрок {i}" for i in range(10)}
+    return {
+        "game_chat_id": "-1001234567890",
+        "chat_id": -1001234567890,
+        "chat_title": "Крокодил: общий чат",
+        "topic_id": None,
+        "topic_name": None,
+        "chat_username": "@game_public_chat",
+        "msg_kwargs": {},
+        "active": True,
+        "used_words": set(used) if legacy else UsedWords(used),
+        "game_timer": {"interval": 300, "end_time": now + 120},
+        "current_leader": 123456789,
+        "leader_name": "Иван Петров",
+        "current_word": rnd.choice(list_of_words),
+        "next_words": [],
+        "answers_set": {random_word(rnd) for _ in range(30)},
+        "exclusive_user": 987654321,
+        "exclusive_user_name": "Мария",
+        "exclusive_timer": None,
+        "players": (
+            {f"{player} {name}" for player, name in players.items()}
+            if legacy
+            else set(players)
+        ),
+        **({} if legacy else {"player_names": players}),
+    }
+
+
+def main():
+    rnd = random.Random(2)
+    legacy_state = make_state(rnd, legacy=True)
+    state = make_state(rnd, legacy=False)
+    pickled = pickle.dumps(legacy_state)
+    pickled_same = pickle.dumps(state)
+    encoded = encode_state(state)
+    assert decode_state(encoded)["players"] == state["players"]
+
+    print_results(
+        "game_codec",
+        {
+            "pickle_dumps": measure(lambda: pickle.dumps(legacy_state)),
+            "pickle_loads": measure(lambda: pickle.loads(pickled)),
+            "pickle_bytes": len(pickled),
+            # pickle того же состояния, но уже с битсетом слов
+            "pickle_dumps_bitset": measure(lambda: pickle.dumps(state)),
+            "pickle_loads_bitset": measure(lambda: pickle.loads(pickled_same)),
+            "pickle_bitset_bytes": len(pickled_same),
+            "encode_state": measure(lambda: encode_state(state)),
+            "decode_state": measure(lambda: decode_state(encoded)),
+            "encoded_bytes": len(encoded),
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Набор замеров функций, которые работают под нагрузкой: на каждое
+сообщение и на каждый раунд игры.
+
+Данные синтетические, в реальных масштабах: словарь из 10 тыс. слов,
+100 тыс. игроков в глобальной статистике, 10 тыс. чатов со своей
+статистикой и играми. Телеграм и ChatGPT заменены заглушками
+(bench.stubs), хранилища настоящие, в папке бенчмарка; бэкенды
+выбираются как обычно, например STATS_BACKEND=sqlite.
+
+Результат - JSON (время одного вызова, мкс); с путем к файлу он еще
+и записывается туда, чтобы сравнить коммиты через bench.compare:
+    python -m bench.bench_hot_paths [results.json]
+"""
+
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from bench.common import setup_env, measure, measure_async, print_results, random_word
+
+setup_env(GPT_BASE_URL="http://127.0.0.1:9/v1")
+
+from bench.stubs import install_fake_config  # noqa: E402
+
+install_fake_config()
+
+from telebot.types import Message, User  # noqa: E402
+from app.statistics import (  # noqa: E402
+    get_chat_stats,
+    get_chat_stats_filename,
+    get_global_stats,
+    inc_user_stat,
+    stats_aggregator,
+    stats_store,
+)
+from app.words_generator import get_random_word, list_of_words  # noqa: E402
+from src.game import Game, Timer  # noqa: E402
+from src.game_codec import decode_state, encode_state  # noqa: E402
+from src.settings import settings  # noqa: E402
+from src.utils import check_user_answer  # noqa: E402
+
+PLAYERS = 100_000
+CHATS = 10_000
+PLAYERS_PER_CHAT = 30
+USED_WORDS_PER_GAME = 200
+MESSAGES = 5000
+CHAT_ID = -1001000000000
+
+
+def make_user(i: int) -> User:
+    return User(10**8 + i, False, f"Игрок {i}", username=f"player{i}")
+
+
+def make_message(chat_id: int, text: str, user: User, **extra) -> Message:
+    data = {
+        "message_id": 1,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "supergroup", "title": f"Чат {chat_id}"},
+        "from": user.to_dict(),
+        "text": text,
+        **extra,
+    }
+    return Message.de_json(data)
+
+
+async def noop(*args):
+    pass
+
+
+def make_game(rnd: random.Random, chat_id: int, users: list[User]) -> Game:
+    """Игра в разгаре: пара сотен угаданных слов, идет раунд"""
+    game = Game(str(chat_id))
+    game.chat_id = chat_id
+    game.chat_title = f"Чат {chat_id}"
+    game.active = True
+    leader = rnd.choice(users)
+    game.current_leader, game.leader_name = leader.id, leader.full_name
+    for word in rnd.sample(list_of_words, USED_WORDS_PER_GAME):
+        game.used_words.add(word)
+    for user in rnd.sample(users, 8):
+        Game.player_names[user.id] = user.full_name
+        game.players.add(user.id)
+    game.define_new_word()
+    game.game_timer = Timer(settings.GAME_TIME, noop)
+    return game
+
+
+async def make_stats(rnd: random.Random, users: list[User]):
+    """Глобальная статистика и статистика CHATS чатов в хранилище"""
+    global_table = {
+        str(user.id): {"score": rnd.randint(1, 5000), "name": user.full_name}
+        for user in users
+    }
+    await stats_store.save(settings.GLOBAL_STATS_FILE, global_table)
+    for i in range(CHATS):
+        table = {
+            str(user.id): {"score": rnd.randint(1, 500), "name": user.full_name}
+            for user in rnd.sample(users, PLAYERS_PER_CHAT)
+        }
+        key = get_chat_stats_filename(CHAT_ID - i)
+        os.makedirs(os.path.dirname(key), exist_ok=True)  # Для JSON файлов
+        await stats_store.save(key, table)
+
+
+def bench_get_game_chat_id(rnd: random.Random, user: User) -> dict:
+    for i in range(CHATS):  # Посты каналов 10 тыс. чатов
+        Game.register_channel_post(f"{CHAT_ID - i}-post-{i + 1}")
+    plain = make_message(CHAT_ID, "слово", user)
+    topic = make_message(
+        CHAT_ID, "слово", user, is_topic_message=True, message_thread_id=7
+    )
+    reply = make_message(CHAT_ID - 5, "пост", make_user(777000 - 10**8))
+    post = make_message(
+        CHAT_ID - 5, "слово", user, message_thread_id=6, reply_to_message=reply.json
+    )
+    return {
+        "plain": measure(lambda: Game.get_game_chat_id(plain)),
+        "topic": measure(lambda: Game.get_game_chat_id(topic)),
+        "post": measure(lambda: Game.get_game_chat_id(post)),
+    }
+
+
+async def bench_check_user_answer(rnd: random.Random, game: Game, users) -> dict:
+    misses = [
+        make_message(game.chat_id, random_word(rnd), rnd.choice(users))
+        for _ in range(MESSAGES)
+    ]
+    it = iter(misses)
+
+    def reset():
+        nonlocal it
+        it = iter(misses)
+        game.answers_set.clear()
+
+    async def miss():
+        await check_user_answer(next(it), game)
+
+    user = users[0]
+
+    async def round_hit():
+        # Новый раунд и верный ответ: угадывание, статистика, таймеры
+        game.active = True
+        game.define_new_word()
+        game.game_timer = Timer(settings.GAME_TIME, noop)
+        message = make_message(game.chat_id, game.current_word, user)
+        await check_user_answer(message, game)
+        game.exclusive_timer.cancel()
+
+    return {
+        "miss": await measure_async(miss, MESSAGES, setup=reset),
+        "round_hit": await measure_async(round_hit, 1000),
+    }
+
+
+async def bench_state(game: Game) -> dict:
+    content = encode_state(game.save_state())
+
+    async def load():
+        await Game.load_state(decode_state(content), game_chat_id=game.game_chat_id)
+
+    return {
+        "save_state": measure(game.save_state),
+        "save_state_encoded": measure(lambda: encode_state(game.save_state())),
+        "save_game": await measure_async(game.save_game, 200),
+        "load_state_decoded": await measure_async(load, 1000),
+        "state_bytes": len(content),
+    }
+
+
+async def bench_stats(rnd: random.Random, users: list[User]) -> dict:
+    hot_game = Game(str(CHAT_ID))
+    hot_game.chat_id = CHAT_ID
+    games = []
+    for i in range(1000):
+        game = Game(str(CHAT_ID - rnd.randrange(CHATS)))
+        game.chat_id = int(game.game_chat_id)
+        games.append(game)
+
+    async def inc_hot():
+        await inc_user_stat(hot_game, rnd.choice(users))
+
+    async def inc_random_chat():
+        await inc_user_stat(rnd.choice(games), rnd.choice(users))
+
+    async def chat_stats():
+        await get_chat_stats(rnd.choice(games).chat_id)
+
+    results = {
+        "inc_user_stat_same_chat": await measure_async(inc_hot, 2000),
+        "inc_user_stat_random_chat": await measure_async(inc_random_chat, 2000),
+        "get_chat_stats": await measure_async(chat_stats, 1000),
+        "get_global_stats": await measure_async(get_global_stats, 20),
+    }
+    start = time.perf_counter()
+    await stats_aggregator.flush()
+    results["flush_after_inc_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    return results
+
+
+def commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(output: str | None):
+    rnd = random.Random(7)
+    users = [make_user(i) for i in range(PLAYERS)]
+    start = time.perf_counter()
+    await make_stats(rnd, users)
+    setup_s = time.perf_counter() - start
+
+    game = make_game(rnd, CHAT_ID, users)
+    results = {
+        "commit": commit(),
+        "scale": {"words": len(list_of_words), "players": PLAYERS, "chats": CHATS},
+        "backends": {"state": settings.STATE_BACKEND, "stats": settings.STATS_BACKEND},
+        "setup_s": round(setup_s, 1),
+        "get_game_chat_id": bench_get_game_chat_id(rnd, users[0]),
+        "get_random_word": measure(lambda: get_random_word(game)),
+        "check_user_answer": await bench_check_user_answer(rnd, game, users),
+        "state": await bench_state(game),
+        "stats": await bench_stats(rnd, users),
+    }
+    await stats_aggregator.close()
+    await Game.state_store.close()
+    print_results("hot_paths", results)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else None))
@@ -0,0 +1,78 @@
+"""
+Время записи в лог с точки зрения вызывающего (потока цикла событий).
+
+Сравниваются:
+- sync_file: прежняя схема, RotatingFileHandler прямо в логгере;
+- queue: src.log.setup_logging, запись только кладется в очередь;
+- sampled_debug: отладочная запись о сообщении с выборкой 1%;
+- debug_unsampled: та же запись без выборки;
+- disabled_debug: отладочная запись при уровне messages выше DEBUG.
+
+    python -m bench.bench_logging
+"""
+
+import logging
+import logging.handlers
+import os
+from bench.common import BENCH_DIR, setup_env, measure, print_results
+
+setup_env()
+
+from src.log import get_logger, setup_logging  # noqa: E402
+
+NUMBER = 20_000
+EXTRA = {"chat_id": -1001234567890, "user_id": 123456789, "word": "крокодил"}
+
+
+def sync_logger() -> logging.Logger:
+    logger = logging.getLogger("bench.sync")
+    handler = logging.handlers.RotatingFileHandler(
+        os.path.join(BENCH_DIR, "sync.log"),
+        maxBytes=1024 * 1024,
+        backupCount=10,
+        encoding="utf-8",
+    )
+    handler.setFormatter(
+        logging.Formatter("%(asctime)s %(name)s %(levelname)s :: %(message)s")
+    )
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+def main():
+    results = {}
+    sync = sync_logger()
+    results["sync_file"] = measure(
+        lambda: sync.info("Угадал слово", extra=EXTRA), number=NUMBER
+    )
+
+    setup_logging(
+        log_file=os.path.join(BENCH_DIR, "queue.log"),
+        level="INFO",
+        levels="messages=DEBUG",
+        sample_rate=0.01,
+        console=False,
+    )
+    game_log = get_logger("game")
+    results["queue"] = measure(
+        lambda: game_log.info("Угадал слово", extra=EXTRA), number=NUMBER
+    )
+    messages_log = get_logger("messages", sampled=True)
+    results["sampled_debug"] = measure(
+        lambda: messages_log.debug("chat_message", extra=EXTRA), number=NUMBER
+    )
+    results["debug_unsampled"] = measure(
+        lambda: messages_log.logger.debug("chat_message", extra=EXTRA), number=NUMBER
+    )
+    messages_log.logger.setLevel(logging.INFO)
+    results["disabled_debug"] = measure(
+        lambda: messages_log.debug("chat_message", extra=EXTRA), number=NUMBER
+    )
+    # Очередь дописывается при выходе (atexit в setup_logging)
+    print_results("logging", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Время проверки одного сообщения (AnswerMatcher) в точном и нечетком режимах.
+
+Сообщения: промахи, другие формы слова, опечатки и длинные сообщения.
+Выводит перцентили на сообщение; код выхода 1, если p99 нечеткого
+режима больше бюджета.
+
+    python -m bench.bench_matcher [бюджет_мкс]
+"""
+
+import random
+import sys
+import time
+from bench.common import setup_env, measure, print_results, random_word
+
+setup_env(FUZZY_ANSWERS="true")
+
+from app.words_generator import list_of_words  # noqa: E402
+from src.answer_matcher import AnswerMatcher, word_stems  # noqa: E402
+
+BUDGET_US = 200  # p99 на сообщение
+MESSAGES = 20_000
+ENDINGS = ("ы", "ами", "ов", "а", "ом", "е")
+
+
+def make_message(rnd: random.Random, word: str) -> str:
+    kind = rnd.random()
+    if kind < 0.6:  # Промах из пары слов
+        return " ".join(random_word(rnd) for _ in range(rnd.randint(1, 3)))
+    if kind < 0.75:  # Другая форма слова
+        return word + rnd.choice(ENDINGS)
+    if kind < 0.85:  # Опечатка
+        i = rnd.randrange(len(word))
+        return word[:i] + rnd.choice("абвгд") + word[i + 1 :]
+    if kind < 0.95:  # Длинное сообщение
+        return ", ".join(random_word(rnd) for _ in range(rnd.randint(20, 60))) + "?"
+    return "а" * 4096  # Флуд одним словом максимальной длины
+
+
+def percentiles(times: list[float]) -> dict:
+    times = sorted(times)
+    return {
+        f"p{p}_us": round(times[min(len(times) - 1, len(times) * p // 100)], 3)
+        for p in (50, 90, 99)
+    } | {"max_us": round(times[-1], 3)}
+
+
+def run(fuzzy: bool, rnd: random.Random) -> tuple[dict, int]:
+    times = []
+    matched = 0
+    for _ in range(MESSAGES // 100):
+        index = rnd.randrange(len(list_of_words))
+        matcher = AnswerMatcher(list_of_words[index], index, fuzzy=fuzzy)
+        for _ in range(100):
+            text = make_message(rnd, matcher.word)
+            start = time.perf_counter()
+            matched += matcher.match(text)
+            times.append((time.perf_counter() - start) * 1e6)
+    return percentiles(times), matched
+
+
+def main():
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else BUDGET_US
+    start = time.perf_counter()
+    [word_stems(word) for word in list_of_words]  # Как при загрузке словаря
+    stems_s = time.perf_counter() - start
+    exact, exact_matched = run(False, random.Random(3))
+    fuzzy, fuzzy_matched = run(True, random.Random(3))
+    word = list_of_words[0]
+    results = {
+        "words": len(list_of_words),
+        "messages": MESSAGES,
+        "exact": exact | {"matched": exact_matched},
+        "fuzzy": fuzzy | {"matched": fuzzy_matched},
+        "stems_table_s": round(stems_s, 3),
+        "build_matcher": measure(lambda: AnswerMatcher(word, 0, fuzzy=True)),
+        "budget_us": budget,
+    }
+    print_results("answer_matcher", results)
+    if fuzzy["p99_us"] > budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
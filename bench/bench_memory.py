@@ -0,0 +1,95 @@
+"""
+Память на одну игру: прежнее представление (__dict__, множества строк)
+против текущего (__slots__, битсет слов, айди игроков).
+
+    python -m bench.bench_memory
+"""
+
+import random
+import tracemalloc
+from bench.common import setup_env, print_results, random_word
+
+setup_env()
+
+from app.words_generator import list_of_words  # noqa: E402
+from src.game import Game  # noqa: E402
+
+GAMES_COUNT = 10_000
+PLAYERS_PER_GAME = 8
+USED_WORDS_PER_GAME = 50
+ANSWERS_PER_GAME = 20
+
+
+class LegacyGame:
+    """Раскладка игры до перехода на __slots__"""
+
+    def __init__(self, game_chat_id: str):
+        self.game_chat_id = game_chat_id
+        self.chat_id = int(game_chat_id)
+        self.chat_title = self.topic_id = self.topic_name = self.chat_username = None
+        self.msg_kwargs = {}
+        self.active = False
+        self.used_words = set()
+        self.game_timer = None
+        self.current_leader = None
+        self.leader_name = None
+        self.current_word = None
+        self.next_words = []
+        self.answers_set = set()
+        self.exclusive_user = None
+        self.exclusive_user_name = None
+        self.exclusive_timer = None
+        self.players = set()
+
+
+def fill(game, rnd: random.Random, players: list[tuple[int, str]], legacy: bool):
+    game.chat_title = f"Чат {game.game_chat_id}"
+    game.active = True
+    game.current_leader, game.leader_name = players[0]
+    game.current_word = rnd.choice(list_of_words)
+    for word in rnd.sample(list_of_words, USED_WORDS_PER_GAME):
+        game.used_words.add(word)
+    for _ in range(ANSWERS_PER_GAME):
+        game.answers_set.add(random_word(rnd))
+    for player_id, name in rnd.sample(players, PLAYERS_PER_GAME):
+        if legacy:
+            game.players.add(f"{player_id} {name}")
+        else:
+            Game.player_names[player_id] = name
+            game.players.add(player_id)
+
+
+def measure_games(legacy: bool) -> int:
+    rnd = random.Random(3)
+    # Игроки пересекаются между чатами, как в жизни
+    players = [(10**8 + i, f"Игрок {i} @player{i}") for i in range(GAMES_COUNT)]
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    games = []
+    for i in range(GAMES_COUNT):
+        game_chat_id = str(-10**12 - i)
+        game = LegacyGame(game_chat_id) if legacy else Game(game_chat_id)
+        fill(game, rnd, players, legacy)
+        games.append(game)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    Game.player_names.clear()
+    return current - start
+
+
+def main():
+    before = measure_games(legacy=True)
+    after = measure_games(legacy=False)
+    print_results(
+        "game_memory",
+        {
+            "games": GAMES_COUNT,
+            "before_bytes_per_game": before // GAMES_COUNT,
+            "after_bytes_per_game": after // GAMES_COUNT,
+            "ratio": round(after / before, 3),
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
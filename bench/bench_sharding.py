@@ -0,0 +1,156 @@
+"""
+Пропускная способность шардированного режима в зависимости от числа воркеров.
+
+Настоящий фронт (src.sharding.ShardFront) запускает воркеров этого же
+модуля. Воркер принимает обновления тем же WebhookServer, что и бот, а на
+каждое сообщение выполняет работу процессора бота: проверку ответа
+(AnswerMatcher), кодирование состояния игры и JSON статистики чата.
+Обновления приходят на вебхук фронта из множества чатов; замеряется
+время до обработки всех обновлений всеми воркерами.
+
+Рост пропускной способности ограничен числом ядер (cpu_count в выводе).
+
+    python -m bench.bench_sharding [число_воркеров ...]
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from bench.common import setup_env, print_results, random_word
+
+setup_env(FUZZY_ANSWERS="true")
+
+import aiohttp  # noqa: E402
+from aiohttp import web  # noqa: E402
+from app.words_generator import list_of_words  # noqa: E402
+from bench.bench_codec import make_state  # noqa: E402
+from src.answer_matcher import AnswerMatcher, fold_answer  # noqa: E402
+from src.game_codec import encode_state  # noqa: E402
+from src.sharding import ShardFront  # noqa: E402
+from src.webhook import WebhookServer  # noqa: E402
+from tools.post_updates import make_update, post_updates  # noqa: E402
+
+SHARDS = (1, 2, 4)
+UPDATES = 4000
+CHATS = 200
+BASE_PORT = 18100
+
+
+class HotPathBot:
+    """Вместо обработчиков бота - их работа процессора на каждое сообщение"""
+
+    def __init__(self):
+        rnd = random.Random(os.getpid())
+        self.state = make_state(rnd, legacy=False)
+        self.matcher = AnswerMatcher(self.state["current_word"])
+        self.stats = {
+            str(rnd.randint(10**8, 10**9)): {"score": i, "name": f"Игрок {i}"}
+            for i in range(50)
+        }
+        self.processed = 0
+
+    async def process_new_updates(self, updates):
+        for update in updates:
+            text = update.message.text
+            self.state["answers_set"].add(fold_answer(text))
+            self.matcher.match(text)
+            encode_state(self.state)
+            json.dumps(self.stats, indent=4, ensure_ascii=False)
+            self.processed += 1
+
+
+class BenchWorker(WebhookServer):
+    def make_app(self) -> web.Application:
+        app = super().make_app()
+        app.router.add_get("/processed", self.processed)
+        return app
+
+    async def processed(self, request: web.Request) -> web.Response:
+        return web.json_response(self.bot.processed)
+
+
+async def run_worker():
+    worker = BenchWorker(
+        HotPathBot(),
+        path=os.environ["WEBHOOK_PATH"],
+        secret_token=os.environ["WEBHOOK_SECRET"],
+    )
+    await worker.start("127.0.0.1", int(os.environ["WEBHOOK_PORT"]))
+    await asyncio.Event().wait()
+
+
+async def processed(session: aiohttp.ClientSession, front: ShardFront) -> int | None:
+    """Обработано всеми воркерами, None - не все воркеры запущены"""
+    total = 0
+    for worker in front.workers:
+        url = worker.url.rsplit("/", 1)[0] + "/processed"
+        try:
+            async with session.get(url) as response:
+                total += await response.json()
+        except aiohttp.ClientError:
+            return None
+    return total
+
+
+def make_updates(rnd: random.Random) -> list[dict]:
+    words = rnd.sample(list_of_words, 50)
+    return [
+        make_update(
+            i,
+            -1001000000000 - rnd.randrange(CHATS),
+            rnd.randrange(10**8, 10**9),
+            rnd.choice(words) if rnd.random() < 0.3 else random_word(rnd),
+        )
+        for i in range(1, UPDATES + 1)
+    ]
+
+
+async def run(shards: int, updates: list[dict]) -> dict:
+    front = ShardFront(
+        None,
+        shards=shards,
+        base_port=BASE_PORT,
+        command=[sys.executable, "-m", "bench.bench_sharding", "worker"],
+        secret_token="bench",
+    )
+    front.start_workers()
+    await front.start("127.0.0.1", 0)
+    async with aiohttp.ClientSession() as session:
+        while await processed(session, front) is None:
+            await asyncio.sleep(0.1)
+        start = time.perf_counter()
+        posted = await post_updates(front.url, "bench", updates)
+        while await processed(session, front) < len(updates):
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - start
+    await front.stop()
+    return {
+        "updates_per_s": round(len(updates) / elapsed, 1),
+        "seconds": round(elapsed, 3),
+        "front_accept_per_s": posted["updates_per_s"],
+    }
+
+
+async def main(shards_list):
+    updates = make_updates(random.Random(5))
+    results = {"cpu_count": os.cpu_count(), "updates": len(updates)}
+    for shards in shards_list:
+        results[f"shards_{shards}"] = await run(shards, updates)
+    base = results[f"shards_{shards_list[0]}"]["updates_per_s"]
+    for shards in shards_list:
+        result = results[f"shards_{shards}"]
+        result["speedup"] = round(result["updates_per_s"] / base, 2)
+    print_results("sharding", results)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["worker"]:
+        try:
+            asyncio.run(run_worker())
+        except KeyboardInterrupt:
+            pass  # Фронт останавливает воркеров через SIGINT
+    else:
+        asyncio.run(main([int(arg) for arg in sys.argv[1:]] or list(SHARDS)))
@@ -0,0 +1,95 @@
+"""
+Общее для бенчмарков: окружение без .env и синтетические данные.
+
+Бенчмарки запускаются из корня проекта, например:
+    python -m bench.bench_codec
+"""
+
+import json
+import os
+import random
+import tempfile
+import time
+import timeit
+
+BENCH_DIR = tempfile.mkdtemp(prefix="crocobot-bench-")
+WORDS_COUNT = 10_000
+
+LETTERS = "абвгдежзиклмнопрстуфхцчшщыэюя"
+
+
+def random_word(rnd: random.Random, min_len=4, max_len=12) -> str:
+    return "".join(rnd.choice(LETTERS) for _ in range(rnd.randint(min_len, max_len)))
+
+
+def setup_env(words_count: int = WORDS_COUNT, **overrides):
+    """
+    Заполняет переменные окружения для Settings и создает словарь
+    из words_count синтетических слов. Вызывать до импорта модулей проекта.
+    """
+    rnd = random.Random(1)
+    words = set()
+    while len(words) < words_count:
+        words.add(random_word(rnd))
+    words_file = os.path.join(BENCH_DIR, "words.txt")
+    with open(words_file, "w", encoding="utf-8") as f:
+        f.write("\n".join(sorted(words)))
+
+    state_dir = os.path.join(BENCH_DIR, "state") + os.sep
+    stats_dir = os.path.join(BENCH_DIR, "stats")
+    os.makedirs(state_dir, exist_ok=True)
+    os.makedirs(stats_dir, exist_ok=True)
+    env = dict(
+        BOT_TOKEN="1:bench",
+        TESTERS_IDS="1",
+        LOG_FILE=os.path.join(BENCH_DIR, "log.txt"),
+        LOG_LEVEL="INFO",
+        WORDS_FILE=words_file,
+        STATE_SAVE_DIR=state_dir,
+        CHATS_STATS_DIR=stats_dir,
+        GLOBAL_STATS_FILE=os.path.join(stats_dir, "global.json"),
+        GAME_TIME="300",
+        EXCLUSIVE_TIME="15",
+        FAULT_SIZE="3",
+        CHAT_STATS_SIZE="10",
+        GLOBAL_STATS_SIZE="10",
+        CHAT_PAGE_SIZE="10",
+        GPT_INJECTION="false",
+        OPEN_API_KEY="bench",
+        GPT_MODEL="bench",
+        PROMPT_FILE=os.path.join(BENCH_DIR, "prompt.txt"),
+        STATS_DB_FILE=os.path.join(BENCH_DIR, "stats.db"),
+        STATE_DB_FILE=os.path.join(BENCH_DIR, "games.db"),
+    )
+    env.update({key: str(value) for key, value in overrides.items()})
+    os.environ.update(env)
+
+
+def measure(func, number: int = None, repeat: int = 5) -> dict:
+    """Время одного вызова func в микросекундах (лучшее и медиана из repeat)"""
+    timer = timeit.Timer(func)
+    if number is None:
+        number, _ = timer.autorange()
+    times = sorted(t / number * 1e6 for t in timer.repeat(repeat, number))
+    return {"best_us": round(times[0], 3), "median_us": round(times[len(times) // 2], 3)}
+
+
+def print_results(name: str, results: dict):
+    print(json.dumps({"benchmark": name, "results": results}, ensure_ascii=False, indent=2))
+
+
+async def measure_async(func, number: int, repeat: int = 5, setup=None) -> dict:
+    """
+    Как measure, но для корутинной функции, в уже работающем цикле событий.
+    setup() вызывается перед каждым повтором и в замер не входит.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            await func()
+        times.append((time.perf_counter() - start) / number * 1e6)
+    times.sort()
+    return {"best_us": round(times[0], 3), "median_us": round(times[len(times) // 2], 3)}
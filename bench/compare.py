@@ -0,0 +1,58 @@
+"""
+Сравнение двух результатов bench.bench_hot_paths (например, двух коммитов).
+
+Для каждого замера выводит медианы и их отношение; код выхода 1,
+если какой-то замер медленнее порога (по умолчанию в 1.2 раза).
+
+    python -m bench.compare old.json new.json [порог]
+"""
+
+import json
+import sys
+
+THRESHOLD = 1.2
+
+
+def flatten(results: dict, prefix: str = "") -> dict[str, float]:
+    """{"state": {"save_game": {"median_us": 1}}} -> {"state.save_game": 1}"""
+    flat = {}
+    for key, value in results.items():
+        if not isinstance(value, dict):
+            continue
+        name = f"{prefix}{key}"
+        if "median_us" in value:
+            flat[name] = value["median_us"]
+        else:
+            flat.update(flatten(value, name + "."))
+    return flat
+
+
+def load(file: str) -> dict:
+    with open(file, encoding="utf-8") as f:
+        data = json.load(f)
+    return data.get("results", data)
+
+
+def main(old_file: str, new_file: str, threshold: float = THRESHOLD):
+    old, new = load(old_file), load(new_file)
+    old_times, new_times = flatten(old), flatten(new)
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+    regressions = []
+    for name, old_time in old_times.items():
+        if (new_time := new_times.get(name)) is None:
+            continue
+        ratio = new_time / old_time if old_time else float("inf")
+        mark = ""
+        if ratio > threshold:
+            mark = "  <-- медленнее"
+            regressions.append(name)
+        print(f"{name:45} {old_time:12.3f} {new_time:12.3f} {ratio:7.2f}x{mark}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(2)
+    main(sys.argv[1], sys.argv[2], *map(float, sys.argv[3:4]))
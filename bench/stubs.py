@@ -0,0 +1,50 @@
+"""
+Заглушки внешних сервисов для бенчмарков.
+
+src.config при импорте подключается к телеграму, поэтому вместо него
+в sys.modules ставится модуль с тем же содержимым, но с ботом без сети.
+ChatGPT не вызывается (GPT_INJECTION=false в setup_env), а его адрес
+можно направить в никуда через GPT_BASE_URL.
+"""
+
+import sys
+import types
+from collections import Counter
+
+
+class StubBot:
+    """Бот без сети: методы API ничего не отправляют, вызовы только считаются"""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.send_queue = None
+
+    def __getattr__(self, name: str):
+        if name.endswith("_handler"):  # Декораторы обработчиков
+            return lambda *args, **kwargs: (lambda func: func)
+
+        async def method(*args, **kwargs):
+            self.calls[name] += 1
+
+        return method
+
+
+def install_fake_config() -> types.ModuleType:
+    """Подменяет src.config; вызывать после setup_env и до импорта модулей бота"""
+    from src.log import get_logger
+    from src.settings import settings
+
+    async def set_chat_admin_commands(chat_id):
+        return True
+
+    config = types.ModuleType("src.config")
+    config.settings = settings
+    config.TESTERS_IDS = tuple(map(int, settings.TESTERS_IDS.split(",")))
+    config.games = {}
+    config.bot = StubBot()
+    config.bot_username = "bench_bot"
+    config.bot_title = "Bench"
+    config.logger = get_logger()
+    config.set_chat_admin_commands = set_chat_admin_commands
+    sys.modules["src.config"] = config
+    return config
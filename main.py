@@ -2,12 +2,21 @@ import asyncio
 from datetime import datetime
 from telebot.types import Message, CallbackQuery
 from telebot import util
-from src.config import bot, bot_title, games, TESTERS_IDS
+from src.config import bot, bot_title, games, settings, TESTERS_IDS
 import src.user_interface as ui
+from src.send_queue import NOTIFICATION
+from src.log import get_logger
+from src.runtime_stats import collect, runtime_stats_loop
+from src import metrics
+from src.webhook import WebhookServer
 from src.utils import (
     is_group_command,
     is_group_message,
+    load_game_ids,
     load_games,
+    chat_commands,
+    deleter,
+    error_reporter,
     check_user_answer,
     log_game,
 )
@@ -17,15 +26,21 @@ from app.statistics import (
     get_chat_stats,
     inc_user_fine,
     clear_chat_stats,
+    stats_aggregator,
 )
+from app.gpt_pool import gpt_pool
+from app.prompts import prompts
 import app.admin  # don't remove
 
+messages_log = get_logger("messages", sampled=True)  # DEBUG выборочно
+commands_log = get_logger("commands")
+
 
 @bot.message_handler(
     commands=["start"],
     func=lambda message: message.chat.type == "private",
 )
-async def start_command(message: Message):
+async def start_private_command(message: Message):
     """Старт в приватном чате"""
     return await bot.reply_to(message, **ui.get_welcome_message(bot_title))
 
@@ -52,12 +67,18 @@ async def start_command(message: Message):
 @bot.message_handler(commands=["stop", "clear"], func=is_group_command)
 async def chat_admin_commands(message: Message):
     """Команды для администраторов чата"""
-    print("chat_admin_commands")
     chat_id = message.chat.id
-    print(chat_id)
-    print(message.from_user.id, message.from_user.username, message.from_user.full_name)
     chat_member = await bot.get_chat_member(chat_id, message.from_user.id)
-    print(chat_member.status)
+    commands_log.info(
+        "chat_admin_commands",
+        extra={
+            "chat_id": chat_id,
+            "user_id": message.from_user.id,
+            "username": message.from_user.username,
+            "status": chat_member.status,
+            "command": message.text,
+        },
+    )
     if (
         chat_member.status in ("creator", "administrator")
         or message.from_user.username == "GroupAnonymousBot"
@@ -77,7 +98,10 @@ async def start_game(game, chat_id, user):
         args = game.exclusive_user, game.exclusive_user_name
         log_game("Получил штраф", game, args)
         await bot.send_message(
-            chat_id, **ui.get_fault_message(*args), **game.msg_kwargs
+            chat_id,
+            **ui.get_fault_message(*args),
+            **game.msg_kwargs,
+            priority=NOTIFICATION,
         )
 
 
@@ -105,20 +129,27 @@ async def stats(message: Message):
 async def end_game(game):
     """Отправляем сообщение об окончании игры"""
     await bot.send_message(
-        game.chat_id, **ui.get_end_game_message(game.current_word), **game.msg_kwargs
+        game.chat_id,
+        **ui.get_end_game_message(game.current_word),
+        **game.msg_kwargs,
+        priority=NOTIFICATION,
     )
 
 
 @bot.message_handler(content_types=["text"], func=is_group_message)
 async def chat_messages(message: Message):
     """Обработчик сообщений в чатах"""
-    if message.from_user.id in TESTERS_IDS:
-        print(":" * 55)
-        print(f"{message.is_topic_message=}")
-        print(f"{message.message_thread_id=}")
     chat_id = message.chat.id
-    log = f"{chat_id} `{message.chat.title}` {message.from_user.full_name} :: {message.text}"
-    print(log)
+    messages_log.debug(
+        "chat_message",
+        extra={
+            "chat_id": chat_id,
+            "chat_title": message.chat.title,
+            "user_id": message.from_user.id,
+            "thread_id": message.message_thread_id,
+            "text": message.text,
+        },
+    )
     chat_game = await Game.get_game(message)
 
     # Если игра не активна либо пишет ведущий, то выходим
@@ -126,10 +157,7 @@ async def chat_messages(message: Message):
         return
     result = await check_user_answer(message, chat_game)  # Проверяем ответ из чата
     if result == -1:  # Повторный ответ
-        try:
-            await bot.delete_message(chat_id, message.message_id)
-        except:
-            pass
+        deleter.add(chat_id, message.message_id)
     elif result:  # Угадал слово
         log_game("Угадал слово", chat_game, message.from_user)
         await bot.send_message(
@@ -195,7 +223,6 @@ async def callback_handler(call: CallbackQuery):
         )
     elif call.data == "change_word" and call.from_user.id == chat_game.current_leader:
         chat_game.define_new_word()
-        await chat_game.save_game()
         log_game("Сменил слово", chat_game, call.from_user)
         await bot.answer_callback_query(
             call.id, text=f"Ваше новое слово: {chat_game.current_word}", show_alert=True
@@ -207,8 +234,74 @@ async def callback_handler(call: CallbackQuery):
 
 
 async def start_bot():
-    await load_games(end_game_func=end_game)
-    await bot.infinity_polling()
+    await load_game_ids(end_game_func=end_game)
+    # Сами игры грузятся параллельно с работой бота
+    loading = asyncio.create_task(load_games())
+    stats_aggregator.start()
+    Game.state_writer.start()
+    chat_commands.start()
+    error_reporter.start()
+    if settings.GPT_INJECTION:
+        # Запасы ответов под все промпты начинают наполняться сразу
+        for name in prompts.names():
+            if prompt := prompts.get(name):
+                gpt_pool.add_prompt(name, prompt)
+        gpt_pool.start()
+    eviction = asyncio.create_task(
+        Game.eviction_loop(
+            settings.GAMES_EVICT_INTERVAL,
+            settings.GAMES_IDLE_TIME,
+            settings.GAMES_CACHE_SIZE,
+        )
+    )
+    background = [loading, eviction]
+    if settings.RUNTIME_STATS_INTERVAL:
+        sources = {"send_queue": bot.send_queue.stats} if bot.send_queue else {}
+        background.append(
+            asyncio.create_task(
+                runtime_stats_loop(settings.RUNTIME_STATS_INTERVAL, **sources)
+            )
+        )
+    metrics_server = None
+    if settings.METRICS_PORT:
+        metrics.add_gauges("crocobot", collect)
+        if bot.send_queue:
+            metrics.add_gauges("crocobot_send_queue", bot.send_queue.stats)
+        metrics.add_gauges("crocobot_gpt_pool", gpt_pool.stats)
+        # Воркеры шардов слушают соседние порты
+        metrics_server = await metrics.start_server(
+            settings.METRICS_HOST, settings.METRICS_PORT + settings.SHARD_INDEX
+        )
+    try:
+        if settings.UPDATES_MODE == "webhook":
+            webhook = WebhookServer(
+                bot,
+                path=settings.WEBHOOK_PATH,
+                secret_token=settings.WEBHOOK_SECRET,
+                drain_timeout=settings.WEBHOOK_DRAIN_TIMEOUT,
+            )
+            await webhook.serve(
+                settings.WEBHOOK_HOST,
+                settings.WEBHOOK_PORT,
+                url=settings.WEBHOOK_URL,
+                max_connections=settings.WEBHOOK_MAX_CONNECTIONS,
+            )
+        else:
+            await bot.infinity_polling()
+    finally:
+        for task in background:
+            task.cancel()
+        chat_commands.stop()
+        gpt_pool.stop()
+        await deleter.close()
+        await error_reporter.close()
+        if bot.send_queue:
+            await bot.send_queue.close()
+        await Game.state_writer.close()
+        await Game.state_store.close()
+        await stats_aggregator.close()
+        if metrics_server is not None:
+            await metrics_server.cleanup()
 
 
 if __name__ == "__main__":
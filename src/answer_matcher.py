@@ -0,0 +1,168 @@
+"""
+Проверка ответов игроков.
+
+Загаданное слово разбирается на слова один раз за раунд (AnswerMatcher),
+а каждое сообщение нормализуется один раз: нижний регистр, ё -> е,
+й -> и, все кроме букв а-я и a-z -> пробел (одним заранее
+скомпилированным выражением).
+
+С FUZZY_ANSWERS засчитываются и другие формы слова ("крокодилы" за
+"крокодил"), и одна опечатка (замена, вставка, пропуск или перестановка
+соседних букв) в словах не короче FUZZY_MIN_LENGTH. Слова сравниваются
+по основам без окончаний, основы слов словаря считаются при загрузке.
+Кандидаты с опечаткой ищутся по индексу удалений: основа загаданного
+слова и все ее варианты без одной буквы, так что на слово сообщения
+приходится O(длина слова) поисков в словаре. Число и длина проверяемых
+слов сообщения ограничены, поэтому время проверки ограничено сверху.
+"""
+
+import re
+from app.words_generator import list_of_words
+from src.settings import settings
+
+_NON_LETTERS = re.compile(r"[^а-яa-z]+")
+
+MAX_TOKENS = 24  # Сколько слов сообщения проверяем в нечетком режиме
+MIN_STEM_LENGTH = 3  # Короче основу не обрезаем
+
+# Окончания существительных и прилагательных после замены й -> и, ё -> е.
+# Глагольные не берем: загадываются в основном существительные,
+# а "ил", "ат" и подобные портят их основы
+_ENDINGS = frozenset(
+    (
+        "ими", "ыми", "ого", "его", "ому", "ему", "ая", "яя", "ое", "ее",
+        "ие", "ые", "ои", "ии", "ыи", "ую", "юю", "ых", "их", "ым", "им",
+        "ами", "ями", "иями", "ах", "ях", "ам", "ям", "ов", "ев", "еи", "ом",
+        "ем", "ою", "ею", "ию", "ия", "ье", "ья", "ьи", "ью",
+        "а", "я", "о", "е", "ы", "и", "у", "ю", "ь",
+    )
+)  # fmt: skip
+_ENDING_LENGTHS = sorted({len(ending) for ending in _ENDINGS}, reverse=True)
+
+
+def fold_answer(text: str) -> str:
+    """Ключ ответа для поиска повторов: нижний регистр, ё -> е, й -> и"""
+    return text.lower().replace("ё", "е").replace("й", "и")
+
+
+def normalize_tokens(text: str) -> list[str]:
+    """Слова текста после нормализации"""
+    return _NON_LETTERS.sub(" ", fold_answer(text)).split()
+
+
+def stem(token: str) -> str:
+    """Основа нормализованного слова: отрезаем самое длинное окончание"""
+    for length in _ENDING_LENGTHS:
+        if len(token) - length >= MIN_STEM_LENGTH and token[-length:] in _ENDINGS:
+            return token[:-length]
+    return token
+
+
+def word_stems(word: str) -> tuple[str, ...]:
+    return tuple(stem(token) for token in normalize_tokens(word))
+
+
+def deletes(token: str) -> list[str]:
+    """Слово и все его варианты без одной буквы"""
+    return [token] + [token[:i] + token[i + 1 :] for i in range(len(token))]
+
+
+def within_one_typo(a: str, b: str) -> bool:
+    """Расстояние Дамерау-Левенштейна (OSA) между словами не больше 1"""
+    if a == b:
+        return True
+    len_a, len_b = len(a), len(b)
+    if len_a > len_b:
+        a, b, len_a, len_b = b, a, len_b, len_a
+    if len_b - len_a > 1:
+        return False
+    i = 0
+    while i < len_a and a[i] == b[i]:
+        i += 1
+    if len_a == len_b:
+        # Замена одной буквы или перестановка соседних
+        return a[i + 1 :] == b[i + 1 :] or (
+            a[i + 2 :] == b[i + 2 :] and a[i : i + 2] == b[i + 1 : i + 2] + b[i : i + 1]
+        )
+    return a[i:] == b[i + 1 :]  # Лишняя буква в более длинном
+
+
+# Основы всех слов словаря по их номерам
+list_of_stems: list[tuple[str, ...]] = (
+    [word_stems(word) for word in list_of_words] if settings.FUZZY_ANSWERS else []
+)
+
+
+class AnswerMatcher:
+    """Проверка, что в сообщении есть все слова загаданного слова"""
+
+    __slots__ = (
+        "word",
+        "tokens",
+        "fuzzy",
+        "stems",
+        "stem_positions",
+        "typo_index",
+        "typo_lengths",
+        "token_lengths",
+    )
+
+    def __init__(self, word: str, index: int | None = None, fuzzy: bool = None):
+        """
+        :param word: загаданное слово
+        :param index: номер слова в словаре, чтобы взять готовые основы
+        :param fuzzy: нечеткий режим, по умолчанию из настроек
+        """
+        self.word = word
+        self.tokens = frozenset(normalize_tokens(word))
+        self.fuzzy = settings.FUZZY_ANSWERS if fuzzy is None else fuzzy
+        self.stems: tuple[str, ...] = ()
+        self.stem_positions: dict[str, list[int]] = {}  # Основа -> номера слов
+        self.typo_index: dict[str, list[int]] = {}  # Вариант основы -> номера слов
+        self.typo_lengths: set[int] = set()  # Длины основ с возможной опечаткой
+        self.token_lengths: set[int] = set()  # Длины слов, которые стоит проверять
+        if not self.fuzzy:
+            return
+        if index is not None and index < len(list_of_stems):
+            self.stems = list_of_stems[index]
+        else:
+            self.stems = word_stems(word)
+        for position, word_stem in enumerate(self.stems):
+            self.stem_positions.setdefault(word_stem, []).append(position)
+            if len(word_stem) >= settings.FUZZY_MIN_LENGTH:
+                self.typo_lengths.update(range(len(word_stem) - 1, len(word_stem) + 2))
+                for variant in deletes(word_stem):
+                    self.typo_index.setdefault(variant, []).append(position)
+        max_ending = _ENDING_LENGTHS[0]
+        for length in self.typo_lengths | {len(word_stem) for word_stem in self.stems}:
+            self.token_lengths.update(range(length, length + max_ending + 1))
+
+    def match(self, text: str) -> bool:
+        tokens = normalize_tokens(text)
+        if self.tokens.isdisjoint(tokens):  # Ни одного общего слова
+            return self.fuzzy and self._match_fuzzy(tokens)
+        return self.tokens.issubset(tokens) or (
+            self.fuzzy and self._match_fuzzy(tokens)
+        )
+
+    def _match_fuzzy(self, tokens: list[str]) -> bool:
+        stems = self.stems
+        if not stems:
+            return False
+        left = set(range(len(stems)))  # Еще не найденные слова
+        for token in tokens[:MAX_TOKENS]:
+            if len(token) not in self.token_lengths:
+                continue  # Ни основа, ни опечатка не подойдут по длине
+            token_stem = stem(token)
+            for position in self.stem_positions.get(token_stem, ()):
+                left.discard(position)
+            if left and len(token_stem) in self.typo_lengths:
+                for variant in deletes(token_stem):
+                    for position in self.typo_index.get(variant, ()):
+                        if position in left and within_one_typo(
+                            token_stem, stems[position]
+                        ):
+                            left.discard(position)
+            if not left:
+                return True
+        return False
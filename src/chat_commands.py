@@ -0,0 +1,77 @@
+"""
+Фоновая установка команд админам чатов.
+
+При старте бота команды ставятся не во время загрузки игр,
+а отдельной задачей уже после запуска polling, не чаще RATE запросов в секунду.
+Ответ 429 от телеграма приостанавливает только эту задачу.
+"""
+
+import asyncio
+from telebot.apihelper import ApiTelegramException
+from src.log import get_logger
+
+log = get_logger("chat_commands")
+
+
+class ChatCommandsRegistrar:
+    def __init__(self, register_func, rate: float, on_blocked=None):
+        """
+        :param register_func: корутина установки команд чату,
+            возвращает -1 если чат недоступен, 429 пробрасывает исключением
+        :param rate: запросов в секунду
+        :param on_blocked: корутина, вызывается для недоступных чатов
+        """
+        self.register_func = register_func
+        self.interval = 1 / rate
+        self.on_blocked = on_blocked
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._seen: set = set()  # Чаты, уже поставленные в очередь
+        self._task: asyncio.Task | None = None
+
+    def add(self, chat_id: int | None):
+        """Ставит чат в очередь, каждый чат один раз"""
+        if chat_id is None or chat_id in self._seen:
+            return
+        self._seen.add(chat_id)
+        self._queue.put_nowait(chat_id)
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    async def _worker(self):
+        done = 0
+        while True:
+            chat_id = await self._queue.get()
+            try:
+                result = await self.register_func(chat_id)
+            except ApiTelegramException as ex:
+                # Защита телеграма от спама, ждем и повторяем
+                retry_after = ex.result_json["parameters"]["retry_after"]
+                log.warning(
+                    "429", extra={"retry_after": retry_after, "pending": self.pending}
+                )
+                self._queue.put_nowait(chat_id)
+                await asyncio.sleep(retry_after)
+                continue
+            except Exception as e:
+                log.error(
+                    "register failed", extra={"chat_id": chat_id, "error": repr(e)}
+                )
+                result = None
+            if result == -1 and self.on_blocked is not None:
+                await self.on_blocked(chat_id)
+            done += 1
+            if not self.pending:
+                log.info("queue drained", extra={"done": done})
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Запуск фоновой задачи, вызывается из работающего цикла событий"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._worker())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -3,8 +3,7 @@
 """
 
 import asyncio
-import logging.handlers
-from telebot import TeleBot
+from telebot import asyncio_helper
 from telebot.asyncio_storage import StatePickleStorage
 from telebot.apihelper import ApiTelegramException
 from telebot.types import (
@@ -14,25 +13,47 @@ from telebot.types import (
     BotCommandScopeAllPrivateChats,
     BotCommandScopeChatAdministrators,
 )
+from src.log import setup_logging, get_logger
+from src.metrics import instrument_api
 from src.my_telebot import MyTeleBot
+from src.send_queue import SendQueue
+from src.sharding import shard_file
+from src.tracing import setup_tracing
 from .settings import settings
 
 TESTERS_IDS = tuple(map(int, settings.TESTERS_IDS.split(",")))
 print(f"{TESTERS_IDS=}")
 
+if settings.BOT_API_URL:
+    # Например, локальная заглушка tools/fake_bot_api.py
+    asyncio_helper.API_URL = settings.BOT_API_URL
+instrument_api()  # Время и коды ответов Bot API в метриках
+
 games = {}  # Словарь с активными играми в чатах
+chat_commands_log = get_logger("chat_commands")
 
 
 async def init_telegram_bot():
+    send_queue = SendQueue(
+        global_rate=settings.SEND_GLOBAL_RATE / settings.SHARDS,  # Делят воркеры
+        chat_rate=settings.SEND_CHAT_RATE,
+        group_rate=settings.SEND_GROUP_RATE,
+        chat_burst=settings.SEND_CHAT_BURST,
+        max_retries=settings.SEND_MAX_RETRIES,
+    )
     bot = MyTeleBot(
-        settings.BOT_TOKEN, tester_ids=TESTERS_IDS, state_storage=StatePickleStorage()
+        settings.BOT_TOKEN,
+        tester_ids=TESTERS_IDS,
+        send_queue=send_queue,
+        state_storage=StatePickleStorage(shard_file("./.state-save/states.pkl")),
     )
-    sync_bot = TeleBot(settings.BOT_TOKEN)
     await bot.init_common_sate()
     get_me = await bot.get_me()
     bot_username = get_me.username
     bot_title = get_me.full_name
     print(f"@{bot_username} {bot_title}")
+    if settings.SHARD_INDEX != 0:
+        return bot, bot_username, bot_title  # Общие команды ставит воркер 0
     await bot.set_my_commands(
         [
             BotCommand("start", "Начало"),
@@ -55,17 +76,18 @@ async def init_telegram_bot():
             ],
             scope=BotCommandScopeChat(tester_id),
         )
-    return bot, bot_username, bot_title, sync_bot
+    return bot, bot_username, bot_title
 
 
-bot, bot_username, bot_title, sync_bot = asyncio.run(init_telegram_bot())
+bot, bot_username, bot_title = asyncio.run(init_telegram_bot())
 
 
 async def set_chat_admin_commands(chat_id):
     """
     Устанавливает команды для админов чата.
     Заодно проверяет заблокирован ли бот в чате.
-    Если заблокирован, то возвращаем None
+    Если заблокирован, то возвращаем -1.
+    Ошибку 429 пробрасываем, ожиданием занимается вызывающий
     """
     try:
         await bot.set_my_commands(
@@ -80,31 +102,23 @@ async def set_chat_admin_commands(chat_id):
         )
         return True
     except ApiTelegramException as ex:
-        print("ApiTelegramException", ex.error_code)
         if ex.error_code == 429:  # Защита телеграма от спама
-            await asyncio.sleep(ex.result_json["parameters"]["retry_after"])
-            return
-        elif ex.error_code in (400, 403):  # Бот заблокирован
-            print(f"Error in set_chat_admin_commands\n{ex}\n{chat_id=}")
+            raise
+        extra = {"chat_id": chat_id, "code": ex.error_code, "error": str(ex)}
+        if ex.error_code in (400, 403):  # Бот заблокирован
+            chat_commands_log.info("chat unavailable", extra=extra)
             return -1
+        chat_commands_log.error("set_chat_admin_commands failed", extra=extra)
     except Exception as e:
-        print("Exception")
-        print(e)
-
-
-def get_logger():
-    # Настройка логирования
-    file_handler = logging.handlers.RotatingFileHandler(
-        settings.LOG_FILE, maxBytes=1024 * 1024, backupCount=10, encoding="utf-8"
-    )
-    file_formatter = logging.Formatter("%(asctime)s :: %(message)s")
-    file_handler.setFormatter(file_formatter)
-    logger = logging.getLogger(__name__)
-    logger.setLevel(settings.LOG_LEVEL)
-    logger.addHandler(file_handler)
-    logger.info("Start")
-
-    return logger
+        chat_commands_log.error(
+            "set_chat_admin_commands failed",
+            extra={"chat_id": chat_id, "error": repr(e)},
+        )
 
 
+setup_logging(shard_file(settings.LOG_FILE))
+setup_tracing(
+    shard_file(settings.TRACE_FILE), settings.TRACE_SAMPLE_RATE, settings.TRACE_MIN_MS
+)
 logger = get_logger()
+logger.info("Start")
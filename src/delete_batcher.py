@@ -0,0 +1,114 @@
+"""
+Пакетное удаление повторных ответов.
+
+Вместо вызова deleteMessage на каждое сообщение айди копятся по чату
+в течение window секунд и удаляются одним deleteMessages (до 100 за раз).
+Если в чате удалить не получается несколько раз подряд (нет прав),
+чат на время исключается и сообщения в нем не удаляются.
+"""
+
+import asyncio
+import time
+from telebot.apihelper import ApiTelegramException
+from src.log import get_logger
+
+log = get_logger("delete")
+
+MAX_BATCH = 100  # Ограничение deleteMessages
+
+
+class DeleteBatcher:
+    def __init__(
+        self,
+        delete_func,
+        window: float = 1,
+        max_failures: int = 3,
+        block_time: float = 3600,
+    ):
+        """
+        :param delete_func: корутина delete_messages(chat_id, message_ids)
+        :param window: сколько секунд копим айди сообщений чата
+        :param max_failures: после скольких неудач подряд перестаем удалять
+        :param block_time: на сколько секунд перестаем удалять в чате
+        """
+        self.delete_func = delete_func
+        self.window = window
+        self.max_failures = max_failures
+        self.block_time = block_time
+        self._pending: dict[int, list[int]] = {}  # Чат -> айди сообщений
+        self._timers: dict[int, asyncio.TimerHandle] = {}
+        self._failures: dict[int, int] = {}  # Неудачи подряд по чатам
+        self._blocked: dict[int, float] = {}  # Чат -> до какого времени не удаляем
+        self._flushing: set[asyncio.Task] = set()
+        self.deleted = 0
+        self.calls = 0
+
+    def is_blocked(self, chat_id: int) -> bool:
+        until = self._blocked.get(chat_id)
+        if until is None:
+            return False
+        if until > time.time():
+            return True
+        del self._blocked[chat_id]
+        return False
+
+    def add(self, chat_id: int, message_id: int):
+        """Ставит сообщение в очередь на удаление"""
+        if self.is_blocked(chat_id):
+            return
+        message_ids = self._pending.setdefault(chat_id, [])
+        message_ids.append(message_id)
+        if len(message_ids) >= MAX_BATCH:
+            self._start_flush(chat_id)
+        elif chat_id not in self._timers:
+            loop = asyncio.get_running_loop()
+            self._timers[chat_id] = loop.call_later(
+                self.window, self._start_flush, chat_id
+            )
+
+    def _start_flush(self, chat_id: int):
+        if timer := self._timers.pop(chat_id, None):
+            timer.cancel()
+        message_ids = self._pending.pop(chat_id, None)
+        if message_ids:
+            task = asyncio.create_task(self._flush(chat_id, message_ids))
+            self._flushing.add(task)
+            task.add_done_callback(self._flushing.discard)
+
+    async def _flush(self, chat_id: int, message_ids: list[int]):
+        self.calls += 1
+        try:
+            await self.delete_func(chat_id, message_ids)
+        except ApiTelegramException as ex:
+            if ex.error_code == 429:
+                # Не теряем айди, повторим после паузы
+                retry_after = ex.result_json["parameters"]["retry_after"]
+                await asyncio.sleep(retry_after)
+                for message_id in message_ids:
+                    self.add(chat_id, message_id)
+                return
+            self._fail(chat_id, ex)
+        except Exception as e:  # Сеть и прочее, права тут ни при чем
+            log.error("delete failed", extra={"chat_id": chat_id, "error": repr(e)})
+        else:
+            self.deleted += len(message_ids)
+            self._failures.pop(chat_id, None)
+
+    def _fail(self, chat_id: int, e: Exception):
+        failures = self._failures.get(chat_id, 0) + 1
+        if failures < self.max_failures:
+            self._failures[chat_id] = failures
+            return
+        self._failures.pop(chat_id, None)
+        self._blocked[chat_id] = time.time() + self.block_time
+        log.warning(
+            "chat blocked",
+            extra={"chat_id": chat_id, "seconds": self.block_time, "error": str(e)},
+        )
+
+    async def close(self):
+        """Удаляет все накопленное"""
+        for chat_id in list(self._pending):
+            self._start_flush(chat_id)
+        if self._flushing:
+            await asyncio.gather(*self._flushing, return_exceptions=True)
@@ -0,0 +1,107 @@
+"""
+Отправка ошибок тестерам сводками.
+
+report() ничего не ждет: ошибка только учитывается в текущем окне.
+Одинаковые ошибки склеиваются со счетчиком, а раз в interval секунд
+фоновая задача отправляет накопленное одной сводкой каждому тестеру.
+"""
+
+import asyncio
+import time
+from src.log import get_logger
+
+# Не через self.logger: ошибка отправки сводки не должна попасть в сводку
+log = get_logger("errors")
+
+MAX_KINDS = 50  # Разных ошибок в одной сводке, остальные только считаются
+MAX_ERROR_LENGTH = 500  # Символов на одну ошибку в сводке
+MAX_DIGEST_LENGTH = 4000  # Ограничение длины сообщения телеграма с запасом
+
+
+class ErrorReporter:
+    def __init__(self, send_func, recipients, interval: float = 60, logger=None):
+        """
+        :param send_func: корутина send_func(chat_id, text)
+        :param recipients: айди получателей сводок
+        :param interval: период сводок, секунд
+        :param logger: сюда пишется первое появление каждой ошибки в окне
+        """
+        self.send_func = send_func
+        self.recipients = recipients
+        self.interval = interval
+        self.logger = logger
+        self._errors: dict[str, int] = {}  # Текст ошибки -> сколько раз в окне
+        self._dropped = 0  # Ошибки сверх MAX_KINDS
+        self._window_start = time.time()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def report(self, msg: str):
+        """Учесть ошибку, не блокируя вызывающего"""
+        if msg in self._errors:
+            self._errors[msg] += 1
+            return
+        if self.logger is not None:
+            self.logger.error(msg)
+        if not self._errors and not self._dropped:
+            self._window_start = time.time()
+        if len(self._errors) >= MAX_KINDS:
+            self._dropped += 1
+        else:
+            self._errors[msg] = 1
+        self._wakeup.set()
+
+    def make_digest(self) -> str | None:
+        """Сводка за окно, окно начинается заново"""
+        if not self._errors and not self._dropped:
+            return None
+        seconds = int(time.time() - self._window_start)
+        lines = [f"Ошибки за {seconds} сек.:"]
+        length = len(lines[0])
+        errors = sorted(self._errors.items(), key=lambda item: -item[1])
+        for shown, (msg, count) in enumerate(errors):
+            if len(msg) > MAX_ERROR_LENGTH:
+                msg = msg[:MAX_ERROR_LENGTH] + "…"
+            line = f"\n{count} × {msg}"
+            if length + len(line) > MAX_DIGEST_LENGTH - 50:
+                self._dropped += sum(count for _, count in errors[shown:])
+                break
+            lines.append(line)
+            length += len(line)
+        if self._dropped:
+            lines.append(f"\nИ еще ошибок: {self._dropped}")
+        self._errors = {}
+        self._dropped = 0
+        self._window_start = time.time()
+        return "\n".join(lines)
+
+    async def send_digest(self):
+        if (text := self.make_digest()) is None:
+            return
+        for chat_id in self.recipients:
+            try:
+                await self.send_func(chat_id, text)
+            except Exception as e:
+                log.warning(
+                    "digest not sent", extra={"chat_id": chat_id, "error": repr(e)}
+                )
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            # Копим ошибки interval секунд с первой в окне
+            await asyncio.sleep(self.interval)
+            self._wakeup.clear()
+            await self.send_digest()
+
+    def start(self):
+        """Запуск фоновой задачи, вызывается из работающего цикла событий"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Останавливает задачу и отправляет то, что накопилось"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.send_digest()
@@ -1,15 +1,34 @@
 import asyncio
 import json
-import pickle
 import random
 import time
-import aiofiles
 from telebot.types import Message, User
-from app.words_generator import get_random_word
-from src.config import settings
+from app.words_generator import get_random_word, UsedWords, list_of_words, word_index
+from src.settings import settings
+from src.answer_matcher import AnswerMatcher
+from src.game_codec import decode_state, encode_state, StateDecodeError
+from src.log import get_logger
+from src.metrics import storage_bytes, storage_seconds
+from src.tracing import traced
+from src.scheduler import scheduler
+from src.state_store import make_state_store
+from src.state_writer import GameStateWriter
+
+games_log = get_logger("games")
 
 
 class Timer:
+    __slots__ = (
+        "interval",
+        "start_time",
+        "timeout",
+        "end_time",
+        "_callback",
+        "_args",
+        "_kwargs",
+        "_call",
+    )
+
     def __new__(cls, *args, **kwargs):
         # При восстановлении таймера проверяем актуален ли он еще
         if end_time := kwargs.get("end_time"):
@@ -35,14 +54,17 @@ class Timer:
         self._callback = callback
         self._args = args or ()
         self._kwargs = kwargs or {}
-        self._task = asyncio.ensure_future(self._job())
-
-    async def _job(self):
-        await asyncio.sleep(self.timeout)
-        await self._callback(*self._args, **self._kwargs)
+        self._call = scheduler.schedule(
+            self.timeout, self._callback, self._args, self._kwargs
+        )
 
     def cancel(self):
-        self._task.cancel()
+        scheduler.cancel(self._call)
+
+    @property
+    def done(self) -> bool:
+        """Таймер отменен или его колбэк сработал и завершился"""
+        return self._call.done
 
     @property
     def time_left(self):
@@ -62,12 +84,49 @@ class Timer:
 
 
 class Game:
-    games: dict[str, "Game"] = {}
+    # Поля, из которых состоит сохраняемое состояние игры
+    STATE_FIELDS = (
+        "game_chat_id",
+        "chat_id",
+        "chat_title",
+        "topic_id",
+        "topic_name",
+        "chat_username",
+        "msg_kwargs",
+        "active",
+        "used_words",
+        "game_timer",
+        "current_leader",
+        "leader_name",
+        "current_word",
+        "next_words",
+        "answers_set",
+        "exclusive_user",
+        "exclusive_user_name",
+        "exclusive_timer",
+        "players",
+    )
+    __slots__ = tuple(f for f in STATE_FIELDS if f != "current_word") + (
+        "_word",  # Номер загаданного слова в словаре, либо само слово не из словаря
+        "last_access",
+        "_matcher",  # Проверка ответов на текущее слово, не сохраняется
+    )
+
+    games: dict[str, "Game"] = {}  # Кэш загруженных игр
+    loading: dict[str, asyncio.Future] = {}  # Игры в процессе загрузки
+    known_ids: set[str] = set()  # Айди всех игр в хранилище
+    loader = None  # Корутина загрузки игры из хранилища по айди
     _word_gen_func = get_random_word
+    state_store = make_state_store()
+    state_writer = GameStateWriter(settings.STATE_SAVE_DELAY)
 
     # Множество айди чатов обсуждений, привязанных к постам каналов
     chats_posts: dict[int, set] = {}
 
+    # Общая для всех игр таблица имен игроков: айди -> "Имя @username".
+    # Имена сохраняются с игрой, при выгрузке игр лишние удаляются
+    player_names: dict[int, str] = {}
+
     @classmethod
     def get_game_chat_id(cls, message: Message | str) -> str:
         """Формирует chat_id для чата игры с учетом топиков и постов канала"""
@@ -84,19 +143,58 @@ class Game:
                 return f"{message.chat.id}-post-{message.message_thread_id}"
         return str(message.chat.id)  # обычный чат
 
+    @classmethod
+    async def load_game(cls, chat_id: str) -> "Game | None":
+        """Загружает игру из хранилища, если ее нет в кэше"""
+        if (game := cls.games.get(chat_id)) is not None:
+            return game
+        if (future := cls.loading.get(chat_id)) is not None:
+            return await asyncio.shield(future)  # Игра уже загружается
+        if chat_id not in cls.known_ids or cls.loader is None:
+            return
+        future = asyncio.get_running_loop().create_future()
+        cls.loading[chat_id] = future
+        game = None
+        try:
+            game = await cls.loader(chat_id)
+        finally:
+            del cls.loading[chat_id]
+            if game is not None:
+                game = cls.games.setdefault(chat_id, game)
+            future.set_result(game)
+        return game
+
+    @classmethod
+    async def peek_state(cls, chat_id: str) -> dict | None:
+        """
+        Состояние игры для просмотра (список чатов админа): из кэша, если
+        игра загружена, иначе прямо из хранилища, не загружая ее в кэш
+        """
+        if (game := cls.games.get(chat_id)) is not None:
+            return game.save_state()
+        if (content := await cls.state_store.load(chat_id)) is None:
+            return
+        try:
+            return decode_state(content)
+        except StateDecodeError:
+            return
+
     @classmethod
     async def get_game(cls, message: Message | str, start_game: bool = None):
         chat_id = cls.get_game_chat_id(message)
         game = cls.games.get(chat_id)
+        if game is None:
+            game = await cls.load_game(chat_id)
+        if game is not None:
+            game.last_access = time.monotonic()
         if (
             game is None and start_game
         ):  # Если игра не найдена, а надо стартовать, то создаем
             game = cls(chat_id, message)
             cls.games[chat_id] = game
-            await cls.save_game(game)
-        elif start_game:
-            game.define_chat_name(message)
-            await game.save_game()
+            game.mark_dirty()
+        elif start_game and game.define_chat_name(message):
+            game.mark_dirty()
         return game
 
     def __init__(
@@ -106,7 +204,8 @@ class Game:
         **kwargs,  # don't remove
     ):
         self.game_chat_id = game_chat_id  # этот айди используется как ключ в словаре games и в именовании файла .pkl
-        self.check_if_channel_post()
+        self.register_channel_post(game_chat_id)
+        self.last_access = time.monotonic()  # Для выгрузки из кэша
 
         # Информация о чате, где проходит игра
         self.chat_id = self.chat_title = self.topic_id = self.topic_name = (
@@ -117,11 +216,12 @@ class Game:
             self.chat_id = message.chat.id
             self.define_chat_name(message)
         self.active = False  # Активна ли игра
-        self.used_words = set()  # Множество угаданных слов
+        self.used_words = UsedWords()  # Множество угаданных слов
         self.game_timer: Timer | None = None  # Таймер игры
         self.current_leader: int | None = None  # Ведущий
         self.leader_name: str | None = None  # Имя ведущего
-        self.current_word: str | None = None  # Загаданное слово
+        self._word: int | str | None = None  # Загаданное слово
+        self._matcher: AnswerMatcher | None = None
         self.next_words = []  # Очередь следующих слов, подкинутых админом
         self.answers_set = set()  # Множество использованных ответов
         self.exclusive_user: int | None = (
@@ -129,10 +229,36 @@ class Game:
         )
         self.exclusive_user_name: int | None = None  # Имя угадавшего
         self.exclusive_timer: Timer | None = None  # Таймер
-        self.players = set()  # Сколько игроков угадывали
+        self.players: set[int] = set()  # Айди игроков, которые угадывали
 
-    def define_chat_name(self, message: Message):
-        """Определяет имя чата, топика, разные айди для определения постов и топиков"""
+    @property
+    def current_word(self) -> str | None:
+        """Загаданное слово"""
+        if isinstance(self._word, int):
+            return list_of_words[self._word]
+        return self._word
+
+    @current_word.setter
+    def current_word(self, word: str | None):
+        index = word_index.get(word) if word is not None else None
+        self._word = word if index is None else index
+        self._matcher = None
+
+    @property
+    def answer_matcher(self) -> AnswerMatcher:
+        """Проверка ответов на загаданное слово, строится один раз за раунд"""
+        if self._matcher is None:
+            self._matcher = self._make_matcher()
+        return self._matcher
+
+    def _make_matcher(self) -> AnswerMatcher:
+        index = self._word if isinstance(self._word, int) else None
+        return AnswerMatcher(self.current_word, index)
+
+    def define_chat_name(self, message: Message) -> bool:
+        """Определяет имя чата, топика, разные айди для определения постов и топиков.
+        Возвращает True, если что-то из этого изменилось"""
+        old_info = self.chat_info
         self.chat_title = message.chat.title
         self.chat_username = (
             "@" + message.chat.username if message.chat.username else None
@@ -144,14 +270,26 @@ class Game:
         else:
             self.topic_id = self.topic_name = None
         self.define_msg_kwargs(message)
+        return self.chat_info != old_info
 
-    def check_if_channel_post(self):
-        if "post" in self.game_chat_id:
+    @property
+    def chat_info(self) -> tuple:
+        return (
+            self.chat_title,
+            self.chat_username,
+            self.topic_id,
+            self.topic_name,
+            tuple(self.msg_kwargs.items()),
+        )
+
+    @classmethod
+    def register_channel_post(cls, game_chat_id: str):
+        if "post" in game_chat_id:
             # Добавляем айди поста в множество чата
-            chat_id, post_id = map(int, self.game_chat_id.split("-post-"))
-            chat_posts = self.__class__.chats_posts.get(chat_id, set())
+            chat_id, post_id = map(int, game_chat_id.split("-post-"))
+            chat_posts = cls.chats_posts.get(chat_id, set())
             chat_posts.add(post_id)
-            self.__class__.chats_posts[chat_id] = chat_posts
+            cls.chats_posts[chat_id] = chat_posts
 
     def define_msg_kwargs(self, message: Message):
         if message.is_topic_message:
@@ -165,12 +303,85 @@ class Game:
         else:
             self.msg_kwargs = {}
 
+    def mark_dirty(self):
+        """Игра изменилась, ее состояние будет записано фоновой задачей"""
+        self.state_writer.mark_dirty(self)
+
     async def save_game(self):
         """Сохранение состояния игры"""
-        async with aiofiles.open(
-            f"{settings.STATE_SAVE_DIR}{self.game_chat_id}.pkl", "wb"
-        ) as f:
-            await f.write(pickle.dumps(self.save_state()))
+        start = time.perf_counter()
+        data = encode_state(self.save_state())
+        await self.state_store.save(self.game_chat_id, data, self.active)
+        storage_seconds.observe(time.perf_counter() - start, "save_game")
+        storage_bytes.observe(len(data), "save_game")
+        self.known_ids.add(self.game_chat_id)
+
+    @classmethod
+    async def delete_game(cls, game_chat_id: str):
+        """Удаляет игру из кэша и хранилища"""
+        if game := cls.games.pop(game_chat_id, None):
+            for timer in (game.game_timer, game.exclusive_timer):
+                if timer:
+                    timer.cancel()
+        cls.state_writer.discard(game_chat_id)
+        cls.known_ids.discard(game_chat_id)
+        if game:
+            cls.prune_player_names()
+        await cls.state_store.delete(game_chat_id)
+
+    @classmethod
+    def prune_player_names(cls) -> int:
+        """Удаляет имена игроков, которых нет в играх кэша. Возвращает сколько"""
+        players = set()
+        for game in cls.games.values():
+            players |= game.players
+        stale = cls.player_names.keys() - players
+        for player in stale:
+            del cls.player_names[player]
+        return len(stale)
+
+    @property
+    def is_idle(self) -> bool:
+        """Нет раунда, таймеров и несохраненных изменений: можно выгрузить"""
+        return (
+            not self.active
+            and (self.game_timer is None or self.game_timer.done)
+            and (self.exclusive_timer is None or self.exclusive_timer.done)
+            and not self.state_writer.is_dirty(self.game_chat_id)
+        )
+
+    @classmethod
+    def evict_games(cls, idle_time: float, max_games: int) -> int:
+        """
+        Выгружает из кэша простаивающие игры, к которым не обращались idle_time секунд.
+        Если игр больше max_games, выгружает и более свежие простаивающие,
+        начиная с самых давних. Возвращает количество выгруженных игр.
+        """
+        now = time.monotonic()
+        idle_games = sorted(
+            (game for game in cls.games.values() if game.is_idle),
+            key=lambda game: game.last_access,
+        )
+        over_limit = len(cls.games) - max_games
+        evicted = 0
+        for game in idle_games:
+            if now - game.last_access < idle_time and evicted >= over_limit:
+                break
+            del cls.games[game.game_chat_id]
+            evicted += 1
+        if evicted:
+            cls.prune_player_names()
+        return evicted
+
+    @classmethod
+    async def eviction_loop(cls, interval: float, idle_time: float, max_games: int):
+        """Фоновая выгрузка простаивающих игр"""
+        while True:
+            await asyncio.sleep(interval)
+            if evicted := cls.evict_games(idle_time, max_games):
+                games_log.info(
+                    "evict_games", extra={"evicted": evicted, "cached": len(cls.games)}
+                )
 
     async def start_game(self, user, end_game_func):
         """Запуск игры"""
@@ -188,13 +399,15 @@ class Game:
             self.game_timer.cancel()
         self.game_timer = Timer(settings.GAME_TIME, self.end_game, (end_game_func,))
 
-        # Сохраняем игру
-        await self.save_game()
+        self.mark_dirty()
 
     def define_new_word(self):
         self.current_word = self._word_gen_func()
+        self._matcher = self._make_matcher()
         self.answers_set.clear()
+        self.mark_dirty()
 
+    @traced
     async def add_current_word_to_used(self, user: User):
         """Слово угадали"""
         self.active = False
@@ -202,35 +415,42 @@ class Game:
         self.exclusive_timer = Timer(settings.EXCLUSIVE_TIME, self.end_exclusive)
         self.exclusive_user = user.id
         self.exclusive_user_name = user.full_name
-        self.used_words.add(self.current_word)
-        if self.players is None:
-            self.players = set()
-        player = f"{user.id} {user.full_name}"
+        if isinstance(self._word, int):
+            self.used_words.add_index(self._word)
+        player_name = user.full_name
         if user.username:
-            player += f" @{user.username}"
-        self.players.add(player)
+            player_name += f" @{user.username}"
+        self.player_names[user.id] = player_name
+        self.players.add(user.id)
         self.answers_set.clear()
-        await self.save_game()
+        self.mark_dirty()
 
     async def end_exclusive(self):
         self.exclusive_timer = None
-        await self.save_game()
+        self.mark_dirty()
 
     async def end_game(self, end_game_func):
         """Игра закончилась по истечении времени, слово не угадали"""
-        self.game_timer = None
+        timer = self.game_timer
         self.exclusive_user = None
         self.answers_set.clear()
         if self.active:
             self.active = False
+            self.mark_dirty()
+            # Пока сообщение ждет в очереди, таймер не считается завершенным
+            # и игра не выгружается (is_idle)
             await end_game_func(self)
-        await self.save_game()
+        if self.game_timer is timer:  # За это время могли начать новый раунд
+            self.game_timer = None
+        self.mark_dirty()
 
     def save_state(self):
         """Сохраняет состояние игры в словарь."""
-        # Составляем словарь только из сериализуемых объектов
-        state = {
-            key: value for key, value in self.__dict__.items() if not callable(value)
+        state = {field: getattr(self, field) for field in self.STATE_FIELDS}
+        state["player_names"] = {
+            player: self.player_names[player]
+            for player in self.players
+            if player in self.player_names
         }
         if self.game_timer is not None:
             state["game_timer"] = {
@@ -248,10 +468,10 @@ class Game:
     async def load_state(cls, state, **kwargs):
         """Восстанавливает экземпляр игры из словаря состояния."""
         obj = cls(**kwargs)
-        for key, value in state.items():
+        for key in cls.STATE_FIELDS:
             if key in ("game_timer", "exclusive_timer"):
                 continue
-            if value:
+            if value := state.get(key):
                 setattr(obj, key, value)
 
         # Восстановление таймеров
@@ -264,13 +484,25 @@ class Game:
         if exclusive_state := state.get("exclusive_timer"):
             obj.exclusive_timer = Timer(exclusive_state, obj.end_exclusive)
 
+        # После await: пока игры нет в кэше, выгрузка удалила бы ее имена
+        cls.player_names.update(state.get("player_names") or {})
         return obj
 
     def __bool__(self):
         return self.active
 
     def __str__(self):
+        state = {field: getattr(self, field) for field in self.STATE_FIELDS}
+        state["player_names"] = self.player_names
+        return self.format_state(state)
+
+    @classmethod
+    def format_state(cls, state: dict) -> str:
+        """Состояние игры (из кэша или хранилища, см. peek_state) для админа"""
+
         def dumps_default(obj):
+            if isinstance(obj, UsedWords):
+                obj = set(obj)
             if isinstance(obj, set):
                 res = list(obj)
                 if (l := len(res)) > 6:
@@ -280,8 +512,11 @@ class Game:
             if isinstance(obj, Timer):
                 return str(obj)
 
-        state = {
-            key: value for key, value in self.__dict__.items() if not callable(value)
+        player_names = state.get("player_names") or {}
+        state = {field: state.get(field) for field in cls.STATE_FIELDS}
+        state["players"] = {
+            f"{player} {player_names.get(player, '')}"
+            for player in state["players"] or ()
         }
         try:
             return json.dumps(
@@ -0,0 +1,294 @@
+"""
+Бинарный формат состояния игры.
+
+Состояние (словарь из Game.save_state) кодируется по явной схеме:
+заголовок с версией, числовые поля одним struct, затем все строки
+одним блоком UTF-8 через \\x00, айди игроков и в конце битсет
+использованных слов.
+
+При изменении набора полей заводится новая версия схемы:
+старый декодер остается, а в MIGRATIONS добавляется функция,
+переводящая словарь версии N в версию N + 1.
+Версия 0 - старые файлы pickle, они читаются только для миграции
+и только с разрешенными типами.
+
+Смысл формата - безопасность (из хранилища не исполняется произвольный
+pickle) и явные версии схемы. По скорости он на уровне pickle того же
+состояния (bench/bench_codec.py): заголовок версии 3 пакуется одним
+struct, поля берутся без циклов по именам.
+"""
+
+import io
+import itertools
+import pickle
+import struct
+from app.words_generator import UsedWords
+
+MAGIC = b"CG"
+VERSION = 3
+
+
+class StateDecodeError(ValueError):
+    """Не удалось разобрать сохраненное состояние игры"""
+
+
+# Заголовок и все числовые поля (версии 1-3)
+_FIXED_V1 = struct.Struct("<2sBH6qIdIdII")
+# Количества: подкинутые слова, ответы, игроки; длины блока строк и битсета
+_COUNTS_V1 = struct.Struct("<HHHII")
+# Версия 3: количества uint32, в uint16 не помещалось 65536 игроков
+_COUNTS_V3 = struct.Struct("<IIIII")
+# Версия 2: игроки хранятся айди (int64) после блока строк,
+# а в блоке строк вместо "айди имя" лежат только имена
+_SEP = "\x00"  # Разделитель строк в блоке строк
+
+# Биты флагов версии 1: активность и наличие необязательных полей
+_ACTIVE = 1 << 0
+_INT_FIELDS = ("chat_id", "topic_id", "current_leader", "exclusive_user")
+_KWARGS_FIELDS = ("message_thread_id", "reply_to_message_id")
+_TIMER_FIELDS = ("game_timer", "exclusive_timer")
+_STR_FIELDS = (
+    "game_chat_id",
+    "chat_title",
+    "topic_name",
+    "chat_username",
+    "leader_name",
+    "current_word",
+    "exclusive_user_name",
+)
+_OPTIONAL_FIELDS = _INT_FIELDS + _KWARGS_FIELDS + _TIMER_FIELDS + _STR_FIELDS
+_FLAGS = {field: 1 << (1 + i) for i, field in enumerate(_OPTIONAL_FIELDS)}  # 1..15
+
+
+# Версия 3 одним struct: заголовок, числовые поля и количества подряд
+_HEADER_V3 = struct.Struct(_FIXED_V1.format + _COUNTS_V3.format[1:])
+# Флаги необязательных полей в порядке значений encode_state
+_FLAG_BITS = tuple(_FLAGS[field] for field in _OPTIONAL_FIELDS)
+_NO_TIMER = {"interval": 0, "end_time": 0.0}
+
+
+def encode_state(state: dict) -> bytes:
+    """Кодирует словарь состояния игры в текущую версию формата"""
+    get = state.get
+    msg_kwargs = get("msg_kwargs") or {}
+    values = [
+        get("chat_id"),
+        get("topic_id"),
+        get("current_leader"),
+        get("exclusive_user"),
+        msg_kwargs.get("message_thread_id"),
+        msg_kwargs.get("reply_to_message_id"),
+        game_timer := get("game_timer"),
+        exclusive_timer := get("exclusive_timer"),
+        *[get(field) for field in _STR_FIELDS],
+    ]
+    flags = _ACTIVE if get("active") else 0
+    for bit, value in zip(_FLAG_BITS, values):
+        if value is not None:
+            flags |= bit
+
+    game_timer = game_timer or _NO_TIMER
+    exclusive_timer = exclusive_timer or _NO_TIMER
+    next_words = get("next_words") or ()
+    answers = get("answers_set") or ()
+    players = get("players") or ()
+    player_names = get("player_names") or {}
+    strings = [value or "" for value in values[8:]]
+    strings += next_words
+    strings += answers
+    strings += map(player_names.get, players, itertools.repeat(""))
+    text = _SEP.join(strings)
+    if text.count(_SEP) != len(strings) - 1:
+        # Разделитель внутри строк не сохраняем
+        text = _SEP.join(item.replace(_SEP, "") for item in strings)
+    text = text.encode("utf-8")
+
+    used_words = get("used_words")
+    if not isinstance(used_words, UsedWords):
+        used_words = UsedWords(used_words or ())
+
+    return b"".join(
+        (
+            _HEADER_V3.pack(
+                MAGIC,
+                VERSION,
+                flags,
+                values[0] or 0,
+                values[1] or 0,
+                values[2] or 0,
+                values[3] or 0,
+                values[4] or 0,
+                values[5] or 0,
+                game_timer["interval"],
+                game_timer["end_time"],
+                exclusive_timer["interval"],
+                exclusive_timer["end_time"],
+                used_words.fingerprint,
+                used_words.count,
+                len(next_words),
+                len(answers),
+                len(players),
+                len(text),
+                len(used_words.bits),
+            ),
+            text,
+            struct.pack(f"<{len(players)}q", *players),
+            used_words.bits,
+        )
+    )
+
+
+def _decode_v1(data: bytes) -> dict:
+    return _decode(data, _COUNTS_V1, players_ids=False)
+
+
+def _decode_v2(data: bytes) -> dict:
+    return _decode(data, _COUNTS_V1, players_ids=True)
+
+
+def _decode_v3(data: bytes) -> dict:
+    return _decode(data, _COUNTS_V3, players_ids=True)
+
+
+def _decode(data: bytes, counts: struct.Struct, players_ids: bool) -> dict:
+    if counts is _COUNTS_V3:  # Заголовок и количества одним struct
+        (_, _, flags, *values) = _HEADER_V3.unpack_from(data)
+        offset = _HEADER_V3.size
+    else:
+        (_, _, flags, *values) = _FIXED_V1.unpack_from(data)
+        values += counts.unpack_from(data, _FIXED_V1.size)
+        offset = _FIXED_V1.size + counts.size
+    n_next, n_answers, n_players, n_text, n_bits = values[12:]
+    strings = data[offset : offset + n_text].decode("utf-8").split(_SEP)
+    offset += n_text
+    n_fixed = len(_STR_FIELDS)
+    if len(strings) != n_fixed + n_next + n_answers + n_players:
+        raise StateDecodeError("wrong strings count")
+
+    state = {"active": bool(flags & _ACTIVE)}
+    for field, bit, value in zip(_INT_FIELDS, _FLAG_BITS, values):
+        state[field] = value if flags & bit else None
+    state["msg_kwargs"] = {
+        field: value
+        for field, bit, value in zip(_KWARGS_FIELDS, _FLAG_BITS[4:6], values[4:6])
+        if flags & bit
+    }
+    for i, (field, bit) in enumerate(zip(_TIMER_FIELDS, _FLAG_BITS[6:8])):
+        if flags & bit:
+            state[field] = {"interval": values[6 + 2 * i], "end_time": values[7 + 2 * i]}
+        else:
+            state[field] = None
+    for field, bit, value in zip(_STR_FIELDS, _FLAG_BITS[8:], strings):
+        state[field] = value if flags & bit else None
+    state["next_words"] = strings[n_fixed : n_fixed + n_next]
+    n_fixed += n_next
+    state["answers_set"] = set(strings[n_fixed : n_fixed + n_answers])
+    n_fixed += n_answers
+    if players_ids:
+        names = strings[n_fixed : n_fixed + n_players]
+        players = struct.unpack_from(f"<{n_players}q", data, offset)
+        offset += 8 * n_players
+        state["players"] = set(players)
+        state["player_names"] = {
+            player: name for player, name in zip(players, names) if name
+        }
+    else:
+        state["players"] = set(strings[n_fixed : n_fixed + n_players])
+
+    used_words = UsedWords()
+    used_words.fingerprint, used_words.count = values[10:12]
+    used_words.bits = bytearray(data[offset : offset + n_bits])
+    if len(used_words.bits) != n_bits:
+        raise StateDecodeError("truncated state")
+    state["used_words"] = used_words
+    return state
+
+
+DECODERS = {1: _decode_v1, 2: _decode_v2, 3: _decode_v3}
+
+
+class _LegacyUnpickler(pickle.Unpickler):
+    """Чтение старых файлов pickle только с ожидаемыми типами"""
+
+    ALLOWED = {
+        ("builtins", "set"),
+        ("builtins", "frozenset"),
+        ("builtins", "bytearray"),
+        ("app.words_generator", "UsedWords"),
+    }
+
+    def find_class(self, module, name):
+        if (module, name) not in self.ALLOWED:
+            raise pickle.UnpicklingError(f"{module}.{name} is not allowed")
+        return super().find_class(module, name)
+
+
+def _migrate_v0(state: dict) -> dict:
+    """pickle -> версия 1: used_words из множества строк в битсет"""
+    if not isinstance(state.get("used_words"), UsedWords):
+        state["used_words"] = UsedWords(state.get("used_words") or ())
+    for field in ("answers_set", "players"):
+        state[field] = set(state.get(field) or ())
+    state["next_words"] = list(state.get("next_words") or ())
+    for field in _INT_FIELDS + _TIMER_FIELDS + _STR_FIELDS:
+        state.setdefault(field, None)
+    state.setdefault("active", False)
+    state.setdefault("msg_kwargs", {})
+    return state
+
+
+def _migrate_v1(state: dict) -> dict:
+    """Версия 1 -> 2: игроки из строк "айди имя @username" в айди и имена"""
+    players = set()
+    player_names = {}
+    for player in state.get("players") or ():
+        player_id, _, name = player.partition(" ")
+        try:
+            player_id = int(player_id)
+        except ValueError:
+            continue
+        players.add(player_id)
+        player_names[player_id] = name
+    state["players"] = players
+    state["player_names"] = player_names
+    return state
+
+
+def _migrate_v2(state: dict) -> dict:
+    """Версия 2 -> 3: поменялась только ширина количеств, словарь тот же"""
+    return state
+
+
+MIGRATIONS = {0: _migrate_v0, 1: _migrate_v1, 2: _migrate_v2}
+
+
+def decode_state(data: bytes) -> dict:
+    """Декодирует состояние любой известной версии и приводит к текущей"""
+    try:
+        if data[:2] == MAGIC:
+            version = data[2]
+            if version not in DECODERS:
+                raise StateDecodeError(f"unknown state version {version}")
+            state = DECODERS[version](data)
+        else:
+            version = 0
+            state = _LegacyUnpickler(io.BytesIO(data)).load()
+            if not isinstance(state, dict):
+                raise StateDecodeError("legacy state is not a dict")
+        while version < VERSION:
+            state = MIGRATIONS[version](state)
+            version += 1
+    except StateDecodeError:
+        raise
+    except (
+        EOFError,
+        AttributeError,
+        IndexError,
+        KeyError,
+        TypeError,
+        ValueError,
+        struct.error,
+        pickle.UnpicklingError,
+    ) as e:
+        raise StateDecodeError(repr(e)) from e
+    return state
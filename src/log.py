@@ -0,0 +1,172 @@
+"""
+Логирование через очередь.
+
+Записи из цикла событий только кладутся в очередь (QueueHandler),
+а в файл их пишет отдельный поток (QueueListener), так что поток цикла
+событий не делает файлового ввода-вывода. В файл записи пишутся JSON,
+по строке на запись, с дополнительными полями из extra.
+
+Логгеры подсистем - дочерние к "crocobot": get_logger("messages") и т.д.
+Уровни подсистем задаются в LOG_LEVELS, например
+    LOG_LEVELS=messages=DEBUG,game=WARNING
+Отладочные записи о каждом сообщении (подсистема messages) пишутся
+выборочно, с долей LOG_SAMPLE_RATE: get_logger("messages", sampled=True).
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+
+ROOT_LOGGER = "crocobot"
+_sample_rate = 1.0  # Доля DEBUG для SampledLogger, задается в setup_logging
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись одной строкой JSON: время, уровень, логгер, текст и поля из extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SampledLogger(logging.LoggerAdapter):
+    """
+    Логгер, который пишет долю sample_rate записей уровня DEBUG.
+    Решение принимается до создания записи, так что отброшенная запись
+    почти ничего не стоит. Остальные уровни пишутся все.
+    """
+
+    def __init__(self, logger: logging.Logger):
+        super().__init__(logger, None)
+
+    def isEnabledFor(self, level: int) -> bool:
+        if level <= logging.DEBUG and random.random() >= _sample_rate:
+            return False
+        return self.logger.isEnabledFor(level)
+
+    def process(self, msg, kwargs):
+        return msg, kwargs  # extra вызывающего без изменений
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Готовит запись к очереди без копирования: форматирование и JSON
+    остаются потоку записи, здесь только подставляются аргументы.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def get_logger(subsystem: str | None = None, sampled: bool = False):
+    """Логгер подсистемы, с sampled - с выборкой отладочных записей"""
+    if subsystem is None:
+        logger = logging.getLogger(ROOT_LOGGER)
+    else:
+        logger = logging.getLogger(f"{ROOT_LOGGER}.{subsystem}")
+    return SampledLogger(logger) if sampled else logger
+
+
+def parse_levels(levels: str) -> dict[str, str]:
+    """'messages=DEBUG,game=WARNING' -> {'messages': 'DEBUG', 'game': 'WARNING'}"""
+    result = {}
+    for item in levels.split(","):
+        if "=" in item:
+            subsystem, level = item.split("=", 1)
+            result[subsystem.strip()] = level.strip().upper()
+    return result
+
+
+def setup_logging(
+    log_file: str = None,
+    level: str = None,
+    levels: str = None,
+    sample_rate: float = None,
+    console: bool = None,
+) -> logging.handlers.QueueListener:
+    """
+    Настраивает логгер "crocobot" на очередь и запускает поток записи.
+    Параметры по умолчанию берутся из настроек.
+    """
+    # Не при импорте: get_logger нужен и модулям, которые работают без .env
+    from src.settings import settings
+
+    log_file = log_file or settings.LOG_FILE
+    console = settings.LOG_CONSOLE if console is None else console
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=1024 * 1024, backupCount=10, encoding="utf-8"
+    )
+    file_handler.setFormatter(JsonFormatter())
+    handlers = [file_handler]
+    if console:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(
+            logging.Formatter("%(asctime)s %(name)s %(levelname)s :: %(message)s")
+        )
+        handlers.append(console_handler)
+
+    # Поля, которые нигде не выводятся, но дорого собираются для каждой записи
+    logging.logMultiprocessing = False
+    logging.logProcesses = False
+
+    root = get_logger()
+    root.setLevel(level or settings.LOG_LEVEL)
+    for subsystem, subsystem_level in parse_levels(
+        settings.LOG_LEVELS if levels is None else levels
+    ).items():
+        get_logger(subsystem).setLevel(subsystem_level)
+    global _sample_rate
+    _sample_rate = settings.LOG_SAMPLE_RATE if sample_rate is None else sample_rate
+    return _start_queue(root, handlers)
+
+
+def get_file_logger(
+    name: str, log_file: str, max_bytes: int, backup_count: int
+) -> logging.Logger:
+    """
+    Отдельный от "crocobot" логгер уровня INFO в свой файл JSON,
+    тоже через очередь (например, трассы src.tracing)
+    """
+    handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+    )
+    handler.setFormatter(JsonFormatter())
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.INFO)
+    _start_queue(logger, [handler])
+    return logger
+
+
+def _start_queue(
+    logger: logging.Logger, handlers: list[logging.Handler]
+) -> logging.handlers.QueueListener:
+    """Записи logger идут в очередь, handlers вызываются из потока записи"""
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+    logger.handlers.clear()
+    logger.addHandler(_QueueHandler(log_queue))
+    logger.propagate = False
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,225 @@
+"""
+Метрики в текстовом формате Prometheus.
+
+Счетчики и гистограммы копятся в памяти всегда (это несколько операций
+на событие), а отдаются по HTTP только если задан METRICS_PORT:
+    curl http://127.0.0.1:9100/metrics
+При шардировании воркер N слушает METRICS_PORT + N.
+
+Метрики, которые проще посчитать в момент запроса (число игр, таймеров,
+глубина очереди отправки), задаются функциями: add_gauges.
+"""
+
+import bisect
+import functools
+import time
+from aiohttp import web
+from telebot import asyncio_helper
+from src.tracing import span
+
+# Границы корзин гистограмм времени, секунд
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = (f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for values, value in self._values.items():
+            lines.append(f"{self.name}{_labels(self.labels, values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self, name: str, help_text: str, labels: tuple = (), buckets=BUCKETS
+    ):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # Значения меток -> [счетчики корзин (последняя +Inf), сумма]
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, *label_values):
+        if (item := self._values.get(label_values)) is None:
+            item = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0]
+        item[0][bisect.bisect_left(self.buckets, value)] += 1
+        item[1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labels + ("le",)
+        for values, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                labels = _labels(names, values + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(self.labels, values)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauges:
+    """Метрики-значения, которые функция source возвращает в момент запроса"""
+
+    def __init__(self, prefix: str, source):
+        self.prefix = prefix
+        self.source = source
+
+    def render(self) -> list[str]:
+        lines = []
+        for key, value in self.source().items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                name = f"{self.prefix}_{key}"
+                lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+        return lines
+
+
+handler_seconds = Histogram(
+    "crocobot_handler_seconds", "Время обработчика обновления", ("handler",)
+)
+handler_errors = Counter(
+    "crocobot_handler_errors_total", "Исключения в обработчиках", ("handler",)
+)
+storage_seconds = Histogram(
+    "crocobot_storage_seconds", "Время операций хранилищ", ("op",)
+)
+storage_bytes = Histogram(
+    "crocobot_storage_bytes", "Размер записанных данных", ("op",), BYTES_BUCKETS
+)
+api_seconds = Histogram("crocobot_api_seconds", "Время запросов к Bot API", ("method",))
+api_calls = Counter(
+    "crocobot_api_calls_total", "Запросы к Bot API по результату", ("method", "code")
+)
+gpt_seconds = Histogram(
+    "crocobot_gpt_seconds", "Время ответа модели", ("prompt", "result")
+)
+
+registry: list = [
+    handler_seconds,
+    handler_errors,
+    storage_seconds,
+    storage_bytes,
+    api_seconds,
+    api_calls,
+    gpt_seconds,
+]
+
+
+def add_gauges(prefix: str, source):
+    """source() -> {имя: число}, метрики prefix_имя считаются при запросе"""
+    registry.append(Gauges(prefix, source))
+
+
+def render() -> str:
+    lines = []
+    for metric in registry:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+def timed(histogram: Histogram, *label_values):
+    """Декоратор корутины: время выполнения в histogram"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, *label_values)
+
+        return wrapper
+
+    return decorator
+
+
+def handler_name(handler) -> str:
+    module = "main" if handler.__module__ == "__main__" else handler.__module__
+    return f"{module}.{handler.__qualname__}"
+
+
+def timed_handler(handler):
+    """Обработчик бота с временем и ошибками в метриках"""
+    name = handler_name(handler)
+
+    @functools.wraps(handler)  # telebot смотрит на сигнатуру обработчика
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await handler(*args, **kwargs)
+        except Exception:
+            handler_errors.inc(name)
+            raise
+        finally:
+            handler_seconds.observe(time.perf_counter() - start, name)
+
+    return wrapper
+
+
+def instrument_api():
+    """
+    Единственная обертка запросов к Bot API (asyncio_helper делает их через
+    _process_request): время и коды ответов в метриках и спан api.<метод>
+    в трассе обновления, если она есть (src.tracing)
+    """
+    process_request = asyncio_helper._process_request
+    if getattr(process_request, "instrumented", False):
+        return
+
+    @functools.wraps(process_request)
+    async def wrapper(token, url, *args, **kwargs):
+        code = "200"
+        start = time.perf_counter()
+        try:
+            with span(f"api.{url}"):
+                return await process_request(token, url, *args, **kwargs)
+        except asyncio_helper.ApiTelegramException as e:
+            code = str(e.error_code)
+            raise
+        except Exception:
+            code = "error"  # Сеть, таймаут
+            raise
+        finally:
+            api_seconds.observe(time.perf_counter() - start, url)
+            api_calls.inc(url, code)
+
+    wrapper.instrumented = True
+    asyncio_helper._process_request = wrapper
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+
+async def start_server(host: str, port: int) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -1,9 +1,16 @@
+import functools
 from telebot import util, types, asyncio_helper
 from typing import Any, Union, Optional, List
 from telebot.types import Message, CallbackQuery
 from telebot.async_telebot import AsyncTeleBot, REPLY_MARKUP_TYPES
 from telebot.asyncio_handler_backends import ContinueHandling
 from telebot.asyncio_handler_backends import State, StatesGroup
+from src.log import get_logger
+from src.metrics import timed_handler
+from src.tracing import trace, traced
+from src.send_queue import SendQueue, INTERACTIVE, NOTIFICATION
+
+log = get_logger("send")
 
 
 class GameStates(StatesGroup):
@@ -18,9 +25,12 @@ class MyTeleBot(AsyncTeleBot):
 
     States = GameStates
 
-    def __init__(self, token, *args, tester_ids=None, **kwargs):
+    def __init__(
+        self, token, *args, tester_ids=None, send_queue: SendQueue = None, **kwargs
+    ):
         super().__init__(token, *args, **kwargs)
         self.tester_ids = tester_ids
+        self.send_queue = send_queue  # Без очереди сообщения отправляются сразу
         self.add_message_handler(
             self._build_handler_dict(
                 self.admin_mode,
@@ -35,6 +45,26 @@ class MyTeleBot(AsyncTeleBot):
             )
         )
 
+    @staticmethod
+    def _build_handler_dict(handler, pass_bot=False, **filters):
+        """Все обработчики бота - со временем и ошибками в метриках"""
+        return AsyncTeleBot._build_handler_dict(
+            timed_handler(traced(handler)), pass_bot, **filters
+        )
+
+    async def _run_middlewares_and_handlers(
+        self, message, handlers, middlewares, update_type
+    ):
+        """Обработка одного обновления - одна трасса (если попала в выборку)"""
+        chat = getattr(message, "chat", None)
+        if chat is None and isinstance(message, CallbackQuery) and message.message:
+            chat = message.message.chat
+        with trace(update_type, chat_id=chat.id if chat else None):
+            return await super()._run_middlewares_and_handlers(
+                message, handlers, middlewares, update_type
+            )
+
+    @traced
     async def send_message(
         self,
         chat_id: Union[int, str],
@@ -54,30 +84,42 @@ class MyTeleBot(AsyncTeleBot):
         business_connection_id: Optional[str] = None,
         message_effect_id: Optional[str] = None,
         allow_paid_broadcast: Optional[bool] = None,
+        priority: int = INTERACTIVE,
     ) -> types.Message:
+        """
+        Отправка через очередь с ограничением скорости, если она задана.
+        :param priority: INTERACTIVE - ответ игроку, NOTIFICATION - уведомление
+        """
+        send = functools.partial(
+            AsyncTeleBot.send_message,
+            self,
+            chat_id,
+            text,
+            parse_mode,
+            entities,
+            disable_web_page_preview,
+            disable_notification,
+            protect_content,
+            reply_to_message_id,
+            allow_sending_without_reply,
+            reply_markup,
+            timeout,
+            message_thread_id,
+            reply_parameters,
+            link_preview_options,
+            business_connection_id,
+            message_effect_id,
+            allow_paid_broadcast,
+        )
         try:
-            msg = await super().send_message(
-                chat_id,
-                text,
-                parse_mode,
-                entities,
-                disable_web_page_preview,
-                disable_notification,
-                protect_content,
-                reply_to_message_id,
-                allow_sending_without_reply,
-                reply_markup,
-                timeout,
-                message_thread_id,
-                reply_parameters,
-                link_preview_options,
-                business_connection_id,
-                message_effect_id,
-                allow_paid_broadcast,
-            )
-            return msg
+            if self.send_queue is None:
+                return await send()
+            return await self.send_queue.submit(chat_id, send, priority)
         except asyncio_helper.ApiTelegramException as e:
-            print(f"Error in send_message\n{e}\n{chat_id=}, {text=}\n")
+            log.error(
+                "send_message failed",
+                extra={"chat_id": chat_id, "text": text, "error": str(e)},
+            )
 
     async def message_to_tester(self, msg: str, place: str = None):
         """
@@ -88,7 +130,9 @@ class MyTeleBot(AsyncTeleBot):
         if place is not None:
             text += f"<b> в </b><code>{place}</code>"
         text += f":\n\n<i>{msg}</i>"
-        await self.send_message(self.tester_ids[0], text, parse_mode="html")
+        await self.send_message(
+            self.tester_ids[0], text, parse_mode="html", priority=NOTIFICATION
+        )
 
     async def get_stored_data(self, message: Message | int, *args) -> list | Any | None:
         """Извлекаем контекстные данные"""
@@ -0,0 +1,75 @@
+"""
+Периодическая запись показателей процесса в лог (подсистема runtime).
+
+Раз в RUNTIME_STATS_INTERVAL секунд пишется запись "runtime" с памятью
+процесса, числом задач asyncio и открытых файлов, таймеров в планировщике
+и размерами структур игр, которые растут вместе с игрой. По этим записям
+видны медленные утечки; их разбирает tools/soak_test.py.
+"""
+
+import asyncio
+import os
+import resource
+from src.game import Game
+from src.log import get_logger
+from src.scheduler import scheduler
+
+log = get_logger("runtime")
+
+
+def _rss_kb() -> int:
+    """Текущая память процесса; без /proc - пиковая"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _open_files() -> int | None:
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+def collect() -> dict:
+    games = Game.games.values()
+    cached_players = set()
+    for game in games:
+        cached_players |= game.players
+    return {
+        "rss_kb": _rss_kb(),
+        "tasks": len(asyncio.all_tasks()),
+        "open_files": _open_files(),
+        "timers": scheduler.pending,
+        "timers_heap": scheduler.size,
+        "games": len(Game.games),
+        "active_games": sum(game.active for game in games),
+        "known_games": len(Game.known_ids),
+        "dirty_games": Game.state_writer.pending,
+        "chats_posts": sum(map(len, Game.chats_posts.values())),
+        "player_names": len(Game.player_names),
+        # Имена игроков, которых нет ни в одной игре кэша: должны удаляться
+        "stale_player_names": len(Game.player_names.keys() - cached_players),
+        "players": sum(len(game.players) for game in games),
+        "answers": sum(len(game.answers_set) for game in games),
+    }
+
+
+async def runtime_stats_loop(interval: float, **sources):
+    """
+    Пишет collect() раз в interval секунд.
+    sources - дополнительные показатели: имя -> функция, возвращающая dict,
+    например send_queue=bot.send_queue.stats
+    """
+    while True:
+        stats = collect()
+        for name, source in sources.items():
+            for key, value in source().items():
+                stats[f"{name}_{key}"] = value
+        log.info("runtime", extra=stats)
+        await asyncio.sleep(interval)
@@ -0,0 +1,118 @@
+"""
+Общий планировщик таймеров игр.
+
+Вместо отдельной задачи asyncio на каждый таймер все сроки лежат в одной
+куче и обслуживаются одной задачей. Срабатывание считается по монотонным
+часам, так что перевод системного времени таймеры не сбивает.
+Постановка - O(log n), отмена - O(1) (запись помечается и выбрасывается
+при извлечении из кучи).
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from src.log import get_logger
+
+log = get_logger("timers")
+
+
+class ScheduledCall:
+    __slots__ = ("deadline", "callback", "args", "kwargs", "cancelled", "fired",
+                 "running")  # fmt: skip
+
+    def __init__(self, deadline: float, callback, args, kwargs):
+        self.deadline = deadline  # По time.monotonic()
+        self.callback = callback
+        self.args = args
+        self.kwargs = kwargs
+        self.cancelled = False
+        self.fired = False
+        self.running = False  # Колбэк сработал и еще выполняется
+
+    @property
+    def done(self) -> bool:
+        """Отменен или колбэк сработал и завершился"""
+        return self.cancelled or (self.fired and not self.running)
+
+
+class TimerScheduler:
+    def __init__(self):
+        self._heap: list[tuple[float, int, ScheduledCall]] = []
+        self._counter = itertools.count()  # Порядок для одинаковых сроков
+        self._pending = 0  # Неотмененные и несработавшие
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        # Выполняющиеся колбэки
+        self._running: dict[asyncio.Task, ScheduledCall] = {}
+
+    @property
+    def pending(self) -> int:
+        """Сколько сроков ожидает срабатывания"""
+        return self._pending
+
+    @property
+    def size(self) -> int:
+        """Записей в куче, включая отмененные, которые еще не выброшены"""
+        return len(self._heap)
+
+    def schedule(self, delay: float, callback, args=(), kwargs=None) -> ScheduledCall:
+        """Вызвать корутину callback(*args, **kwargs) через delay секунд"""
+        call = ScheduledCall(time.monotonic() + delay, callback, args, kwargs or {})
+        heapq.heappush(self._heap, (call.deadline, next(self._counter), call))
+        self._pending += 1
+        self._ensure_running()
+        if self._heap[0][2] is call:
+            self._wakeup.set()  # Новый ближайший срок
+        return call
+
+    def cancel(self, call: ScheduledCall):
+        if call.cancelled or call.fired:
+            return
+        call.cancelled = True
+        self._pending -= 1
+        # Если отмененных в куче стало слишком много, пересобираем ее
+        if len(self._heap) > 64 and self._pending < len(self._heap) // 2:
+            self._heap = [item for item in self._heap if not item[2].cancelled]
+            heapq.heapify(self._heap)
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            now = time.monotonic()
+            while self._heap and (
+                self._heap[0][2].cancelled or self._heap[0][0] <= now
+            ):
+                _, _, call = heapq.heappop(self._heap)
+                if not call.cancelled:
+                    self._fire(call)
+            timeout = self._heap[0][0] - now if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _fire(self, call: ScheduledCall):
+        call.fired = True
+        self._pending -= 1
+        try:
+            task = asyncio.create_task(call.callback(*call.args, **call.kwargs))
+        except Exception as e:
+            log.error("timer callback failed", extra={"error": repr(e)})
+            return
+        call.running = True
+        self._running[task] = call
+        task.add_done_callback(self._callback_done)
+
+    def _callback_done(self, task: asyncio.Task):
+        self._running.pop(task).running = False
+        if not task.cancelled() and (e := task.exception()) is not None:
+            log.error("timer callback failed", extra={"error": repr(e)})
+
+
+scheduler = TimerScheduler()
@@ -0,0 +1,273 @@
+"""
+Очередь исходящих сообщений бота.
+
+Телеграм ограничивает отправку: около 30 сообщений в секунду всего,
+одно в секунду в личный чат и 20 в минуту в группу. При превышении
+отвечает 429 с retry_after. Очередь выдерживает оба ограничения
+корзинами токенов (общей и по каждому чату), повторяет отправку после
+retry_after, сохраняет порядок сообщений внутри чата и пропускает
+ответы на действия игроков (INTERACTIVE) вперед уведомлений (NOTIFICATION).
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import time
+from collections import deque
+from telebot.asyncio_helper import ApiTelegramException
+from src.log import get_logger
+
+INTERACTIVE = 0  # Ответ на команду или действие игрока
+NOTIFICATION = 1  # Сообщения по таймеру, штрафы, служебные
+
+WAIT_SAMPLES = 1000  # Сколько последних ожиданий держим для метрик
+SWEEP_INTERVAL = 60  # Период очистки простаивающих чатов
+
+log = get_logger("send_queue")
+
+
+class TokenBucket:
+    """Корзина токенов: rate токенов в секунду, не больше capacity"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Через сколько секунд будет токен"""
+        self._refill(now)
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def pause(self, now: float, seconds: float):
+        """Не выдавать токены seconds секунд (после 429)"""
+        self._refill(now)
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+class _Job:
+    __slots__ = ("send", "priority", "queued_at", "future", "retries", "context")
+
+    def __init__(self, send, priority: int, future: asyncio.Future):
+        self.send = send  # Корутинная функция без аргументов
+        self.priority = priority
+        self.queued_at = time.monotonic()
+        self.future = future
+        self.retries = 0
+        # Контекст отправителя: вызов API попадает в трассу его обновления
+        self.context = contextvars.copy_context()
+
+
+class _Chat:
+    __slots__ = ("jobs", "bucket", "busy", "scheduled")
+
+    def __init__(self, bucket: TokenBucket):
+        self.jobs: deque[_Job] = deque()
+        self.bucket = bucket
+        self.busy = False  # Сообщение этого чата сейчас отправляется
+        self.scheduled = False  # Чат уже стоит в очереди диспетчера
+
+
+class SendQueue:
+    def __init__(
+        self,
+        global_rate: float = 30,
+        chat_rate: float = 1,
+        group_rate: float = 20 / 60,
+        chat_burst: float = 3,
+        max_retries: int = 5,
+    ):
+        """
+        :param global_rate: сообщений в секунду на всего бота
+        :param chat_rate: сообщений в секунду в личный чат
+        :param group_rate: сообщений в секунду в группу
+        :param chat_burst: сколько сообщений подряд можно отправить в чат
+        :param max_retries: сколько раз повторять после 429
+        """
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self._chats: dict[int | str, _Chat] = {}
+        # Чаты, готовые к отправке, по приоритету первого сообщения
+        self._ready = (deque(), deque())
+        self._delayed: list[tuple[float, int, int | str]] = []  # Ждут токен чата
+        self._counter = itertools.count()
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._sending: set[asyncio.Task] = set()
+        self._next_sweep = time.monotonic() + SWEEP_INTERVAL
+        # Метрики
+        self.depth = 0  # Сообщений в очереди
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self._waits: deque[float] = deque(maxlen=WAIT_SAMPLES)
+
+    def submit(self, chat_id: int | str, send, priority: int = INTERACTIVE):
+        """
+        Ставит отправку в очередь чата.
+        :param send: корутинная функция без аргументов, вызов API
+        :return: future с результатом вызова
+        """
+        self._ensure_running()
+        future = asyncio.get_running_loop().create_future()
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            rate = self.group_rate if str(chat_id).startswith("-") else self.chat_rate
+            chat = self._chats[chat_id] = _Chat(TokenBucket(rate, self.chat_burst))
+        chat.jobs.append(_Job(send, priority, future))
+        self.depth += 1
+        self._schedule_chat(chat_id, chat)
+        return future
+
+    def _schedule_chat(self, chat_id, chat: _Chat, delay: float = 0):
+        if chat.busy or chat.scheduled or not chat.jobs:
+            return
+        chat.scheduled = True
+        if delay > 0:
+            item = (time.monotonic() + delay, next(self._counter), chat_id)
+            heapq.heappush(self._delayed, item)
+        else:
+            self._ready[chat.jobs[0].priority].append(chat_id)
+        self._wakeup.set()
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def _next_ready(self):
+        for ready in self._ready:
+            if ready:
+                return ready.popleft()
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            while self._delayed and self._delayed[0][0] <= now:
+                _, _, chat_id = heapq.heappop(self._delayed)
+                chat = self._chats[chat_id]
+                self._ready[chat.jobs[0].priority].append(chat_id)
+            if now >= self._next_sweep:
+                self._sweep(now)
+            if not any(self._ready):
+                self._wakeup.clear()
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            if delay := self.global_bucket.delay(now):
+                await asyncio.sleep(delay)
+                continue
+            chat_id = self._next_ready()
+            chat = self._chats[chat_id]
+            chat.scheduled = False
+            if delay := chat.bucket.delay(now):
+                self._schedule_chat(chat_id, chat, delay)
+                continue
+            self.global_bucket.take(now)
+            chat.bucket.take(now)
+            chat.busy = True
+            job = chat.jobs[0]
+            task = job.context.run(
+                asyncio.create_task, self._send(chat_id, chat, job)
+            )
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, chat_id, chat: _Chat, job: _Job):
+        retry_after = 0
+        try:
+            result = await job.send()
+        except ApiTelegramException as e:
+            if e.error_code == 429 and job.retries < self.max_retries:
+                job.retries += 1
+                self.retried += 1
+                retry_after = (e.result_json.get("parameters") or {}).get(
+                    "retry_after", 1
+                )
+            else:
+                self._fail(chat, job, e)
+        except Exception as e:
+            self._fail(chat, job, e)
+        else:
+            self._done(chat, job)
+            self.sent += 1
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            chat.busy = False
+        if retry_after:
+            # Сообщение остается первым в чате, чат ждет retry_after
+            log.warning(
+                "429",
+                extra={
+                    "chat_id": chat_id,
+                    "retry_after": retry_after,
+                    "depth": self.depth,
+                },
+            )
+            chat.bucket.pause(time.monotonic(), retry_after)
+        self._schedule_chat(chat_id, chat, chat.bucket.delay(time.monotonic()))
+
+    def _done(self, chat: _Chat, job: _Job):
+        chat.jobs.popleft()
+        self.depth -= 1
+        self._waits.append(time.monotonic() - job.queued_at)
+
+    def _fail(self, chat: _Chat, job: _Job, e: Exception):
+        self._done(chat, job)
+        self.failed += 1
+        if not job.future.done():
+            job.future.set_exception(e)
+
+    def _sweep(self, now: float):
+        """Убирает простаивающие чаты с полной корзиной"""
+        self._next_sweep = now + SWEEP_INTERVAL
+        for chat_id, chat in list(self._chats.items()):
+            if chat.jobs or chat.busy or chat.scheduled:
+                continue
+            chat.bucket.delay(now)  # Пополняет корзину
+            if chat.bucket.tokens >= chat.bucket.capacity:
+                del self._chats[chat_id]
+
+    def stats(self) -> dict:
+        """Метрики очереди: глубина и время от постановки до отправки"""
+        waits = sorted(self._waits)
+        count = len(waits)
+        return {
+            "depth": self.depth,
+            "chats": len(self._chats),
+            "in_flight": len(self._sending),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "wait_avg": sum(waits) / count if count else 0,
+            "wait_p95": waits[count * 95 // 100] if count else 0,
+            "wait_max": waits[-1] if count else 0,
+        }
+
+    async def close(self, timeout: float = 5):
+        """Ждет отправки очереди не дольше timeout и останавливает диспетчер"""
+        deadline = time.monotonic() + timeout
+        while (self.depth or self._sending) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -7,22 +7,81 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     BOT_TOKEN: str
+    BOT_API_URL: str | None = None  # Другой Bot API: http://host:port/bot{0}/{1}
     TESTERS_IDS: str
     LOG_FILE: str
     LOG_LEVEL: str
+    LOG_LEVELS: str = ""  # Уровни подсистем: messages=DEBUG,game=WARNING
+    LOG_SAMPLE_RATE: float = 0.01  # Доля отладочных записей о сообщениях
+    LOG_CONSOLE: bool = True  # Дублировать логи в stdout
+    RUNTIME_STATS_INTERVAL: float = 0  # Период записи показателей процесса, 0 - нет
+    METRICS_PORT: int = 0  # Порт /metrics для Prometheus, 0 - выключено
+    METRICS_HOST: str = "127.0.0.1"
+    TRACE_SAMPLE_RATE: float = 0  # Доля обновлений с трассировкой, 0 - выключено
+    TRACE_MIN_MS: float = 0  # Записывать только трассы не короче, мс
+    TRACE_FILE: str = "traces.txt"
     WORDS_FILE: str
     STATE_SAVE_DIR: str
     CHATS_STATS_DIR: str
     GLOBAL_STATS_FILE: str
 
+    STATE_SAVE_DELAY: float = 1  # Задержка записи состояния игры после изменения
+    STATE_BACKEND: str = "files"  # files | sqlite
+    STATE_DB_FILE: str = "games.db"
+    LOAD_CONCURRENCY: int = 32  # Сколько игр загружаем одновременно при старте
+    LOAD_PROGRESS_STEP: int = 1000  # Шаг вывода прогресса загрузки
+    CHAT_COMMANDS_RATE: float = 5  # Установок команд админам в секунду
+    GAMES_IDLE_TIME: float = 3600  # Через сколько секунд простоя игра выгружается
+    GAMES_CACHE_SIZE: int = 10000  # Сколько игр держим в памяти
+    GAMES_EVICT_INTERVAL: float = 60  # Период проверки простаивающих игр
+
     GAME_TIME: int
     EXCLUSIVE_TIME: int
     FAULT_SIZE: int  # Кол-во пропусков за который дается штраф
+    FUZZY_ANSWERS: bool = False  # Засчитывать другие формы слова и опечатки
+    FUZZY_MIN_LENGTH: int = 5  # С какой длины основы допускаем опечатку
+
+    # --- Получение обновлений ---
+    UPDATES_MODE: str = "polling"  # polling | webhook
+    WEBHOOK_URL: str | None = None  # Публичный адрес; без него setWebhook не вызывается
+    WEBHOOK_HOST: str = "0.0.0.0"
+    WEBHOOK_PORT: int = 8080
+    WEBHOOK_PATH: str = "/webhook"
+    WEBHOOK_SECRET: str | None = None  # Секретный токен вебхука, иначе случайный
+    WEBHOOK_MAX_CONNECTIONS: int = 40  # Одновременных запросов от телеграма
+    WEBHOOK_DRAIN_TIMEOUT: float = 10  # Сколько ждать обработки при остановке
+
+    # --- Шардирование (python -m src.sharding) ---
+    SHARDS: int = 1  # Процессов-воркеров, 1 - без шардирования
+    SHARD_INDEX: int = 0  # Номер воркера, задает фронт
+    SHARD_BASE_PORT: int = 8100  # Порт вебхука воркера 0, у остальных следующие
+
+    # --- Очередь исходящих сообщений ---
+    SEND_GLOBAL_RATE: float = 30  # Сообщений в секунду на всего бота
+    SEND_CHAT_RATE: float = 1  # Сообщений в секунду в личный чат
+    SEND_GROUP_RATE: float = 20 / 60  # Сообщений в секунду в группу
+    SEND_CHAT_BURST: float = 3  # Сообщений подряд в один чат
+    SEND_MAX_RETRIES: int = 5  # Повторов после ответа 429
+
+    # --- Удаление повторных ответов ---
+    DELETE_WINDOW: float = 1  # Сколько секунд копим сообщения чата для удаления
+    DELETE_MAX_FAILURES: int = 3  # Неудач подряд, после которых не удаляем в чате
+    DELETE_BLOCK_TIME: float = 3600  # На сколько секунд перестаем удалять
+
+    # --- Ошибки ---
+    ERRORS_DIGEST_INTERVAL: float = 60  # Период сводок ошибок тестерам
 
     # --- Статистика ---
     CHAT_STATS_SIZE: int
     GLOBAL_STATS_SIZE: int
 
+    # --- Хранилище статистики ---
+    STATS_BACKEND: str = "json"  # json | sqlite
+    STATS_DB_FILE: str = "stats.db"
+    STATS_FLUSH_INTERVAL: float = 5  # Секунд между записями статистики
+    STATS_FLUSH_BATCH: int = 100  # Записать раньше, если столько изменений
+    STATS_CACHE_SIZE: int = 1000  # Таблиц чатов в памяти
+
     # --- Параметры админки ---
     CHAT_PAGE_SIZE: int
 
@@ -31,6 +90,13 @@ class Settings(BaseSettings):
     OPEN_API_KEY: str
     GPT_MODEL: str
     PROMPT_FILE: str
+    PROMPTS_DIR: str | None = None  # Папка с файлами промптов <имя>.txt
+    PROMPT_CHECK_INTERVAL: float = 10  # Как часто проверять изменение файлов промптов
+    GPT_BASE_URL: str | None = None  # Другой адрес API, например локальная заглушка
+    GPT_TIMEOUT: float = 20  # Секунд на один ответ модели
+    GPT_POOL_SIZE: int = 5  # Готовых ответов на каждый промпт
+    GPT_BREAKER_FAILURES: int = 3  # Ошибок подряд, после которых не обращаемся к API
+    GPT_BREAKER_COOLDOWN: float = 300  # На сколько секунд
 
     model_config = SettingsConfigDict(env_file=".env")
 
@@ -0,0 +1,321 @@
+"""
+Шардирование чатов по нескольким процессам.
+
+Фронт получает обновления от телеграма (polling или вебхук) и по айди чата
+отправляет каждое одному из SHARDS процессов-воркеров. Воркер - обычный
+бот (main.py) в режиме вебхука на 127.0.0.1:SHARD_BASE_PORT + номер,
+он принимает обновления только с секретом фронта.
+
+Шард выбирается по айди чата, а не по полному айди игры: игры топиков
+и постов чата живут в том же воркере, что и сам чат, так что статистика
+чата, команды админов и удаление заблокированного чата остаются в одном
+процессе. Каждый воркер загружает и сохраняет только игры своего шарда,
+его таймеры, очередь отправки и лог тоже свои. Общая глобальная
+статистика пишется приращениями в SQLite (STATS_BACKEND=sqlite).
+
+Воркеры запускаются и перезапускаются фронтом:
+    SHARDS=4 python -m src.sharding
+"""
+
+import asyncio
+import os
+import secrets
+import signal
+import sys
+import zlib
+from collections import deque
+import aiohttp
+from telebot import asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
+from src.log import get_logger, setup_logging
+from src.settings import settings
+from src.webhook import SECRET_HEADER, WebhookServer
+
+WORKER_PATH = "/updates"
+FORWARD_BATCH = 100  # Обновлений в одном запросе к воркеру
+MAX_QUEUE = 10000  # Обновлений в очереди воркера, пока он недоступен
+RESTART_DELAY = 1  # Пауза перед перезапуском упавшего воркера, секунд
+
+# Где в обновлении искать чат; для остальных типов берется пользователь
+_CHAT_KEYS = (
+    "message",
+    "edited_message",
+    "channel_post",
+    "edited_channel_post",
+    "my_chat_member",
+    "chat_member",
+    "chat_join_request",
+    "message_reaction",
+    "message_reaction_count",
+    "chat_boost",
+    "removed_chat_boost",
+)
+_USER_KEYS = {
+    "inline_query": "from",
+    "chosen_inline_result": "from",
+    "shipping_query": "from",
+    "pre_checkout_query": "from",
+    "poll_answer": "user",
+}
+
+log = get_logger("sharding")
+
+
+def shard_of(chat_id: int | str, shards: int) -> int:
+    """Номер шарда чата, одинаковый во всех процессах"""
+    return zlib.crc32(str(chat_id).encode()) % shards
+
+
+def game_shard(game_chat_id: str, shards: int) -> int:
+    """Шард игры: игра топика или поста в шарде своего чата"""
+    end = game_chat_id.find("-", 1)
+    return shard_of(game_chat_id if end == -1 else game_chat_id[:end], shards)
+
+
+def is_own_game(game_chat_id: str) -> bool:
+    """Игра принадлежит этому воркеру (без шардирования - все игры)"""
+    if settings.SHARDS <= 1:
+        return True
+    return game_shard(game_chat_id, settings.SHARDS) == settings.SHARD_INDEX
+
+
+def shard_file(path: str) -> str:
+    """Свой файл для каждого воркера: log.txt -> log-2.txt"""
+    if settings.SHARDS <= 1:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}-{settings.SHARD_INDEX}{ext}"
+
+
+def update_chat_id(update: dict) -> int | None:
+    """Айди чата обновления (для callback_query - чат кнопки)"""
+    for key in _CHAT_KEYS:
+        if (item := update.get(key)) is not None:
+            return item["chat"]["id"]
+    if (call := update.get("callback_query")) is not None:
+        if (message := call.get("message")) is not None:
+            return message["chat"]["id"]
+        return call["from"]["id"]
+    for key, user_key in _USER_KEYS.items():
+        if (item := update.get(key)) is not None:
+            return item[user_key]["id"]
+    return None
+
+
+class _Worker:
+    __slots__ = ("index", "url", "queue", "sending", "ready", "process")
+
+    def __init__(self, index: int, url: str):
+        self.index = index
+        self.url = url
+        self.queue: deque[dict] = deque()
+        self.sending = 0  # Обновлений в отправляемой пачке
+        self.ready = asyncio.Event()
+        self.process: asyncio.subprocess.Process | None = None
+
+
+class ShardFront(WebhookServer):
+    """
+    Принимает обновления как вебхук (или через poll) и раскладывает
+    по очередям воркеров; из каждой очереди обновления уходят воркеру
+    пачками по порядку, так что порядок обновлений чата сохраняется.
+    """
+
+    def __init__(
+        self,
+        bot,
+        shards: int,
+        base_port: int,
+        command: list[str],
+        path: str = "/webhook",
+        secret_token: str | None = None,
+        drain_timeout: float = 10,
+    ):
+        """
+        :param bot: AsyncTeleBot, нужен только для setWebhook и токена
+        :param shards: число воркеров
+        :param base_port: порт воркера 0, у остальных следующие
+        :param command: команда запуска воркера
+        """
+        super().__init__(bot, path, secret_token, drain_timeout)
+        self.shards = shards
+        self.base_port = base_port
+        self.command = command
+        self.worker_secret = secrets.token_urlsafe(32)
+        self.workers = [
+            _Worker(i, f"http://127.0.0.1:{base_port + i}{WORKER_PATH}")
+            for i in range(shards)
+        ]
+        self.forwarded = 0
+        self.dropped = 0
+        self._session: aiohttp.ClientSession | None = None
+        self._background: list[asyncio.Task] = []
+
+    def worker_env(self, index: int) -> dict:
+        """Окружение воркера: его шард и вебхук для обновлений от фронта"""
+        return {
+            **os.environ,
+            "SHARDS": str(self.shards),
+            "SHARD_INDEX": str(index),
+            "UPDATES_MODE": "webhook",
+            "WEBHOOK_HOST": "127.0.0.1",
+            "WEBHOOK_PORT": str(self.base_port + index),
+            "WEBHOOK_PATH": WORKER_PATH,
+            "WEBHOOK_URL": "",
+            "WEBHOOK_SECRET": self.worker_secret,
+        }
+
+    def dispatch(self, data: dict):
+        """Кладет обновление в очередь воркера его чата"""
+        chat_id = update_chat_id(data)
+        worker = self.workers[0 if chat_id is None else shard_of(chat_id, self.shards)]
+        if len(worker.queue) >= MAX_QUEUE:
+            worker.queue.popleft()  # Воркер давно недоступен, старое теряем
+            self.dropped += 1
+        worker.queue.append(data)
+        worker.ready.set()
+
+    async def _post(self, worker: _Worker, batch: list[dict]) -> bool:
+        """Отправляет пачку воркеру, False - повторить позже"""
+        try:
+            async with self._session.post(
+                worker.url, json=batch, headers={SECRET_HEADER: self.worker_secret}
+            ) as response:
+                status = response.status
+        except aiohttp.ClientError as e:
+            log.debug("worker unavailable", extra={"shard": worker.index, "error": repr(e)})
+            return False
+        if status in (200, 400, 403):
+            if status != 200:  # Повтор не поможет
+                log.error("batch rejected", extra={"shard": worker.index, "status": status})
+            return True
+        return False  # 503 - воркер останавливается, дождемся нового
+
+    async def _forward(self, worker: _Worker):
+        while True:
+            if not worker.queue:
+                worker.ready.clear()
+                await worker.ready.wait()
+            batch = [
+                worker.queue.popleft()
+                for _ in range(min(len(worker.queue), FORWARD_BATCH))
+            ]
+            worker.sending = len(batch)
+            delay = 0.1
+            while not await self._post(worker, batch):
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 5)
+            worker.sending = 0
+            self.forwarded += len(batch)
+
+    async def _run_worker(self, worker: _Worker):
+        """Запускает процесс воркера и перезапускает, если он завершился"""
+        while True:
+            # Своя сессия: Ctrl+C получает только фронт и останавливает воркеров сам
+            worker.process = await asyncio.create_subprocess_exec(
+                *self.command,
+                env=self.worker_env(worker.index),
+                start_new_session=True,
+            )
+            code = await worker.process.wait()
+            log.error("worker exited", extra={"shard": worker.index, "code": code})
+            await asyncio.sleep(RESTART_DELAY)
+
+    def start_workers(self):
+        self._session = aiohttp.ClientSession()
+        for worker in self.workers:
+            self._background.append(asyncio.create_task(self._run_worker(worker)))
+            self._background.append(asyncio.create_task(self._forward(worker)))
+
+    async def poll(self, timeout: int = 20):
+        """Получение обновлений через getUpdates вместо вебхука"""
+        offset = None
+        while True:
+            try:
+                updates = await asyncio_helper.get_updates(
+                    self.bot.token, offset=offset, timeout=timeout
+                )
+            except Exception as e:
+                log.warning("getUpdates failed", extra={"error": repr(e)})
+                await asyncio.sleep(1)
+                continue
+            for data in updates:
+                self.dispatch(data)
+            if updates:
+                offset = updates[-1]["update_id"] + 1
+
+    async def stop(self):
+        """Дожидается отправки очередей и останавливает воркеров (SIGINT)"""
+        await self.drain()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.drain_timeout
+        while (
+            any(worker.queue or worker.sending for worker in self.workers)
+            and loop.time() < deadline
+        ):
+            await asyncio.sleep(0.05)
+        for task in self._background:
+            task.cancel()
+        self._background = []
+        for worker in self.workers:
+            if worker.process is not None and worker.process.returncode is None:
+                worker.process.send_signal(signal.SIGINT)
+        for worker in self.workers:
+            if worker.process is None:
+                continue
+            try:
+                await asyncio.wait_for(worker.process.wait(), self.drain_timeout)
+            except asyncio.TimeoutError:
+                worker.process.kill()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def serve(self, host: str, port: int, url: str | None = None, **kwargs):
+        """Вебхук фронта, как WebhookServer.serve, плюс воркеры"""
+        self.start_workers()
+        await super().serve(host, port, url, **kwargs)
+
+    async def serve_polling(self):
+        self.start_workers()
+        try:
+            await self.poll()
+        finally:
+            await self.stop()
+            await self.bot.close_session()
+
+
+async def run_front():
+    if settings.STATS_BACKEND != "sqlite":
+        # Глобальную статистику пишут все воркеры, это безопасно только в SQLite
+        raise ValueError("Sharded mode needs STATS_BACKEND=sqlite")
+    # Остановка по SIGTERM так же, как по Ctrl+C: с остановкой воркеров
+    asyncio.get_running_loop().add_signal_handler(
+        signal.SIGTERM, asyncio.current_task().cancel
+    )
+    front = ShardFront(
+        AsyncTeleBot(settings.BOT_TOKEN),
+        shards=settings.SHARDS,
+        base_port=settings.SHARD_BASE_PORT,
+        command=[sys.executable, "main.py"],
+        path=settings.WEBHOOK_PATH,
+        secret_token=settings.WEBHOOK_SECRET,
+        drain_timeout=settings.WEBHOOK_DRAIN_TIMEOUT,
+    )
+    if settings.UPDATES_MODE == "webhook":
+        await front.serve(
+            settings.WEBHOOK_HOST,
+            settings.WEBHOOK_PORT,
+            url=settings.WEBHOOK_URL,
+            max_connections=settings.WEBHOOK_MAX_CONNECTIONS,
+        )
+    else:
+        await front.serve_polling()
+
+
+if __name__ == "__main__":
+    setup_logging()
+    asyncio.run(run_front())
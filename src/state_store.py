@@ -0,0 +1,300 @@
+"""
+Хранилища состояний игр.
+
+FileStateStore - по файлу .pkl на каждый чат в STATE_SAVE_DIR (как раньше),
+SqliteStateStore - все игры в одной базе SQLite с индексами
+по времени изменения и активности.
+
+Перенос файлов .pkl в SQLite:
+    python -m src.state_store import
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import aiofiles
+from src.game_codec import decode_state
+from src.settings import settings
+
+
+def is_game_chat_id(game_chat_id: str) -> bool:
+    """Проверка, что это айди игры: чат, чат топика или чат поста"""
+    return game_chat_id.startswith("-") and (
+        game_chat_id.replace("-", "").replace("post", "").isdigit()
+    )
+
+
+class GameStateStore:
+    """Интерфейс хранилища состояний игр"""
+
+    async def save(self, game_chat_id: str, data: bytes, active: bool) -> None:
+        raise NotImplementedError
+
+    async def load(self, game_chat_id: str) -> bytes | None:
+        raise NotImplementedError
+
+    async def delete(self, game_chat_id: str) -> None:
+        raise NotImplementedError
+
+    async def list_ids(self) -> list[str]:
+        """Айди всех сохраненных игр"""
+        raise NotImplementedError
+
+    async def sorted_ids(self) -> list[str]:
+        """Айди всех сохраненных игр, последние измененные вначале"""
+        raise NotImplementedError
+
+    async def recent_ids(self, since: float) -> list[str]:
+        """Айди игр, измененных не раньше since (unix time)"""
+        raise NotImplementedError
+
+    async def active_ids(self) -> list[str]:
+        """Айди игр, сохраненных активными"""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class FileStateStore(GameStateStore):
+    """
+    Каждая игра в своем файле <game_chat_id>.pkl.
+    Пустой файл <game_chat_id>.active отмечает активную игру, чтобы не
+    читать все состояния ради active_ids.
+    """
+
+    def __init__(self, save_dir: str):
+        self.save_dir = save_dir
+
+    def file_name(self, game_chat_id: str) -> str:
+        return os.path.join(self.save_dir, game_chat_id + ".pkl")
+
+    def active_file_name(self, game_chat_id: str) -> str:
+        return os.path.join(self.save_dir, game_chat_id + ".active")
+
+    async def save(self, game_chat_id: str, data: bytes, active: bool) -> None:
+        """Пишем во временный файл и подменяем"""
+        file_name = self.file_name(game_chat_id)
+        tmp_file_name = os.path.join(self.save_dir, game_chat_id + ".tmp")
+        async with aiofiles.open(tmp_file_name, "wb") as f:
+            await f.write(data)
+        os.replace(tmp_file_name, file_name)
+        active_file_name = self.active_file_name(game_chat_id)
+        if active:
+            if not os.path.exists(active_file_name):
+                open(active_file_name, "wb").close()
+        else:
+            self._remove(active_file_name)
+
+    async def load(self, game_chat_id: str) -> bytes | None:
+        try:
+            async with aiofiles.open(self.file_name(game_chat_id), "rb") as f:
+                return await f.read()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _remove(file_name: str):
+        try:
+            os.remove(file_name)
+        except OSError:
+            pass
+
+    async def delete(self, game_chat_id: str) -> None:
+        self._remove(self.file_name(game_chat_id))
+        self._remove(self.active_file_name(game_chat_id))
+
+    async def list_ids(self) -> list[str]:
+        result = []
+        for file_name in os.listdir(self.save_dir):
+            game_chat_id, ext = os.path.splitext(file_name)
+            if ext == ".pkl" and is_game_chat_id(game_chat_id):
+                result.append(game_chat_id)
+        return result
+
+    async def sorted_ids(self) -> list[str]:
+        files = []
+        with os.scandir(self.save_dir) as entries:
+            for entry in entries:
+                game_chat_id, ext = os.path.splitext(entry.name)
+                if ext == ".pkl" and is_game_chat_id(game_chat_id):
+                    files.append((entry.stat().st_mtime, game_chat_id))
+        files.sort(reverse=True)
+        return [game_chat_id for _, game_chat_id in files]
+
+    async def recent_ids(self, since: float) -> list[str]:
+        result = []
+        with os.scandir(self.save_dir) as entries:
+            for entry in entries:
+                game_chat_id, ext = os.path.splitext(entry.name)
+                if (
+                    ext == ".pkl"
+                    and is_game_chat_id(game_chat_id)
+                    and entry.stat().st_mtime >= since
+                ):
+                    result.append(game_chat_id)
+        return result
+
+    async def active_ids(self) -> list[str]:
+        result = []
+        for file_name in os.listdir(self.save_dir):
+            game_chat_id, ext = os.path.splitext(file_name)
+            if ext == ".active" and is_game_chat_id(game_chat_id):
+                result.append(game_chat_id)
+        return result
+
+
+class SqliteStateStore(GameStateStore):
+    """
+    Все игры в одной базе SQLite (режим WAL).
+    Запросы выполняются в одном отдельном потоке.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS games (
+            game_chat_id TEXT PRIMARY KEY,
+            state BLOB NOT NULL,
+            active INTEGER NOT NULL DEFAULT 0,
+            last_modified REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS games_last_modified ON games (last_modified);
+        CREATE INDEX IF NOT EXISTS games_active ON games (active);
+    """
+
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+        self._conn: sqlite3.Connection | None = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="games")
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_file)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _save(self, game_chat_id: str, data: bytes, active: bool, last_modified=None):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO games (game_chat_id, state, active, last_modified) "
+                "VALUES (?, ?, ?, ?)",
+                (game_chat_id, data, int(active), last_modified or time.time()),
+            )
+
+    def _load(self, game_chat_id: str) -> bytes | None:
+        row = (
+            self._connect()
+            .execute("SELECT state FROM games WHERE game_chat_id = ?", (game_chat_id,))
+            .fetchone()
+        )
+        return row and row[0]
+
+    def _delete(self, game_chat_id: str) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM games WHERE game_chat_id = ?", (game_chat_id,))
+
+    def _list_ids(self) -> list[str]:
+        rows = self._connect().execute("SELECT game_chat_id FROM games")
+        return [game_chat_id for (game_chat_id,) in rows]
+
+    def _sorted_ids(self) -> list[str]:
+        rows = self._connect().execute(
+            "SELECT game_chat_id FROM games ORDER BY last_modified DESC"
+        )
+        return [game_chat_id for (game_chat_id,) in rows]
+
+    def _recent_ids(self, since: float) -> list[str]:
+        rows = self._connect().execute(
+            "SELECT game_chat_id FROM games WHERE last_modified >= ?", (since,)
+        )
+        return [game_chat_id for (game_chat_id,) in rows]
+
+    def _active_ids(self) -> list[str]:
+        rows = self._connect().execute(
+            "SELECT game_chat_id FROM games WHERE active = 1"
+        )
+        return [game_chat_id for (game_chat_id,) in rows]
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def save(self, game_chat_id: str, data: bytes, active: bool) -> None:
+        await self._run(self._save, game_chat_id, data, active)
+
+    async def load(self, game_chat_id: str) -> bytes | None:
+        return await self._run(self._load, game_chat_id)
+
+    async def delete(self, game_chat_id: str) -> None:
+        await self._run(self._delete, game_chat_id)
+
+    async def list_ids(self) -> list[str]:
+        return await self._run(self._list_ids)
+
+    async def sorted_ids(self) -> list[str]:
+        return await self._run(self._sorted_ids)
+
+    async def recent_ids(self, since: float) -> list[str]:
+        return await self._run(self._recent_ids, since)
+
+    async def active_ids(self) -> list[str]:
+        return await self._run(self._active_ids)
+
+    async def close(self) -> None:
+        await self._run(self._close)
+        self._executor.shutdown()
+
+
+def make_state_store() -> GameStateStore:
+    """Создает хранилище состояний игр согласно настройкам"""
+    match settings.STATE_BACKEND:
+        case "files":
+            return FileStateStore(settings.STATE_SAVE_DIR)
+        case "sqlite":
+            return SqliteStateStore(settings.STATE_DB_FILE)
+        case backend:
+            raise ValueError(f"Unknown STATE_BACKEND: {backend!r}")
+
+
+def import_pkl_to_sqlite(db_file: str = None):
+    """Переносит все файлы .pkl из STATE_SAVE_DIR в SQLite"""
+    store = SqliteStateStore(db_file or settings.STATE_DB_FILE)
+    files = FileStateStore(settings.STATE_SAVE_DIR)
+    games_count = 0
+    with os.scandir(settings.STATE_SAVE_DIR) as entries:
+        for entry in entries:
+            game_chat_id, ext = os.path.splitext(entry.name)
+            if ext != ".pkl" or not is_game_chat_id(game_chat_id):
+                continue
+            with open(files.file_name(game_chat_id), "rb") as f:
+                data = f.read()
+            try:
+                active = decode_state(data)["active"]
+            except Exception as e:
+                print(f"Пропущен {entry.name}: {e!r}")
+                continue
+            store._save(game_chat_id, data, active, entry.stat().st_mtime)
+            games_count += 1
+            if games_count % 1000 == 0:
+                print(f"{games_count=}")
+    store._close()
+    print(f"Готово: {games_count=}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["import"]:
+        import_pkl_to_sqlite(*sys.argv[2:3])
+    else:
+        print(__doc__)
@@ -0,0 +1,77 @@
+"""
+Отложенная запись состояний игр.
+
+Изменения игры только помечают ее как "грязную" (Game.mark_dirty),
+а фоновая задача раз в STATE_SAVE_DELAY секунд записывает все грязные игры.
+Несколько изменений одной игры за это время дают одну запись.
+"""
+
+import asyncio
+from src.log import get_logger
+
+log = get_logger("games")
+
+
+class GameStateWriter:
+    def __init__(self, delay: float):
+        self.delay = delay  # Максимальная задержка записи после изменения
+        self._dirty: dict = {}  # game_chat_id -> Game
+        self._saving: set[str] = set()  # Записываются прямо сейчас
+        self._event = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+
+    def mark_dirty(self, game):
+        self._dirty[game.game_chat_id] = game
+        self._event.set()
+
+    def discard(self, game_chat_id: str):
+        """Игра удалена, записывать ее не нужно"""
+        self._dirty.pop(game_chat_id, None)
+
+    def is_dirty(self, game_chat_id: str) -> bool:
+        """Есть изменения, которых еще нет в хранилище (в том числе пишутся)"""
+        return game_chat_id in self._dirty or game_chat_id in self._saving
+
+    @property
+    def pending(self) -> int:
+        return len(self._dirty)
+
+    async def flush(self):
+        """Записывает все грязные игры"""
+        async with self._flush_lock:
+            dirty, self._dirty = self._dirty, {}
+            self._saving.update(dirty)
+            self._event.clear()
+            for game_chat_id, game in dirty.items():
+                try:
+                    await game.save_game()
+                except Exception as e:
+                    log.error(
+                        "save_game failed",
+                        extra={"game_chat_id": game_chat_id, "error": repr(e)},
+                    )
+                    self._dirty.setdefault(game_chat_id, game)
+                finally:
+                    # Игру можно выгружать только когда запись закончилась
+                    self._saving.discard(game_chat_id)
+            if self._dirty:  # Повторим в следующий раз
+                self._event.set()
+
+    async def _writer_loop(self):
+        while True:
+            await self._event.wait()
+            await asyncio.sleep(self.delay)  # Собираем изменения за это время
+            await self.flush()
+
+    def start(self):
+        """Запуск фоновой записи, вызывается из работающего цикла событий"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._writer_loop())
+
+    async def close(self):
+        """Остановка: записываем все, что не записано"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
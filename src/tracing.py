@@ -0,0 +1,167 @@
+"""
+Трассировка обработки обновлений.
+
+Каждое выбранное обновление (доля TRACE_SAMPLE_RATE) получает трассу
+с айди; участки обработки - спаны: обработчик, check_user_answer,
+add_current_word_to_used, inc_user_stat, gpt_injection, вызовы Bot API
+(спаны api.<метод> ставит src.metrics.instrument_api вместе с метриками).
+Трасса и текущий спан лежат в contextvars, так что спаны вложенных
+вызовов попадают в трассу своего обновления, даже если обновления
+обрабатываются одновременно.
+
+Завершенные трассы не короче TRACE_MIN_MS пишутся строкой JSON в
+TRACE_FILE (с ротацией, через очередь, как логи). Самые медленные и
+разбивку времени по спанам показывает tools/slow_traces.py.
+
+Вне трассы спан почти ничего не стоит: одно чтение contextvar.
+"""
+
+import functools
+import inspect
+import os
+import random
+import time
+from contextvars import ContextVar
+
+TRACE_FILE_SIZE = 10 * 1024 * 1024
+TRACE_FILE_BACKUPS = 5
+
+_sample_rate = 0.0  # Задается в setup_tracing
+_min_duration = 0.0
+_exporter = None
+
+_trace: ContextVar["Trace | None"] = ContextVar("trace", default=None)
+_parent: ContextVar[int] = ContextVar("span_parent", default=-1)
+
+
+class Trace:
+    __slots__ = ("trace_id", "kind", "attrs", "wall_time", "start", "spans", "done")
+
+    def __init__(self, kind: str, attrs: dict):
+        self.trace_id = os.urandom(8).hex()
+        self.kind = kind  # Тип обновления: message, callback_query...
+        self.attrs = attrs
+        self.wall_time = time.time()
+        self.start = time.perf_counter()
+        # [имя, начало от старта трассы, длительность, номер родителя]
+        self.spans: list[list] = []
+        # Закрытая трасса; фоновые задачи, созданные из нее, спаны не добавляют
+        self.done = False
+
+    def export(self, duration: float):
+        spans = [
+            {
+                "name": name,
+                "start_ms": round(start * 1000, 3),
+                "ms": round(length * 1000, 3) if length is not None else None,
+                "parent": parent,
+            }
+            for name, start, length, parent in self.spans
+        ]
+        _exporter.info(
+            "trace",
+            extra={
+                "trace_id": self.trace_id,
+                "time": round(self.wall_time, 3),
+                "kind": self.kind,
+                "ms": round(duration * 1000, 3),
+                **self.attrs,
+                "spans": spans,
+            },
+        )
+
+
+class trace:
+    """Трасса обработки обновления: with trace("message", chat_id=...)"""
+
+    __slots__ = ("kind", "attrs", "_trace", "_token")
+
+    def __init__(self, kind: str, **attrs):
+        self.kind = kind
+        self.attrs = attrs
+        self._trace = None
+
+    def __enter__(self):
+        if _sample_rate and random.random() < _sample_rate:
+            self._trace = Trace(self.kind, self.attrs)
+            self._token = _trace.set(self._trace)
+        return self._trace
+
+    def __exit__(self, exc_type, exc, tb):
+        if (current := self._trace) is None:
+            return
+        _trace.reset(self._token)
+        current.done = True
+        duration = time.perf_counter() - current.start
+        if exc_type is not None:
+            current.attrs["error"] = exc_type.__name__
+        if duration >= _min_duration:
+            current.export(duration)
+
+
+class span:
+    """Участок обработки внутри текущей трассы: with span("gpt")"""
+
+    __slots__ = ("name", "_trace", "_index", "_token")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        current = self._trace = _trace.get()
+        if current is None or current.done:
+            self._trace = None
+            return self
+        self._index = len(current.spans)
+        current.spans.append(
+            [self.name, time.perf_counter() - current.start, None, _parent.get()]
+        )
+        self._token = _parent.set(self._index)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if (current := self._trace) is None:
+            return
+        _parent.reset(self._token)
+        item = current.spans[self._index]
+        item[2] = time.perf_counter() - current.start - item[1]
+
+
+def traced(func):
+    """Декоратор: вызов функции (обычной или корутины) - спан с ее именем"""
+    name = func.__qualname__
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if _trace.get() is None:
+                return await func(*args, **kwargs)
+            with span(name):
+                return await func(*args, **kwargs)
+
+    else:
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _trace.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+
+    return wrapper
+
+
+def setup_tracing(trace_file: str, sample_rate: float, min_ms: float = 0):
+    """Включает трассировку доли sample_rate обновлений"""
+    global _sample_rate, _min_duration, _exporter
+    if not sample_rate:
+        return
+    # Не при импорте: src.log читает настройки, а my_telebot импортируется
+    # и инструментами без .env (tools/check_send_queue)
+    from src.log import get_file_logger
+
+    _exporter = get_file_logger(
+        "crocobot_traces", trace_file, TRACE_FILE_SIZE, TRACE_FILE_BACKUPS
+    )
+    _min_duration = min_ms / 1000
+    _sample_rate = sample_rate
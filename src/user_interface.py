@@ -1,9 +1,23 @@
 from random import randint
 from telebot import util
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
-from app import gpt
+from app.gpt_pool import gpt_pool
+from app.prompts import prompts, prompt_file
 from src.settings import settings
-from src.utils import log_error
+from src.tracing import traced
+
+
+# Промпты сообщений. В PROMPTS_DIR их можно переопределить файлами <имя>.txt
+prompts.register(
+    "end_game",
+    "Напиши мотивационный текст в одном предложении для участия в игре, где нужно объяснить загаданное слово другими словами. Тон должен быть в меру строгим, с тонкой ноткой завуалированного и красивого юмора и с не более 210 символов. В тексте не упоминай, что это виртуальная игра «Крокодил». Упомяни правило: . Ответ должен содержать только готовое предложение.",
+    prompt_file("end_game"),
+)
+prompts.register(
+    "new_round",
+    "Напиши мотивационный текст в одном предложении для участия в игре, где нужно объяснить загаданное слово другими словами. Тон должен быть в меру строгим, с тонкой ноткой завуалированного юмора и с не более 210 символов. В тексте не упоминай, что это виртуальная игра «Крокодил». Добавь пожелание следующему ведущему и укажи не использовать однокоренные слова. Упомяни правило: без использования однокоренных слов. Ответ должен содержать только готовое предложение.",
+    prompt_file("new_round"),
+)
 
 
 def get_welcome_message(bot_title):
@@ -78,7 +92,7 @@ def get_start_game_message(user, minutes):
 def get_lead_game_message(user, minutes):
     user_name = util.user_link(user)
     m = get_correct_word_form(minutes)
-    word_of_gpt = gpt_injection()
+    word_of_gpt = gpt_injection("default")  # Промпт из PROMPT_FILE
     text = f"<b>{user_name}</b> объясняет слово ⚡️\nВремя раунда <b>{minutes}</b> {m}\n{word_of_gpt}"
     return dict(
         text=text,
@@ -93,9 +107,7 @@ def get_game_already_started_message():
 
 
 def get_end_game_message(word):
-    word_of_gpt = gpt_injection(
-        "Напиши мотивационный текст в одном предложении для участия в игре, где нужно объяснить загаданное слово другими словами. Тон должен быть в меру строгим, с тонкой ноткой завуалированного и красивого юмора и с не более 210 символов. В тексте не упоминай, что это виртуальная игра «Крокодил». Упомяни правило: . Ответ должен содержать только готовое предложение."
-    )
+    word_of_gpt = gpt_injection("end_game")
     text = (
         f"<b>Игра завершена :(</b>\nЗагаданное слово было: <b>{word}</b>.\n{word_of_gpt}\n"
         f"Нажмите /start, чтобы возобновить игру."
@@ -105,9 +117,7 @@ def get_end_game_message(word):
 
 def get_new_game_message(user, current_word):
     user_link = util.user_link(user)
-    word_of_gpt = gpt_injection(
-        "Напиши мотивационный текст в одном предложении для участия в игре, где нужно объяснить загаданное слово другими словами. Тон должен быть в меру строгим, с тонкой ноткой завуалированного юмора и с не более 210 символов. В тексте не упоминай, что это виртуальная игра «Крокодил». Добавь пожелание следующему ведущему и укажи не использовать однокоренные слова. Упомяни правило: без использования однокоренных слов. Ответ должен содержать только готовое предложение."
-    )
+    word_of_gpt = gpt_injection("new_round")
     text = f"⚡️ {user_link} отгадал(-а) слово <b>{current_word}</b>!\n{word_of_gpt}\nКто хочет следующим ведущим?"
     return dict(text=text, reply_markup=make_lead_markup, parse_mode="HTML")
 
@@ -119,26 +129,20 @@ def get_fault_message(user_id, user_name):
     return dict(text=text, parse_mode="HTML")
 
 
-def gpt_injection(prompt: str = None) -> str:
+@traced
+def gpt_injection(prompt_name: str) -> str:
     """
     Вставка текстов мотивации от модели ChatGPT.
-    Чтобы заработал, надо внести промпт в файл gpt-prompt.txt.
-    Функция считывает содержимое этого файла каждый раз,
-    когда к ней обращаются. Поэтому не нужно перезагружать бота,
-    если изменился промпт.
+    prompt_name - имя промпта в реестре (app.prompts): "default" (начало
+    раунда, файл PROMPT_FILE), "end_game" и "new_round" (тексты выше,
+    переопределяются файлами в PROMPTS_DIR). Пустой промпт - без вставки.
+    Реестр сам перечитывает измененные файлы, поэтому не нужно
+    перезагружать бота, если изменился промпт.
+    Ответ берется из заранее сгенерированного запаса (app.gpt_pool),
+    модель здесь не вызывается.
     """
-    if settings.GPT_INJECTION:
-        if prompt is None:
-            try:
-                with open(settings.PROMPT_FILE, encoding="utf-8") as f:
-                    prompt = f.read().strip()
-            except FileNotFoundError:
-                prompt = ""
-
-        if prompt and randint(1, 5) == 1:
-            try:
-                gpt_joke = "\n" + gpt.generate_answer(prompt) + "\n"
-                return f"<i>{gpt_joke}</i>"
-            except Exception as e:
-                log_error(str(e))
+    if settings.GPT_INJECTION and randint(1, 5) == 1:
+        if prompt := prompts.get(prompt_name):
+            if gpt_joke := gpt_pool.take(prompt_name, prompt):
+                return f"<i>\n{gpt_joke}\n</i>"
     return ""
@@ -1,13 +1,22 @@
 """Разные вспомогательные утилиты"""
 
-import re
-import os
-import pickle
-import aiofiles
+import asyncio
+import functools
+import time
 from telebot.types import Message, User
 from src.game import Game
-from src.config import TESTERS_IDS, bot_username, games, sync_bot
+from src.answer_matcher import fold_answer
+from src.game_codec import decode_state, StateDecodeError
+from src.config import TESTERS_IDS, bot, bot_username, games
 from src.config import logger, settings, set_chat_admin_commands
+from src.chat_commands import ChatCommandsRegistrar
+from src.delete_batcher import DeleteBatcher
+from src.error_reporter import ErrorReporter
+from src.send_queue import NOTIFICATION
+from src.log import get_logger
+from src.metrics import storage_seconds, timed
+from src.tracing import traced
+from src.sharding import is_own_game
 from app.statistics import inc_user_stat
 
 
@@ -34,88 +43,139 @@ def is_admin_message(message: Message):
         return True
 
 
+games_log = get_logger("games")
+messages_log = get_logger("messages", sampled=True)
+game_log = get_logger("game")
+
+# Ошибки уходят тестерам сводками, не чаще раза в ERRORS_DIGEST_INTERVAL
+error_reporter = ErrorReporter(
+    functools.partial(bot.send_message, priority=NOTIFICATION),
+    TESTERS_IDS,
+    interval=settings.ERRORS_DIGEST_INTERVAL,
+    logger=logger,
+)
+
+
 def log_error(msg: str):
-    for tg_id in TESTERS_IDS:
-        try:
-            sync_bot.send_message(tg_id, msg)
-        except:
-            pass
-        logger.error(msg)
-
-
-async def load_game(
-    filename: str, game_chat_id: str, chats_set_commands: set, **kwargs
-) -> Game | None:
-    """Загружает файл игры, если получается.
-    Либо удаляет его если не актуальный или бот заблокирован в чате.
-    Также делает попытку установить команды админам.
-    """
+    error_reporter.report(msg)
 
-    def remove_chat_file(chat_filename):
-        print("removing...")
-        try:
-            os.remove(settings.STATE_SAVE_DIR + chat_filename)
-        except:
-            pass
 
-    print(f"load_game: {filename=} {game_chat_id=} {len(chats_set_commands)=}")
+@timed(storage_seconds, "load_game")
+async def load_game(game_chat_id: str, **kwargs) -> Game | None:
+    """Загружает состояние игры, если получается.
+    Либо удаляет его если не актуальный.
+    """
     try:
-        async with aiofiles.open(settings.STATE_SAVE_DIR + filename, "rb") as f:
-            content = await f.read()
-            state = pickle.loads(content)
-            if (
-                not state["active"]
-                and game_chat_id != str(state["chat_id"])  # Чат топика или поста
-                and not state["exclusive_timer"]
-                and not state["used_words"]
-            ):
-                # В чате топика или поста не было игры, можно удалять
-                return remove_chat_file(filename)
-
-            chat_id = state["chat_id"]
-            if chat_id not in chats_set_commands:
-                if chat_available := await set_chat_admin_commands(state["chat_id"]):
-                    chats_set_commands.add(chat_id)
-                elif chat_available == -1:  # Чат не доступен, скорее всего заблокирован
-                    return remove_chat_file(filename)
-
-            if state["active"] and state["game_timer"] is None:
-                # Чиним не завершенные игры
-                state["active"] = False
-
-            restored_game = await Game.load_state(
-                state,
-                game_chat_id=game_chat_id,
-                **kwargs,
-            )
-            return restored_game
-    except EOFError:
-        log_error("Ошибка при загрузке файла %r" % filename)
-
-
-async def load_games(**kwargs):
-    loaded_game_states = {}
-    chats_count = 0
-    blocked_chats = 0
-    chats_set = set()
-    for filename_pkl in os.listdir(settings.STATE_SAVE_DIR):
-        filename, ext = filename_pkl.split(".")
+        content = await Game.state_store.load(game_chat_id)
+        if content is None:
+            return
+        state = decode_state(content)
         if (
-            ext == "pkl"
-            and filename.startswith("-")
-            and filename.replace("-", "").replace("post", "").isdigit()
+            not state["active"]
+            and game_chat_id != str(state["chat_id"])  # Чат топика или поста
+            and not state["exclusive_timer"]
+            and not state["used_words"]
         ):
-            chat_id = filename
-            restored_game = await load_game(filename_pkl, chat_id, chats_set, **kwargs)
-            if restored_game is not None:
-                chats_count += 1
-                loaded_game_states[chat_id] = restored_game
-            else:
-                blocked_chats += 1
-    print(f"{chats_count=}, {blocked_chats=}")
-    Game.games.update(loaded_game_states)
+            # В чате топика или поста не было игры, можно удалять
+            games_log.info("removing game", extra={"game_chat_id": game_chat_id})
+            return await Game.delete_game(game_chat_id)
+
+        if state["active"] and state["game_timer"] is None:
+            # Чиним не завершенные игры
+            state["active"] = False
+
+        restored_game = await Game.load_state(
+            state,
+            game_chat_id=game_chat_id,
+            **kwargs,
+        )
+        chat_commands.add(restored_game.chat_id)
+        return restored_game
+    except StateDecodeError as e:
+        log_error("Ошибка при загрузке игры %r: %s" % (game_chat_id, e))
+
+
+async def remove_blocked_chat(chat_id: int):
+    """Бот заблокирован в чате: удаляем все загруженные игры чата"""
+    games_log.info("chat unavailable, removing games", extra={"chat_id": chat_id})
+    for game_chat_id, game in list(Game.games.items()):
+        if game.chat_id == chat_id:
+            await Game.delete_game(game_chat_id)
+
+
+# Установка команд админам чатов в фоне, после запуска бота
+chat_commands = ChatCommandsRegistrar(
+    set_chat_admin_commands,
+    rate=settings.CHAT_COMMANDS_RATE,
+    on_blocked=remove_blocked_chat,
+)
+
+# Удаление повторных ответов пачками по чатам
+deleter = DeleteBatcher(
+    bot.delete_messages,
+    window=settings.DELETE_WINDOW,
+    max_failures=settings.DELETE_MAX_FAILURES,
+    block_time=settings.DELETE_BLOCK_TIME,
+)
+
+
+async def load_game_ids(**kwargs):
+    """
+    Айди игр из хранилища и посты каналов при старте.
+    Вызывается до приема обновлений: иначе get_game не знает о сохраненной
+    игре и start_game создает вместо нее новую, а сообщения в обсуждениях
+    постов не узнаются как чаты постов.
+    """
+    Game.loader = functools.partial(load_game, **kwargs)
+    # В шардированном режиме только игры своего шарда
+    game_chat_ids = await Game.state_store.list_ids()
+    game_chat_ids = [i for i in game_chat_ids if is_own_game(i)]
+    Game.known_ids.update(game_chat_ids)
+    for game_chat_id in game_chat_ids:
+        Game.register_channel_post(game_chat_id)
+
 
+async def load_games():
+    """
+    Подготовка кэша игр при старте, после load_game_ids.
+    Сразу загружаются только игры, у которых могут быть незавершенные таймеры
+    (активные и измененные позже, чем самый длинный таймер назад), не более
+    LOAD_CONCURRENCY одновременно. Остальные загружаются при первом
+    обращении через Game.get_game.
+    """
+    started = time.monotonic()
+    since = time.time() - max(settings.GAME_TIME, settings.EXCLUSIVE_TIME) - 60
+    recent_ids = await Game.state_store.recent_ids(since)
+    # Активные игры тоже: их таймер мог истечь, пока бот не работал
+    recent_ids = set(recent_ids).union(await Game.state_store.active_ids())
+    recent_ids = [i for i in recent_ids if is_own_game(i)]
+    total = len(recent_ids)
+    semaphore = asyncio.Semaphore(settings.LOAD_CONCURRENCY)
+    done = 0
+
+    async def load_one(game_chat_id: str):
+        nonlocal done
+        try:
+            async with semaphore:
+                await Game.load_game(game_chat_id)
+        except Exception as e:
+            log_error("Ошибка при загрузке игры %r: %r" % (game_chat_id, e))
+        done += 1
+        if done % settings.LOAD_PROGRESS_STEP == 0:
+            games_log.info(
+                "load_games: %d/%d, %.1fs", done, total, time.monotonic() - started
+            )
+
+    await asyncio.gather(*(load_one(game_chat_id) for game_chat_id in recent_ids))
+    games_log.info(
+        "games=%d, loaded=%d, %.1fs",
+        len(Game.known_ids),
+        len(Game.games),
+        time.monotonic() - started,
+    )
 
+
+@traced
 async def check_user_answer(message: Message, game: Game):
     """
     Проверка ответов пользователей в чате:
@@ -128,24 +188,15 @@ async def check_user_answer(message: Message, game: Game):
         None - не угадал
     """
     answer = message.text
-    print("check_user_answer", answer, game.leader_name)
-    user_answer = answer.lower().replace("ё", "е").replace("й", "и")
+    messages_log.debug(
+        "check_user_answer",
+        extra={"game_chat_id": game.game_chat_id, "answer": answer},
+    )
+    user_answer = fold_answer(answer)
     if user_answer in game.answers_set:
         return -1
 
-    normalized_current_word = re.sub(
-        r"[^а-яa-z]+",
-        " ",
-        game.current_word.replace("ё", "е").replace("й", "и"),
-        flags=re.IGNORECASE,
-    )
-    set_of_correct_words = set(word.lower() for word in normalized_current_word.split())
-    normalized_user_answer = re.sub(
-        r"[^а-яa-z]+", " ", user_answer, flags=re.IGNORECASE
-    )
-    set_of_words_in_message = set(word for word in normalized_user_answer.split())
-
-    if not (set_of_correct_words - set_of_words_in_message):
+    if game.answer_matcher.match(answer):
         # Угадал слово
         await game.add_current_word_to_used(message.from_user)
         await inc_user_stat(game, message.from_user)  # Изменяем статистику
@@ -158,12 +209,13 @@ def log_game(text: str, game: Game, user: User | tuple):
         user_id, user_name = user
     else:
         user_id, user_name = user.id, user.full_name
-    logger.info(
-        "Chat=%s %r, user=%s %r, word=%r :: %s",
-        game.chat_id,
-        game.chat_title,
-        user_id,
-        user_name,
-        game.current_word,
+    game_log.info(
         text,
+        extra={
+            "chat_id": game.chat_id,
+            "chat_title": game.chat_title,
+            "user_id": user_id,
+            "user_name": user_name,
+            "word": game.current_word,
+        },
     )
@@ -0,0 +1,163 @@
+"""
+Прием обновлений через вебхук вместо long polling.
+
+Телеграм присылает обновления POST-запросами на aiohttp-сервер.
+Запрос без правильного секретного токена (заголовок
+X-Telegram-Bot-Api-Secret-Token) отклоняется. Принятое обновление
+сразу подтверждается ответом 200, а обрабатывается отдельной задачей
+теми же обработчиками MyTeleBot, что и при polling.
+
+При остановке сервер перестает принимать обновления (отвечает 503,
+телеграм пришлет их повторно) и ждет завершения уже принятых,
+не дольше drain_timeout секунд.
+"""
+
+import asyncio
+import hmac
+import secrets
+from collections import deque
+from aiohttp import web
+from telebot.types import Update
+from src.log import get_logger
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+RECENT_UPDATES = 1000  # Сколько последних update_id помним для отсева повторов
+
+log = get_logger("webhook")
+
+
+class WebhookServer:
+    def __init__(
+        self,
+        bot,
+        path: str = "/webhook",
+        secret_token: str | None = None,
+        drain_timeout: float = 10,
+    ):
+        """
+        :param bot: MyTeleBot, обновления уходят в bot.process_new_updates
+        :param path: путь, на который телеграм присылает обновления
+        :param secret_token: секрет вебхука, если не задан - случайный
+        :param drain_timeout: сколько ждать обработки принятых обновлений при остановке
+        """
+        self.bot = bot
+        self.path = path
+        self.secret_token = secret_token or secrets.token_urlsafe(32)
+        self.drain_timeout = drain_timeout
+        self.accepting = False
+        self.received = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self._tasks: set[asyncio.Task] = set()
+        self._recent: set[int] = set()
+        self._recent_order: deque[int] = deque()
+        self._runner: web.AppRunner | None = None
+        self.url = None
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    def _is_duplicate(self, update_id: int) -> bool:
+        """Телеграм повторяет обновление, если не дождался ответа"""
+        if update_id in self._recent:
+            return True
+        self._recent.add(update_id)
+        self._recent_order.append(update_id)
+        if len(self._recent_order) > RECENT_UPDATES:
+            self._recent.discard(self._recent_order.popleft())
+        return False
+
+    async def handle(self, request: web.Request) -> web.Response:
+        secret = request.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(secret.encode(), self.secret_token.encode()):
+            self.rejected += 1
+            return web.Response(status=403)
+        if not self.accepting:
+            return web.Response(status=503)
+        try:
+            data = await request.json()
+            # Телеграм присылает одно обновление, фронт шардов - пачку
+            updates = data if isinstance(data, list) else [data]
+            update_ids = [update["update_id"] for update in updates]
+        except (ValueError, KeyError, TypeError) as e:
+            log.warning("bad update", extra={"error": repr(e)})
+            return web.Response(status=400)
+
+        for update, update_id in zip(updates, update_ids):
+            self.received += 1
+            if self._is_duplicate(update_id):
+                self.duplicates += 1
+                continue
+            self.dispatch(update)
+        return web.Response()
+
+    def dispatch(self, data: dict):
+        """Обработка обновления отдельной задачей"""
+        task = asyncio.create_task(self._process(data))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, data: dict):
+        try:
+            update = Update.de_json(data)
+            await self.bot.process_new_updates([update])
+        except Exception:
+            log.exception("update failed", extra={"update_id": data["update_id"]})
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        return app
+
+    async def start(self, host: str, port: int):
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]  # Если port=0
+        self.url = f"http://{host}:{port}{self.path}"
+        self.accepting = True
+        log.info("webhook started", extra={"host": host, "port": port, "path": self.path})
+
+    async def set_webhook(self, url: str, max_connections: int = None):
+        """Сообщает телеграму адрес вебхука и секрет"""
+        await self.bot.set_webhook(
+            url,
+            secret_token=self.secret_token,
+            max_connections=max_connections,
+        )
+
+    async def drain(self):
+        """Перестает принимать обновления и дожидается принятых"""
+        self.accepting = False
+        if self._tasks:
+            log.info("draining", extra={"in_flight": self.in_flight})
+            _, pending = await asyncio.wait(
+                set(self._tasks), timeout=self.drain_timeout
+            )
+            for task in pending:
+                task.cancel()
+            if pending:
+                log.warning("drain timeout", extra={"cancelled": len(pending)})
+
+    async def stop(self):
+        await self.drain()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def serve(self, host: str, port: int, url: str | None = None, **kwargs):
+        """
+        Работает до отмены, как bot.infinity_polling.
+        :param url: публичный адрес вебхука; если не задан, setWebhook не вызывается
+            (например, для локальной проверки через tools/post_updates.py)
+        """
+        await self.start(host, port)
+        try:
+            if url:
+                await self.set_webhook(url, **kwargs)
+            await asyncio.Event().wait()
+        finally:
+            await self.stop()
+            await self.bot.close_session()
@@ -0,0 +1,103 @@
+"""
+Проверка пула ответов ChatGPT (app.gpt_pool) на локальной заглушке API.
+
+Этапы: пул наполняется; модель начинает отвечать дольше таймаута
+и размыкатель отключает обращения к API, а take() по-прежнему
+мгновенно отдает запас или None; после паузы пул снова наполняется.
+
+    python -m tools.check_gpt_pool
+"""
+
+import asyncio
+import json
+import sys
+import time
+from bench.common import setup_env
+
+setup_env(GPT_INJECTION="true")
+
+from openai import AsyncOpenAI  # noqa: E402
+from app.gpt_pool import GptPool  # noqa: E402
+from tools.stub_openai import StubOpenAI  # noqa: E402
+
+NAME = "default"
+PROMPT = "Напиши мотивационный текст"
+POOL_SIZE = 5
+TIMEOUT = 0.3
+COOLDOWN = 1
+
+
+async def wait_for(condition, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+
+def take_timed(pool: GptPool) -> tuple[str | None, float]:
+    start = time.perf_counter()
+    answer = pool.take(NAME, PROMPT)
+    return answer, (time.perf_counter() - start) * 1e6
+
+
+async def main():
+    stub = StubOpenAI(latency=0.02)
+    await stub.start()
+    client = AsyncOpenAI(api_key="stub", base_url=stub.base_url, max_retries=0)
+
+    async def generate(prompt: str) -> str:
+        response = await client.chat.completions.create(
+            model="stub", messages=[{"role": "user", "content": prompt}]
+        )
+        return response.choices[0].message.content
+
+    pool = GptPool(
+        generate,
+        pool_size=POOL_SIZE,
+        timeout=TIMEOUT,
+        breaker_failures=3,
+        breaker_cooldown=COOLDOWN,
+    )
+    pool.start()
+    pool.add_prompt(NAME, PROMPT)
+    size = lambda: len(pool._pools[NAME])  # noqa: E731
+    results = {"filled": await wait_for(lambda: size() == POOL_SIZE, 5)}
+
+    # Модель зависла: ответы дольше таймаута
+    stub.latency = TIMEOUT * 3
+    takes = [take_timed(pool) for _ in range(POOL_SIZE + 3)]
+    results["take_max_us"] = round(max(t for _, t in takes), 3)
+    results["answers_while_slow"] = sum(answer is not None for answer, _ in takes)
+    results["breaker_opened"] = await wait_for(lambda: pool.is_open, 5)
+    requests_when_open = stub.requests
+    await asyncio.sleep(COOLDOWN / 2)
+    results["requests_while_open"] = stub.requests - requests_when_open
+
+    # Модель ожила
+    stub.latency = 0.02
+    results["refilled"] = await wait_for(lambda: size() == POOL_SIZE, COOLDOWN + 5)
+    results["pool"] = {
+        "generated": pool.generated,
+        "errors": pool.errors,
+        "misses": pool.misses,
+    }
+    results["stub"] = {"requests": stub.requests, "failed": stub.failed}
+
+    pool.stop()
+    await client.close()
+    await stub.stop()
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    ok = (
+        results["filled"]
+        and results["breaker_opened"]
+        and results["requests_while_open"] == 0
+        and results["refilled"]
+    )
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,122 @@
+"""
+Проверка очереди исходящих сообщений (src.send_queue) на фейковом Bot API.
+
+Всплеск как после рестарта: сотни групп получают уведомления о конце
+раунда, одновременно игроки ждут ответов на команды. Сравнивается
+отправка напрямую и через очередь: сколько 429 и потерянных сообщений,
+сохранен ли порядок в чатах, сколько ждали ответы и уведомления.
+Все ограничения скорости умножаются на SPEED, чтобы проверка шла секунды.
+
+    python -m tools.check_send_queue [групп]
+"""
+
+import asyncio
+import json
+import sys
+import time
+from telebot import asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
+from src.my_telebot import MyTeleBot
+from src.send_queue import SendQueue, INTERACTIVE, NOTIFICATION
+from tools.fake_bot_api import FakeBotApi
+
+SPEED = 10  # Во сколько раз ускорены ограничения телеграма
+GROUPS = 300
+PRIVATE = 30
+ORDERED_MESSAGES = 10  # Сообщений подряд в один чат для проверки порядка
+
+
+def make_burst(groups: int) -> list[tuple[int, str, int]]:
+    """(чат, текст, приоритет) в порядке постановки"""
+    burst = []
+    for i in range(groups):
+        chat_id = -1000 - i
+        burst.append((chat_id, "Время вышло", NOTIFICATION))
+        burst.append((chat_id, "Новый раунд", NOTIFICATION))
+    for i in range(ORDERED_MESSAGES):
+        burst.append((-999, f"#{i}", NOTIFICATION))
+    for i in range(PRIVATE):
+        burst.append((10 + i, "Привет", INTERACTIVE))
+    return burst
+
+
+async def run(groups: int, use_queue: bool) -> dict:
+    api = FakeBotApi(
+        global_rate=30 * SPEED,
+        chat_rate=1 * SPEED,
+        group_rate=20 / 60 * SPEED,
+    )
+    await api.start()
+    asyncio_helper.API_URL = api.api_url
+    queue = None
+    if use_queue:
+        queue = SendQueue(
+            global_rate=30 * SPEED,
+            chat_rate=1 * SPEED,
+            group_rate=20 / 60 * SPEED,
+        )
+    bot = MyTeleBot("1:fake", tester_ids=(1,), send_queue=queue)
+    waits = {INTERACTIVE: [], NOTIFICATION: []}
+    lost = 0
+
+    async def send(chat_id, text, priority):
+        nonlocal lost
+        start = time.monotonic()
+        try:
+            if queue is None:
+                await AsyncTeleBot.send_message(bot, chat_id, text)
+            else:
+                await queue.submit(
+                    chat_id,
+                    lambda: AsyncTeleBot.send_message(bot, chat_id, text),
+                    priority,
+                )
+        except asyncio_helper.ApiTelegramException:
+            lost += 1
+        waits[priority].append(time.monotonic() - start)
+
+    burst = make_burst(groups)
+    start = time.monotonic()
+    await asyncio.gather(*(send(*item) for item in burst))
+    elapsed = time.monotonic() - start
+
+    ordered = api.messages.get("-999", [])
+    result = {
+        "elapsed_s": round(elapsed, 3),
+        "submitted": len(burst),
+        "lost": lost,
+        "order_ok": ordered == [f"#{i}" for i in range(ORDERED_MESSAGES)],
+        "wait_interactive_avg_s": round(
+            sum(waits[INTERACTIVE]) / len(waits[INTERACTIVE]), 3
+        ),
+        "wait_notification_avg_s": round(
+            sum(waits[NOTIFICATION]) / len(waits[NOTIFICATION]), 3
+        ),
+        "api": api.report(),
+    }
+    if queue is not None:
+        result["queue"] = {
+            key: round(value, 3) if isinstance(value, float) else value
+            for key, value in queue.stats().items()
+        }
+        await queue.close()
+    await asyncio_helper.session_manager.session.close()
+    await api.stop()
+    return result
+
+
+async def main():
+    groups = int(sys.argv[1]) if len(sys.argv) > 1 else GROUPS
+    results = {
+        "speed": SPEED,
+        "direct": await run(groups, use_queue=False),
+        "send_queue": await run(groups, use_queue=True),
+    }
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    queued = results["send_queue"]
+    if queued["lost"] or not queued["order_ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+Проверка приема обновлений через вебхук (src.webhook) без телеграма.
+
+Вместо бота - заглушка, которая запоминает обновления и обрабатывает
+каждое с задержкой. Проверяется: обновления доходят до обработки по одному
+разу, неверный секрет отклоняется, при остановке уже принятые
+обновления обрабатываются до конца, а новые не принимаются.
+
+    python -m tools.check_webhook
+"""
+
+import asyncio
+import json
+import sys
+from bench.common import setup_env
+
+setup_env()
+
+from src.webhook import WebhookServer  # noqa: E402
+from tools.post_updates import post_updates, synthetic_updates  # noqa: E402
+
+SECRET = "check-secret"
+UPDATES = 500
+DELAY = 0.2  # Обработка одного обновления, секунд
+
+
+class RecordingBot:
+    def __init__(self):
+        self.processed: list[int] = []
+        self.closed = False
+
+    async def process_new_updates(self, updates):
+        await asyncio.sleep(DELAY)
+        self.processed.extend(update.update_id for update in updates)
+
+    async def close_session(self):
+        self.closed = True
+
+
+async def main():
+    bot = RecordingBot()
+    server = WebhookServer(bot, secret_token=SECRET, drain_timeout=5)
+    await server.start("127.0.0.1", 0)
+    updates = synthetic_updates(UPDATES)
+
+    results = {"post": await post_updates(server.url, SECRET, updates)}
+    results["wrong_secret"] = await post_updates(server.url, "wrong", updates[:10])
+    results["repeated"] = await post_updates(server.url, SECRET, updates[:10])
+    # Остановка, пока обновления еще обрабатываются
+    late = synthetic_updates(UPDATES + 10)[UPDATES:]
+    await post_updates(server.url, SECRET, late)
+    in_flight = server.in_flight
+    drain = asyncio.create_task(server.stop())
+    await asyncio.sleep(0)
+    results["while_draining"] = await post_updates(server.url, SECRET, updates[:1])
+    await drain
+    results["in_flight_at_stop"] = in_flight
+    results["processed"] = len(bot.processed)
+    results["unique_processed"] = len(set(bot.processed))
+    results["server"] = {
+        "received": server.received,
+        "duplicates": server.duplicates,
+        "rejected": server.rejected,
+    }
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    ok = (
+        results["post"]["statuses"] == {"200": UPDATES}
+        and results["wrong_secret"]["statuses"] == {"403": 10}
+        and server.duplicates == 10
+        and "200" not in results["while_draining"]["statuses"]
+        and results["processed"] == results["unique_processed"] == UPDATES + 10
+    )
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
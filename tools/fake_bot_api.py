@@ -0,0 +1,231 @@
+"""
+Локальный сервер, изображающий Telegram Bot API, для проверок без сети.
+
+Принимает запросы бота по адресу /bot<token>/<method>, отвечает как телеграм
+и, как телеграм, отвечает 429 с retry_after при превышении скорости
+отправки: общей, в личный чат и в группу.
+Считает вызовы методов и запоминает порядок сообщений в каждом чате.
+
+Обновления для бота кладутся методом push_update и отдаются через
+getUpdates с долгим опросом, как у телеграма. Успешные вызовы
+sendMessage и answerCallbackQuery передаются в on_call(method, params, result),
+так нагрузочный тест видит ответы бота.
+
+Отдельный запуск (бот направляется сюда настройкой BOT_API_URL):
+    python -m tools.fake_bot_api [port]
+"""
+
+import asyncio
+import itertools
+import json
+import math
+import sys
+import time
+from collections import Counter, defaultdict, deque
+from urllib.parse import parse_qsl
+from aiohttp import web
+from src.send_queue import TokenBucket
+
+BOT_USER = {
+    "id": 1000,
+    "is_bot": True,
+    "first_name": "Crocobot",
+    "username": "fake_crocobot",
+}
+
+
+class FakeBotApi:
+    def __init__(
+        self,
+        global_rate: float = 30,
+        chat_rate: float = 1,
+        group_rate: float = 20 / 60,
+        chat_burst: float = 4,
+        latency: float = 0,
+    ):
+        """
+        :param global_rate: сообщений в секунду на бота
+        :param chat_rate: сообщений в секунду в личный чат
+        :param group_rate: сообщений в секунду в группу
+        :param chat_burst: сколько сообщений подряд принимается в чат
+        :param latency: задержка ответа, секунд
+        """
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.latency = latency
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_buckets: dict[str, TokenBucket] = {}
+        self.calls = Counter()  # Метод -> число вызовов
+        self.rejected = Counter()  # Метод -> число ответов 429
+        self.messages: dict[str, list[str]] = defaultdict(list)  # Чат -> тексты
+        self.message_ids = itertools.count(1)
+        self.update_ids = itertools.count(1)
+        self.updates: deque[dict] = deque()  # Еще не подтвержденные ботом
+        self.acked = 0  # Последний update_id, подтвержденный offset
+        self._new_updates = asyncio.Event()
+        self.on_call = None  # on_call(method, params, result)
+        self.url = None
+        self._runner: web.AppRunner | None = None
+
+    @property
+    def api_url(self) -> str:
+        """Шаблон для telebot.asyncio_helper.API_URL"""
+        return self.url + "/bot{0}/{1}"
+
+    def _check_rate(self, chat_id: str) -> float:
+        """Сколько ждать до разрешенной отправки, 0 - можно отправлять"""
+        now = time.monotonic()
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            rate = self.group_rate if chat_id.startswith("-") else self.chat_rate
+            bucket = self.chat_buckets[chat_id] = TokenBucket(rate, self.chat_burst)
+        delay = max(bucket.delay(now), self.global_bucket.delay(now))
+        if not delay:
+            bucket.take(now)
+            self.global_bucket.take(now)
+        return delay
+
+    @staticmethod
+    def ok(result) -> web.Response:
+        return web.json_response({"ok": True, "result": result})
+
+    @staticmethod
+    def error(code: int, description: str, **parameters) -> web.Response:
+        data = {"ok": False, "error_code": code, "description": description}
+        if parameters:
+            data["parameters"] = parameters
+        return web.json_response(data, status=code)
+
+    def make_message(self, chat_id: str, text: str, **extra) -> dict:
+        chat_id = int(chat_id)
+        chat = {"id": chat_id, "type": "supergroup" if chat_id < 0 else "private"}
+        if chat_id < 0:
+            chat["title"] = f"Chat {chat_id}"
+        return {
+            "message_id": next(self.message_ids),
+            "date": int(time.time()),
+            "chat": chat,
+            "from": BOT_USER,
+            "text": text,
+            **extra,
+        }
+
+    def push_update(self, update: dict) -> int:
+        """Кладет обновление для getUpdates, возвращает его update_id"""
+        update_id = update["update_id"] = next(self.update_ids)
+        self.updates.append(update)
+        self._new_updates.set()
+        return update_id
+
+    @property
+    def backlog(self) -> int:
+        """Положено, но еще не подтверждено ботом"""
+        return len(self.updates)
+
+    def notify(self, method: str, params: dict, result):
+        if self.on_call is not None:
+            self.on_call(method, params, result)
+
+    @staticmethod
+    async def read_params(request: web.Request) -> dict:
+        if request.method == "POST":
+            params = dict(await request.post())
+        else:  # telebot шлет параметры GET-запросов в теле формой
+            params = dict(parse_qsl((await request.read()).decode()))
+        return params or dict(request.query)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = await self.read_params(request)
+        self.calls[method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        handler = getattr(self, "api_" + method, None)
+        if handler is None:
+            return self.ok(True)
+        return await handler(params)
+
+    async def api_getMe(self, params: dict) -> web.Response:
+        return self.ok(BOT_USER)
+
+    async def api_sendMessage(self, params: dict) -> web.Response:
+        chat_id = params["chat_id"]
+        if delay := self._check_rate(chat_id):
+            self.rejected["sendMessage"] += 1
+            retry_after = math.ceil(delay)
+            return self.error(
+                429,
+                f"Too Many Requests: retry after {retry_after}",
+                retry_after=retry_after,
+            )
+        self.messages[chat_id].append(params.get("text", ""))
+        message = self.make_message(chat_id, params.get("text", ""))
+        self.notify("sendMessage", params, message)
+        return self.ok(message)
+
+    async def api_getUpdates(self, params: dict) -> web.Response:
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", 100))
+        timeout = float(params.get("timeout", 0))
+        # offset подтверждает все обновления до него
+        while self.updates and self.updates[0]["update_id"] < offset:
+            self.updates.popleft()
+        self.acked = max(self.acked, offset - 1)
+        if not self.updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.ok(list(itertools.islice(self.updates, limit)))
+
+    async def api_answerCallbackQuery(self, params: dict) -> web.Response:
+        self.notify("answerCallbackQuery", params, True)
+        return self.ok(True)
+
+    async def api_getChatMember(self, params: dict) -> web.Response:
+        user = {"id": int(params["user_id"]), "is_bot": False, "first_name": "User"}
+        return self.ok({"status": "administrator", "user": user})
+
+    def report(self) -> dict:
+        return {
+            "calls": dict(self.calls),
+            "rejected_429": dict(self.rejected),
+            "chats": len(self.messages),
+            "messages": sum(len(texts) for texts in self.messages.values()),
+        }
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self.handle)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        self._runner = web.AppRunner(self.make_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def main(port: int):
+    api = FakeBotApi()
+    await api.start(port=port)
+    print(f"Fake Bot API: {api.api_url}")
+    try:
+        while True:
+            await asyncio.sleep(10)
+            print(json.dumps(api.report(), ensure_ascii=False))
+    finally:
+        await api.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 8081))
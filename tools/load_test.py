@@ -0,0 +1,431 @@
+"""
+Нагрузочный тест main.py целиком на локальной заглушке Bot API.
+
+Бот запускается отдельным процессом (обычный main.py, polling) и
+направляется на tools/fake_bot_api.py настройкой BOT_API_URL. Тест
+изображает тысячи групп, где игроки ведут себя как люди: запускают
+игру /start, ведущий смотрит слово кнопкой, остальные угадывают,
+повторяют ответы (бот их удаляет), угадавший берет ведение кнопкой,
+часть раундов брошена и завершается по таймеру, иногда игру
+останавливают /stop.
+
+С churn состав игроков меняется: после части раундов один из игроков
+чата уходит, вместо него приходит новый, а чат иногда замолкает на время
+дольше выгрузки игры из кэша. Так видно, растут ли структуры, которые
+копятся по игрокам (имена игроков), вместе с числом разных игроков.
+
+Выводит пропускную способность (сколько обновлений бот забрал в секунду
+и сколько не успел), задержки ответов по видам (от появления обновления
+до ответа бота) и число вызовов Bot API по методам.
+
+    python -m tools.load_test [чатов] [секунд] [limits] [churn]
+
+С limits заглушка и бот ограничивают отправку как телеграм (30 сообщений
+в секунду на бота, 20 в минуту в группу), и задержки ответов показывают
+очередь отправки; без него меряется сам бот.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import random
+import signal
+import sys
+import time
+from bench.common import BENCH_DIR, setup_env, random_word
+
+setup_env()
+
+from tools.fake_bot_api import BOT_USER, FakeBotApi  # noqa: E402
+
+CHATS = 1000
+SECONDS = 30
+USERS_PER_CHAT = 6
+THINK = 1.0  # Среднее время между действиями в чате, секунд
+CHURN = 0.2  # Доля раундов, после которых в чат приходит новый игрок
+BREAKS = 0.05  # Доля раундов, после которых чат замолкает
+BREAK_TIME = 30.0  # Среднее время молчания чата, секунд
+UNLIMITED = 10**6
+
+BOT_COMMAND = f"@{BOT_USER['username']}"
+
+
+def percentiles(times: list[float]) -> dict:
+    if not times:
+        return {"count": 0}
+    times = sorted(times)
+    at = lambda q: round(times[min(int(len(times) * q), len(times) - 1)] * 1000, 2)  # noqa: E731
+    return {
+        "count": len(times),
+        "p50_ms": at(0.5),
+        "p90_ms": at(0.9),
+        "p99_ms": at(0.99),
+        "max_ms": round(times[-1] * 1000, 2),
+    }
+
+
+class ChatSim:
+    """Группа с игроками; реагирует на сообщения бота"""
+
+    __slots__ = ("chat_id", "thread", "users", "leader", "word", "winner",
+                 "bot_message", "guesses", "waiting", "stage")  # fmt: skip
+
+    def __init__(self, chat_id: int, users: list[dict], thread: int | None = None):
+        self.chat_id = chat_id
+        self.thread = thread  # Игра в обсуждении поста канала
+        self.users = users
+        self.leader = None
+        self.word = None  # Слово, которое ведущий узнал кнопкой
+        self.winner = None  # Кто угадал и может взять ведение
+        self.bot_message = None  # Последнее сообщение бота с кнопками
+        self.guesses: list[str] = []
+        self.waiting = None  # (вид, время) - ждем сообщения бота в чате
+        # idle - игры нет; view - ведущий смотрит слово; play - угадываем;
+        # lead - раунд окончен, кто-то берет ведение; silent - раунд брошен
+        self.stage = "idle"
+
+    def reset(self):
+        """Бот перезапущен: ответа на последнее действие может не быть"""
+        self.waiting = None
+        self.word = self.winner = None
+        self.stage = "idle"
+
+
+class LoadTest:
+    def __init__(
+        self,
+        chats: int,
+        seconds: float,
+        limits: bool = False,
+        think: float = THINK,
+        posts: float = 0,
+        churn: float = 0,
+        breaks: float = 0,
+        break_time: float = BREAK_TIME,
+    ):
+        """
+        :param think: среднее время между действиями в чате, секунд
+        :param posts: доля чатов, играющих в обсуждении поста канала
+        :param churn: доля раундов, после которых игрока сменяет новый
+        :param breaks: доля раундов, после которых чат молчит break_time
+        """
+        self.seconds = seconds
+        self.limits = limits
+        self.think = think
+        self.churn = churn
+        self.breaks = breaks
+        self.break_time = break_time
+        rate = (30, 1, 20 / 60) if limits else (UNLIMITED,) * 3
+        self.api = FakeBotApi(*rate, chat_burst=4 if limits else UNLIMITED)
+        self.api.on_call = self.on_call
+        self.rnd = random.Random(11)
+        self.user_ids = itertools.count(10**8)
+        self.chats: dict[str, ChatSim] = {}
+        for i in range(chats):
+            users = [self.new_user() for _ in range(USERS_PER_CHAT)]
+            thread = 1000 + i if self.rnd.random() < posts else None
+            chat = ChatSim(-1002000000000 - i, users, thread)
+            self.chats[str(chat.chat_id)] = chat
+        self.callbacks: dict[str, tuple[str, float, ChatSim]] = {}
+        self.callback_ids = itertools.count(1)
+        self.latency: dict[str, list[float]] = {}
+        self.events = {"started": 0, "guessed": 0, "expired": 0, "stopped": 0,
+                       "new_players": 0, "breaks": 0}  # fmt: skip
+        self.injected = 0
+        self._schedule: list[tuple[float, int, ChatSim]] = []
+        self._order = itertools.count()
+        self.bot: asyncio.subprocess.Process | None = None
+
+    def new_user(self) -> dict:
+        uid = next(self.user_ids)
+        return {"id": uid, "is_bot": False, "first_name": f"Игрок {uid}"}
+
+    # --- Обновления от игроков ---
+
+    def push_message(self, chat: ChatSim, user: dict, text: str):
+        message = {
+            "message_id": next(self.api.message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat.chat_id, "type": "supergroup",
+                     "title": f"Chat {chat.chat_id}"},  # fmt: skip
+            "from": user,
+            "text": text,
+        }
+        if chat.thread is not None:  # Комментарий к посту канала
+            message["message_thread_id"] = chat.thread
+            message["reply_to_message"] = {
+                "message_id": chat.thread,
+                "date": message["date"],
+                "chat": message["chat"],
+                "from": {"id": 777000, "is_bot": False, "first_name": "Telegram"},
+                "text": "Пост",
+            }
+        self.api.push_update({"message": message})
+        self.injected += 1
+
+    def push_callback(self, chat: ChatSim, user: dict, data: str):
+        callback_id = str(next(self.callback_ids))
+        self.callbacks[callback_id] = (data, time.monotonic(), chat)
+        self.api.push_update(
+            {
+                "callback_query": {
+                    "id": callback_id,
+                    "from": user,
+                    "message": chat.bot_message,
+                    "chat_instance": str(chat.chat_id),
+                    "data": data,
+                }
+            }
+        )
+        self.injected += 1
+
+    def wait_reply(self, chat: ChatSim, kind: str):
+        chat.waiting = (kind, time.monotonic())
+
+    def later(self, chat: ChatSim, think: float = None):
+        delay = self.rnd.expovariate(1 / (think or self.think))
+        heapq.heappush(
+            self._schedule, (time.monotonic() + delay, next(self._order), chat)
+        )
+
+    def act(self, chat: ChatSim):
+        """Очередное действие игроков чата"""
+        rnd = self.rnd
+        if chat.waiting is not None or chat.stage == "silent":
+            return  # Ждем бота; новое действие запланирует его ответ
+        if chat.stage == "idle":
+            chat.leader = rnd.choice(chat.users)
+            self.push_message(chat, chat.leader, "/start" + BOT_COMMAND)
+            self.wait_reply(chat, "start")
+        elif chat.stage == "view":
+            self.push_callback(chat, chat.leader, "view_word")
+        elif chat.stage == "lead":
+            user = chat.winner or rnd.choice(chat.users)
+            chat.leader = user
+            self.push_callback(chat, user, "want_to_lead")
+        elif chat.stage == "play":
+            kind = rnd.random()
+            user = rnd.choice([u for u in chat.users if u is not chat.leader])
+            if kind < 0.01:
+                self.push_message(chat, user, "/stop" + BOT_COMMAND)
+                self.events["stopped"] += 1
+                chat.stage = "silent"  # Бот пришлет сообщение о завершении
+                return
+            if kind < 0.03:
+                chat.stage = "silent"  # Раунд брошен, ждем таймера
+                return
+            if kind < 0.15 and chat.word:
+                chat.winner = user
+                self.push_message(chat, user, chat.word)
+                self.wait_reply(chat, "guess")
+                return
+            if kind < 0.3 and chat.guesses:
+                self.push_message(chat, user, rnd.choice(chat.guesses))  # Повтор
+            else:
+                chat.guesses.append(guess := random_word(rnd))
+                self.push_message(chat, user, guess)
+            self.later(chat)
+
+    # --- Ответы бота ---
+
+    def on_call(self, method: str, params: dict, result):
+        now = time.monotonic()
+        if method == "answerCallbackQuery":
+            if (callback := self.callbacks.pop(params["callback_query_id"], None)) is None:
+                return  # Нажатие, отправленное прежнему процессу бота
+            data, start, chat = callback
+            self.latency.setdefault(data, []).append(now - start)
+            text = params.get("text", "")
+            if text.startswith("Ваше") and "слово: " in text:
+                chat.word = text.split("слово: ", 1)[1]
+                chat.stage = "play"
+                chat.guesses.clear()
+                self.later(chat)
+            elif data == "want_to_lead":
+                # Право ведения еще у угадавшего, попробуем снова
+                chat.winner = None
+                self.later(chat)
+            return
+        chat = self.chats.get(params["chat_id"])
+        if chat is None:
+            return
+        if chat.waiting is not None:
+            kind, start = chat.waiting
+            self.latency.setdefault(kind, []).append(now - start)
+            chat.waiting = None
+        markup = params.get("reply_markup", "")
+        if markup and chat.thread is not None:
+            # Сообщение бота в обсуждении поста, кнопки нажимают там же
+            result = dict(result, message_thread_id=chat.thread)
+        if "view_word" in markup:  # Игра началась, ведущий смотрит слово
+            chat.bot_message = result
+            chat.stage = "view"
+            self.events["started"] += 1
+            self.later(chat)
+        elif "want_to_lead" in markup:  # Раунд окончен
+            chat.bot_message = result
+            if chat.winner is not None and chat.stage == "play":
+                self.events["guessed"] += 1
+            else:
+                chat.winner = None
+                self.events["expired"] += 1
+            chat.word = None
+            chat.stage = "lead"
+            self.round_over(chat)
+        elif chat.stage in ("idle", "play"):
+            self.later(chat)  # "Игра уже запущена" и прочее
+
+    def round_over(self, chat: ChatSim):
+        """Смена игроков и перерывы между раундами"""
+        rnd = self.rnd
+        if rnd.random() < self.churn:
+            # Уходит кто угодно, кроме угадавшего: он берет ведение
+            others = [i for i, u in enumerate(chat.users) if u is not chat.winner]
+            chat.users[rnd.choice(others)] = self.new_user()
+            self.events["new_players"] += 1
+        if rnd.random() < self.breaks:
+            self.events["breaks"] += 1
+            self.later(chat, think=self.break_time)
+        else:
+            self.later(chat)
+
+    # --- Запуск ---
+
+    def bot_env(self, **overrides) -> dict:
+        env = dict(
+            os.environ,
+            BOT_API_URL=self.api.api_url,
+            UPDATES_MODE="polling",
+            LOG_CONSOLE="false",
+            LOG_LEVEL="WARNING",
+            GAME_TIME="20",
+            EXCLUSIVE_TIME="5",
+            STATS_BACKEND="sqlite",
+            STATE_BACKEND="sqlite",
+            CHAT_COMMANDS_RATE="1000",
+        )
+        if not self.limits:
+            env.update(
+                SEND_GLOBAL_RATE=str(UNLIMITED),
+                SEND_CHAT_RATE=str(UNLIMITED),
+                SEND_GROUP_RATE=str(UNLIMITED),
+                SEND_CHAT_BURST=str(UNLIMITED),
+            )
+        env.update(overrides)
+        return env
+
+    async def drive(self):
+        """Действия чатов по расписанию (первые ставит reset)"""
+        while True:
+            now = time.monotonic()
+            while self._schedule and self._schedule[0][0] <= now:
+                self.act(heapq.heappop(self._schedule)[2])
+            await asyncio.sleep(0.005)
+
+    async def start_bot(self, output_file: str = "bot_output.txt", **env):
+        """Запускает main.py и ждет, пока он начнет опрашивать getUpdates"""
+        self.reset()
+        polls = self.api.calls["getUpdates"]
+        main_py = os.path.join(os.path.dirname(os.path.dirname(__file__)), "main.py")
+        with open(os.path.join(BENCH_DIR, output_file), "w") as output:
+            self.bot = await asyncio.create_subprocess_exec(
+                sys.executable,
+                os.path.abspath(main_py),
+                env=self.bot_env(**env),
+                cwd=BENCH_DIR,
+                stdout=output,
+                stderr=asyncio.subprocess.STDOUT,
+            )
+        while self.api.calls["getUpdates"] == polls:
+            if self.bot.returncode is not None:
+                raise RuntimeError(f"Бот не запустился, см. {output.name}")
+            await asyncio.sleep(0.1)
+
+    async def stop_bot(self, kill: bool = False) -> int | str:
+        """Останавливает бота как Ctrl+C, с kill - как падение"""
+        if kill:
+            self.bot.kill()
+        else:
+            self.bot.send_signal(signal.SIGINT)
+        try:
+            return await asyncio.wait_for(self.bot.wait(), 30)
+        except asyncio.TimeoutError:
+            self.bot.kill()
+            return "killed"
+
+    def reset(self):
+        """Новый процесс бота: ответы прежнему не придут"""
+        for chat in self.chats.values():
+            chat.reset()
+        self.callbacks.clear()
+        self._schedule.clear()
+        for chat in self.chats.values():
+            self.later(chat, think=self.think * 2)
+
+    async def drain(self, timeout: float = 30) -> float:
+        """Ждет, пока бот заберет все обновления; возвращает время ожидания"""
+        start = time.monotonic()
+        while self.api.backlog and time.monotonic() - start < timeout:
+            await asyncio.sleep(0.1)
+        await asyncio.sleep(1)
+        return time.monotonic() - start
+
+    async def run(self) -> dict:
+        await self.api.start()
+        await self.start_bot()
+        calls_before = self.api.calls.copy()
+        driver = asyncio.create_task(self.drive())
+        start = time.monotonic()
+        await asyncio.sleep(self.seconds)
+        driver.cancel()
+        injected, acked = self.injected, self.api.acked
+        elapsed = time.monotonic() - start
+        backlog = self.api.backlog
+        drained_s = await self.drain()  # Даем боту дообработать очередь
+        exit_code = await self.stop_bot()
+        await self.api.stop()
+
+        calls = self.api.calls - calls_before
+        return {
+            "chats": len(self.chats),
+            "seconds": round(elapsed, 1),
+            "telegram_limits": self.limits,
+            "updates": {
+                "injected": injected,
+                "injected_per_s": round(injected / elapsed, 1),
+                "fetched_per_s": round(acked / elapsed, 1),
+                "backlog_at_end": backlog,
+                "drained_after_s": round(drained_s, 1),
+            },
+            "latency": {kind: percentiles(t) for kind, t in self.latency.items()},
+            "events": self.events,
+            "api_calls": dict(calls),
+            "rejected_429": dict(self.api.rejected),
+            "bot_exit_code": exit_code,
+        }
+
+
+async def main(chats: int, seconds: float, limits: bool, churn: bool):
+    test = LoadTest(
+        chats,
+        seconds,
+        limits,
+        churn=CHURN if churn else 0,
+        breaks=BREAKS if churn else 0,
+    )
+    result = await test.run()
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    asyncio.run(
+        main(
+            int(args[0]) if args else CHATS,
+            float(args[1]) if len(args) > 1 else SECONDS,
+            "limits" in args,
+            "churn" in args,
+        )
+    )
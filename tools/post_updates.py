@@ -0,0 +1,100 @@
+"""
+Отправка обновлений на вебхук бота, как это делает телеграм.
+
+Обновления берутся из файла (JSON по строке на обновление, например
+записанные из логов) или генерируются: текстовые сообщения в группах.
+Выводит ответы сервера по кодам и время ответа.
+
+Бот запускается локально с UPDATES_MODE=webhook, WEBHOOK_SECRET=<секрет>
+и без WEBHOOK_URL, затем:
+    python -m tools.post_updates http://127.0.0.1:8080/webhook <секрет> [файл.jsonl]
+"""
+
+import asyncio
+import itertools
+import json
+import sys
+import time
+from collections import Counter
+import aiohttp
+from src.webhook import SECRET_HEADER
+
+UPDATES = 1000
+CHATS = 20
+CONCURRENCY = 40  # Как max_connections вебхука
+
+_message_ids = itertools.count(1)
+
+
+def make_update(update_id: int, chat_id: int, user_id: int, text: str) -> dict:
+    """Обновление с текстовым сообщением в группе"""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": next(_message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "supergroup", "title": f"Chat {chat_id}"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User {user_id}"},
+            "text": text,
+        },
+    }
+
+
+def synthetic_updates(count: int = UPDATES, chats: int = CHATS) -> list[dict]:
+    return [
+        make_update(i, -1000 - i % chats, 100 + i % 7, f"слово {i}")
+        for i in range(1, count + 1)
+    ]
+
+
+def load_updates(file: str) -> list[dict]:
+    with open(file, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def post_updates(
+    url: str, secret: str, updates: list[dict], concurrency: int = CONCURRENCY
+) -> dict:
+    """Отправляет обновления не более concurrency одновременно"""
+    statuses = Counter()
+    times = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def post(session: aiohttp.ClientSession, update: dict):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                async with session.post(
+                    url, json=update, headers={SECRET_HEADER: secret}
+                ) as response:
+                    statuses[response.status] += 1
+            except aiohttp.ClientError as e:
+                statuses[type(e).__name__] += 1
+            times.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(post(session, update) for update in updates))
+    elapsed = time.perf_counter() - started
+    times.sort()
+    return {
+        "updates": len(updates),
+        "statuses": {str(status): count for status, count in statuses.items()},
+        "seconds": round(elapsed, 3),
+        "updates_per_s": round(len(updates) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(times[len(times) // 2] * 1000, 3) if times else None,
+        "p99_ms": round(times[int(len(times) * 0.99)] * 1000, 3) if times else None,
+    }
+
+
+async def main(url: str, secret: str, file: str = None):
+    updates = load_updates(file) if file else synthetic_updates()
+    result = await post_updates(url, secret, updates)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(2)
+    asyncio.run(main(*sys.argv[1:4]))
@@ -0,0 +1,120 @@
+"""
+Разбор трасс src.tracing: самые медленные обновления и на что ушло время.
+
+Для N самых долгих трасс печатает дерево спанов (начало и длительность,
+мс), затем разбивку по именам спанов по всем трассам: сколько раз,
+суммарное и собственное время (без вложенных спанов), среднее, p95 и долю
+собственного времени в общем. "(вне спанов)" - время обработчиков
+telebot и фильтров вне спанов.
+
+    python -m tools.slow_traces [traces.txt] [N]
+Читает и ротированные файлы traces.txt.1 и т.д.
+"""
+
+import json
+import os
+import sys
+from collections import defaultdict
+
+TRACE_FILE = "traces.txt"
+TOP = 10
+OUTSIDE = "(вне спанов)"
+
+
+def read_traces(trace_file: str) -> list[dict]:
+    files = [trace_file]
+    index = 1
+    while os.path.exists(f"{trace_file}.{index}"):
+        files.append(f"{trace_file}.{index}")
+        index += 1
+    traces = []
+    for file in files:
+        with open(file, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    traces.append(json.loads(line))
+    return traces
+
+
+def self_times(trace: dict) -> list[float]:
+    """Собственное время каждого спана: без вложенных"""
+    spans = trace["spans"]
+    result = [span["ms"] or 0 for span in spans]
+    for span in spans:
+        if span["parent"] >= 0 and span["ms"] is not None:
+            result[span["parent"]] -= span["ms"]
+    return result
+
+
+def print_trace(trace: dict):
+    print(
+        f"\n{trace['ms']:10.1f} мс  {trace['kind']}  chat_id={trace.get('chat_id')}"
+        f"  trace_id={trace['trace_id']}"
+        + (f"  error={trace['error']}" if "error" in trace else "")
+    )
+    depth = {}
+    for index, span in enumerate(trace["spans"]):
+        depth[index] = depth.get(span["parent"], -1) + 1
+        ms = "   ...  " if span["ms"] is None else f"{span['ms']:8.1f}"
+        indent = "  " * depth[index]
+        print(f"    +{span['start_ms']:8.1f} {ms}  {indent}{span['name']}")
+
+
+def breakdown(traces: list[dict]) -> list[tuple]:
+    times = defaultdict(list)
+    own = defaultdict(float)
+    total_ms = 0
+    for trace in traces:
+        total_ms += trace["ms"]
+        roots = 0
+        for span, self_ms in zip(trace["spans"], self_times(trace)):
+            if span["ms"] is None:
+                continue
+            times[span["name"]].append(span["ms"])
+            own[span["name"]] += self_ms
+            if span["parent"] < 0:
+                roots += span["ms"]
+        times[OUTSIDE].append(trace["ms"] - roots)
+        own[OUTSIDE] += trace["ms"] - roots
+    rows = []
+    for name, values in times.items():
+        values.sort()
+        rows.append(
+            (
+                name,
+                len(values),
+                sum(values),
+                own[name],
+                sum(values) / len(values),
+                values[min(len(values) * 95 // 100, len(values) - 1)],
+                own[name] / total_ms * 100 if total_ms else 0,
+            )
+        )
+    rows.sort(key=lambda row: row[3], reverse=True)
+    return rows
+
+
+def main(trace_file: str = TRACE_FILE, top: int = TOP):
+    traces = read_traces(trace_file)
+    if not traces:
+        print("Нет трасс")
+        return
+    traces.sort(key=lambda trace: trace["ms"], reverse=True)
+    print(f"Трасс: {len(traces)}, самые медленные {min(top, len(traces))}:")
+    for trace in traces[:top]:
+        print_trace(trace)
+
+    print(
+        f"\n{'спан':40} {'раз':>7} {'всего мс':>10} {'свое мс':>10}"
+        f" {'сред мс':>8} {'p95 мс':>8} {'доля':>6}"
+    )
+    for name, count, total, own, avg, p95, share in breakdown(traces):
+        print(
+            f"{name:40} {count:7} {total:10.1f} {own:10.1f}"
+            f" {avg:8.2f} {p95:8.2f} {share:5.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(args[0] if args else TRACE_FILE, int(args[1]) if len(args) > 1 else TOP)
@@ -0,0 +1,204 @@
+"""
+Долгий прогон бота с ускоренными таймерами и перезапусками.
+
+Сценарий tools/load_test (группы играют полные раунды, часть раундов
+брошена, часть чатов играет в обсуждениях постов каналов, игроки
+сменяются новыми, чаты замолкают и их игры выгружаются), но GAME_TIME и
+EXCLUSIVE_TIME сжаты до секунд, так что за минуту проходят часы игры.
+Бот перезапускается каждые cycle секунд: обычно через Ctrl+C, каждый
+третий раз - kill, как при падении.
+
+Бот пишет показатели процесса в лог (RUNTIME_STATS_INTERVAL, см.
+src/runtime_stats.py), после каждого цикла измеряется размер хранилища
+состояний. Тест падает (код выхода 1), если показатель растет без
+границы:
+- внутри процесса - память, задачи, открытые файлы, таймеры, ответы
+  и имена игроков не из игр кэша: максимум второй половины цикла
+  заметно выше первой, и так в большинстве циклов;
+- между перезапусками - хранилище состояний, загруженные игры, посты
+  каналов: максимум второй половины циклов выше первой.
+Сами множества игроков игр растут вместе с числом разных игроков, это
+данные игры; их размер выводится, но ростом не считается, а к допуску
+хранилища добавляется PLAYER_STATE_BYTES на каждого нового игрока.
+
+    python -m tools.soak_test [циклов] [секунд_в_цикле] [чатов]
+"""
+
+import asyncio
+import json
+import os
+import sys
+from bench.common import BENCH_DIR, print_results
+from tools.load_test import LoadTest
+
+CYCLES = 6
+CYCLE_SECONDS = 60
+CHATS = 300
+THINK = 0.3
+CHURN = 0.3  # Доля раундов со сменой игрока
+BREAKS = 0.1  # Доля раундов, после которых чат молчит дольше GAMES_IDLE_TIME
+BREAK_TIME = 20
+GAME_TIME = 3
+EXCLUSIVE_TIME = 1
+STATS_INTERVAL = 1
+WARMUP = 0.2  # Доля начала цикла, которую не смотрим: прогрев кэшей
+TOLERANCE = 0.1  # Допустимый рост относительно первой половины
+# Абсолютный допуск: колебания, которые ростом не считаем
+SLACK = {
+    "rss_kb": 4096,
+    "tasks": 20,
+    "open_files": 5,
+    "timers": 50,
+    "timers_heap": 100,
+    "answers": 100,
+    "stale_player_names": 50,
+    "state_bytes": 64 * 1024,
+    "known_games": 10,
+    "chats_posts": 5,
+}
+PROCESS_METRICS = ("rss_kb", "tasks", "open_files", "timers", "timers_heap",
+                   "answers", "stale_player_names")  # fmt: skip
+# Выводятся, но ростом не считаются
+INFO_METRICS = ("players", "player_names")
+RESTART_METRICS = ("state_bytes", "known_games", "chats_posts")
+PLAYER_STATE_BYTES = 64  # Игрок в состоянии игры: айди, имя, место в базе
+
+
+def state_bytes() -> int:
+    """Размер хранилища состояний игр (папка файлов и база SQLite)"""
+    total = 0
+    for root, _, files in os.walk(BENCH_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            if "state" in path or name.startswith("games.db"):
+                total += os.path.getsize(path)
+    return total
+
+
+def read_runtime(log_file: str) -> list[dict]:
+    samples = []
+    with open(log_file, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record.get("logger") == "crocobot.runtime":
+                samples.append(record)
+    return samples
+
+
+def grows(first: list, second: list, metric: str, allowance: float = 0) -> bool:
+    first = [value for value in first if value is not None]
+    second = [value for value in second if value is not None]
+    if not first or not second:
+        return False
+    limit = max(first) * (1 + TOLERANCE) + SLACK.get(metric, 0) + allowance
+    return max(second) > limit
+
+
+def check_cycle(samples: list[dict]) -> dict[str, bool]:
+    """Рост внутри процесса: вторая половина цикла против первой"""
+    samples = samples[int(len(samples) * WARMUP) :]
+    half = len(samples) // 2
+    return {
+        metric: grows(
+            [s.get(metric) for s in samples[:half]],
+            [s.get(metric) for s in samples[half:]],
+            metric,
+        )
+        for metric in PROCESS_METRICS
+    }
+
+
+async def main(cycles: int, cycle_seconds: float, chats: int):
+    test = LoadTest(
+        chats,
+        cycle_seconds,
+        think=THINK,
+        posts=0.1,
+        churn=CHURN,
+        breaks=BREAKS,
+        break_time=BREAK_TIME,
+    )
+    await test.api.start()
+    history = []
+    growing_in_cycles = dict.fromkeys(PROCESS_METRICS, 0)
+    for cycle in range(cycles):
+        log_file = os.path.join(BENCH_DIR, f"soak-{cycle}.txt")
+        await test.start_bot(
+            f"bot_output-{cycle}.txt",
+            GAME_TIME=str(GAME_TIME),
+            EXCLUSIVE_TIME=str(EXCLUSIVE_TIME),
+            LOG_FILE=log_file,
+            LOG_LEVELS="runtime=INFO",
+            RUNTIME_STATS_INTERVAL=str(STATS_INTERVAL),
+            STATE_SAVE_DELAY="0.2",
+            GAMES_EVICT_INTERVAL="5",
+            GAMES_IDLE_TIME="10",
+        )
+        driver = asyncio.create_task(test.drive())
+        await asyncio.sleep(cycle_seconds)
+        driver.cancel()
+        kill = cycle % 3 == 2
+        exit_code = await test.stop_bot(kill=kill)
+
+        samples = read_runtime(log_file)
+        for metric, growing in check_cycle(samples).items():
+            growing_in_cycles[metric] += growing
+        last = samples[-1] if samples else {}
+        history.append(
+            {
+                "cycle": cycle,
+                "stop": "kill" if kill else "sigint",
+                "exit_code": exit_code,
+                "samples": len(samples),
+                # После kill в хранилище остается журнал (WAL) до следующего
+                # запуска, размер смотрим только после нормальной остановки
+                "state_bytes": None if kill else state_bytes(),
+                **{
+                    f"max_{metric}": max(
+                        (s[metric] for s in samples if s.get(metric) is not None),
+                        default=None,
+                    )
+                    for metric in PROCESS_METRICS + INFO_METRICS
+                },
+                **{key: last.get(key) for key in ("known_games", "chats_posts")},
+            }
+        )
+        print(json.dumps(history[-1], ensure_ascii=False), flush=True)
+    await test.api.stop()
+
+    failures = [
+        f"{metric}: растет внутри процесса в {count} из {cycles} циклов"
+        for metric, count in growing_in_cycles.items()
+        if count > cycles // 2
+    ]
+    half = len(history) // 2
+    new_players = max(h["max_players"] or 0 for h in history) - max(
+        h["max_players"] or 0 for h in history[:half]
+    )
+    for metric in RESTART_METRICS:
+        allowance = PLAYER_STATE_BYTES * new_players if metric == "state_bytes" else 0
+        if grows(
+            [h[metric] for h in history[:half]],
+            [h[metric] for h in history[half:]],
+            metric,
+            allowance,
+        ):
+            failures.append(f"{metric}: растет между перезапусками")
+    print_results(
+        "soak",
+        {
+            "cycles": cycles,
+            "cycle_seconds": cycle_seconds,
+            "chats": chats,
+            "events": test.events,
+            "failures": failures,
+        },
+    )
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:4]]
+    defaults = (CYCLES, CYCLE_SECONDS, CHATS)
+    asyncio.run(main(*args, *defaults[len(args) :]))
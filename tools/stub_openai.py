@@ -0,0 +1,97 @@
+"""
+Локальная заглушка OpenAI API (chat/completions) для проверок без сети.
+
+Отвечает готовой фразой с задержкой latency; доля fail_rate запросов
+завершается ошибкой 500. Режим можно менять на ходу через атрибуты.
+Бот направляется сюда настройкой GPT_BASE_URL=http://127.0.0.1:<port>/v1
+
+    python -m tools.stub_openai [port]
+"""
+
+import asyncio
+import itertools
+import random
+import sys
+import time
+from aiohttp import web
+
+
+class StubOpenAI:
+    def __init__(self, latency: float = 0.05, fail_rate: float = 0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.requests = 0
+        self.failed = 0
+        self.counter = itertools.count(1)
+        self.url = None
+        self._runner: web.AppRunner | None = None
+
+    @property
+    def base_url(self) -> str:
+        return self.url + "/v1"
+
+    async def completions(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        if random.random() < self.fail_rate:
+            self.failed += 1
+            return web.json_response(
+                {"error": {"message": "stub failure", "type": "server_error"}},
+                status=500,
+            )
+        number = next(self.counter)
+        return web.json_response(
+            {
+                "id": f"chatcmpl-stub-{number}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": data.get("model", "stub"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {
+                            "role": "assistant",
+                            "content": f"Объясняй смелее, слово само себя не угадает! #{number}",
+                        },
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }
+        )
+
+    async def models(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {"object": "list", "data": [{"id": "stub", "object": "model"}]}
+        )
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.completions)
+        app.router.add_get("/v1/models", self.models)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def main(port: int):
+    stub = StubOpenAI()
+    await stub.start(port=port)
+    print(f"GPT_BASE_URL={stub.base_url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await stub.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 8082))